@@ -1,59 +1,122 @@
-from database import Database
 from models import CompositeRule, Alarm, EvaluationResult
-from rules.simple_rules import SimpleRuleEvaluator
-from rules.composite_rules import CompositeRuleEvaluator
-from rules.historical_rules import HistoricalRuleEvaluator
-from rules.rate_change_rules import RateChangeEvaluator
+from services.rule_engine import get_rule_engine
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Tuple
+import asyncio
 import uuid
 
 class AlarmMonitor:
-    """Core alarm evaluation engine"""
+    """
+    Single-reading entry point to the rule engine, used by
+    `/api/alarms/composite/evaluate`. Evaluation itself happens in the shared
+    `services.rule_engine.RuleEngine`, the same core the scheduler uses.
+    """
 
     def __init__(self, db_path: str):
-        self.db = Database(db_path)
-        self.simple_evaluator = SimpleRuleEvaluator()
-        self.composite_evaluator = CompositeRuleEvaluator()
-        self.historical_evaluator = HistoricalRuleEvaluator(self.db)
-        self.rate_change_evaluator = RateChangeEvaluator(self.db)
+        # `db_path` is the application database; the engine runs on its shared connection.
+        self.engine = get_rule_engine()
+        self.db = self.engine.db
 
     async def init(self):
         """Initialize database schema"""
-        await self.db.init_schema()
+        await asyncio.to_thread(self.db.init_schema)
 
     async def evaluate_all(
         self,
         asset_id: int,
         reading: dict,
         site: str = "Unknown",
-        region: str = "Unknown"
+        region: str = "Unknown",
+        cluster: str = None
     ) -> List[Alarm]:
-        """Evaluate all rules for a single reading"""
+        """Evaluate the rules applicable to a reading's region, cluster and site"""
+        # Off the event loop: rule lookups, dedup queries and (for windowed rules) history loads.
+        return await asyncio.to_thread(self._evaluate_all, asset_id, reading, site, region, cluster)
+
+    def _evaluate_all(self, asset_id: int, reading: dict, site: str, region: str, cluster: str) -> List[Alarm]:
+        rules = self.db.get_rules_for_asset(asset_id, region=region, cluster=cluster, site=site)
         alarms = []
+        for rule, result in self.engine.evaluate_reading(asset_id, reading, rules):
+            is_duplicate = self.db.has_active_composite_alarm(
+                asset_id=asset_id,
+                composite_rule_id=rule.id,
+                severity=rule.severity
+            )
+            if is_duplicate:
+                continue
+            alarms.append(self.create_alarm(rule, result, asset_id, site, region))
 
-        # Load applicable rules
-        rules = await self.db.get_rules_for_asset(asset_id)
+        return alarms
 
-        for rule in rules:
+    async def save_alarms(self, alarms: List[Alarm]) -> int:
+        """Save alarms one by one (a failed insert skips only that alarm); returns the number saved."""
+        return await asyncio.to_thread(self._save_alarms, alarms)
+
+    def _save_alarms(self, alarms: List[Alarm]) -> int:
+        saved = 0
+        for alarm in alarms:
             try:
-                result = await self.evaluate_rule(rule, asset_id, reading)
-
-                if result.triggered:
-                    is_duplicate = await self.db.has_active_composite_alarm(
-                        asset_id=asset_id,
-                        composite_rule_id=rule.id,
-                        severity=rule.severity
-                    )
-                    if is_duplicate:
-                        continue
-                    alarm = self.create_alarm(rule, result, asset_id, site, region)
-                    alarms.append(alarm)
+                self.db.create_alarm(alarm)
+                saved += 1
             except Exception as e:
-                print(f"Error evaluating rule {rule.id}: {str(e)}")
-                continue
+                print(f"Failed to save alarm {alarm.id}: {str(e)}")
+        return saved
+
+    async def evaluate_batch(self, readings: List[dict]) -> List[List[Alarm]]:
+        """
+        Evaluate many readings (dicts with asset_id, reading and optional site,
+        region, cluster) and save all new alarms in one transaction. Returns the
+        alarms per reading, in input order.
+        """
+        # Off the event loop: a large batch is tens of milliseconds of CPU plus the insert.
+        return await asyncio.to_thread(self._evaluate_batch, readings)
+
+    def _evaluate_batch(self, readings: List[dict]) -> List[List[Alarm]]:
+        open_fingerprints = self.db.get_active_composite_fingerprints(
+            sorted({item["asset_id"] for item in readings})
+        )
 
-        return alarms
+        # Readings in the same scope share a rule list and are evaluated as one batch
+        groups: Dict[Tuple[str, ...], Tuple[List[CompositeRule], List[int]]] = {}
+        group_by_scope = {}
+        for index, item in enumerate(readings):
+            scope = (item.get("region") or "Unknown", item.get("cluster"), item.get("site") or "Unknown")
+            if scope not in group_by_scope:
+                rules = self.db.get_rules_for_asset(item["asset_id"], region=scope[0], cluster=scope[1], site=scope[2])
+                group_by_scope[scope] = groups.setdefault(tuple(rule.id for rule in rules), (rules, []))
+            group_by_scope[scope][1].append(index)
+
+        triggered: List[list] = [[] for _ in readings]
+        for rules, indexes in groups.values():
+            # Rules with an alarm already open for the asset need no result
+            severities = {rule.id: rule.severity for rule in rules}
+            exclude = {
+                (asset_id, rule_id) for asset_id, rule_id, severity in open_fingerprints
+                if severities.get(rule_id) == severity
+            }
+            batch = [(readings[i]["asset_id"], readings[i]["reading"]) for i in indexes]
+            for index, hits in zip(indexes, self.engine.evaluate_readings(batch, rules, exclude)):
+                triggered[index] = hits
+
+        results = []
+        new_alarms = []
+        for item, hits in zip(readings, triggered):
+            asset_id = item["asset_id"]
+            site = item.get("site") or "Unknown"
+            region = item.get("region") or "Unknown"
+            alarms = []
+            for rule, result in hits:
+                fingerprint = (asset_id, rule.id, rule.severity)
+                # Dedups against alarms raised earlier in this batch
+                if fingerprint in open_fingerprints:
+                    continue
+                open_fingerprints.add(fingerprint)
+                alarms.append(self.create_alarm(rule, result, asset_id, site, region))
+            results.append(alarms)
+            new_alarms.extend(alarms)
+
+        self.db.create_alarms(new_alarms)
+        return results
 
     async def evaluate_rule(
         self,
@@ -62,24 +125,7 @@ class AlarmMonitor:
         reading: dict
     ) -> EvaluationResult:
         """Route to appropriate evaluator based on rule type"""
-        if rule.rule_type == 'simple':
-            return self.simple_evaluator.evaluate(rule, reading)
-
-        elif rule.rule_type == 'composite':
-            return await self.composite_evaluator.evaluate(rule, reading)
-
-        elif rule.rule_type == 'historical':
-            return await self.historical_evaluator.evaluate(rule, asset_id)
-
-        elif rule.rule_type == 'rate_change':
-            return await self.rate_change_evaluator.evaluate(rule, asset_id, reading)
-
-        else:
-            return EvaluationResult(
-                triggered=False,
-                message=f"Unknown rule type: {rule.rule_type}",
-                reason="Unknown rule type"
-            )
+        return await asyncio.to_thread(self.engine.evaluate_rule, rule, asset_id, reading)
 
     def create_alarm(
         self,
@@ -114,12 +160,14 @@ class AlarmMonitor:
         site: str = None
     ) -> List[dict]:
         """Get alarms with filters"""
-        return await self.db.get_alarms(status=status, severity=severity, site=site)
+        return await asyncio.to_thread(self.db.get_alarms, status=status, severity=severity, site=site)
 
     async def get_rules(self, category: str = None) -> List[CompositeRule]:
         """Get rules"""
-        return await self.db.get_rules(category=category)
+        if category is None:
+            return list(await asyncio.to_thread(self.engine.rules))
+        return await asyncio.to_thread(self.db.get_rules, category=category)
 
     async def count_rules(self) -> int:
         """Count total rules"""
-        return await self.db.count_rules()
+        return await asyncio.to_thread(self.db.count_rules)
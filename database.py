@@ -1,256 +1,404 @@
-import aiosqlite
 import json
-from typing import List, Optional
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
+from pydantic import ValidationError
+from db.client import bump_rules_version, get_database, get_rules_version
 from models import CompositeRule, Alarm
-from pathlib import Path
+from services.readings_retention import parse_reading_time
 
-class Database:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+_RULE_COLUMNS = """
+    id, name, description, severity, category, rule_type, enabled,
+    conditions, logical_operator, time_window_minutes, aggregation_type,
+    applies_to, region_id, cluster_id, site_id
+"""
 
-    async def init_schema(self):
-        """Initialize database schema"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Create composite_rules table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS composite_rules (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    severity TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    rule_type TEXT NOT NULL,
-                    enabled BOOLEAN DEFAULT 1,
-                    conditions TEXT NOT NULL,
-                    logical_operator TEXT,
-                    time_window_minutes INTEGER,
-                    aggregation_type TEXT,
-                    applies_to TEXT DEFAULT 'all',
-                    region_id TEXT,
-                    cluster_id TEXT,
-                    site_id TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+# Rule writes in this process bump the version and reload the cache at once; this
+# bounds how long a write made by another process (e.g. `seed_rules.py`) goes unseen.
+RULE_CACHE_SECONDS = float(os.getenv('RULE_CACHE_SECONDS', '60'))
 
-            # Create indexes
-            await db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_composite_rules_enabled
-                ON composite_rules(enabled, category)
-            """)
+# applies_to value -> CompositeRule field naming the scope it is limited to
+_SCOPE_FIELDS = {'region': 'region_id', 'cluster': 'cluster_id', 'site': 'site_id'}
 
-            # Extend alarms table if it exists
-            try:
-                await db.execute("""
-                    ALTER TABLE alarms ADD COLUMN composite_rule_id TEXT
-                """)
-            except:
-                pass
 
-            try:
-                await db.execute("""
-                    ALTER TABLE alarms ADD COLUMN conditions_met INTEGER
-                """)
-            except:
-                pass
+def scope_key(value) -> str:
+    """Comparable form of a scope value, so 'South West', 'south-west' and ids alike match."""
+    return str(value).strip().lower().replace(' ', '-')
+
+
+@dataclass
+class RuleSet:
+    """Enabled rules at one rules version, pre-indexed by scope."""
+    version: int
+    loaded_at: float
+    rules: List[CompositeRule]
+    by_id: Dict[str, CompositeRule] = field(default_factory=dict)
+    # Rules applying everywhere, and positions (into `rules`) of scoped rules per `scope_key`.
+    global_rules: List[CompositeRule] = field(default_factory=list)
+    global_positions: List[int] = field(default_factory=list)
+    scoped: Dict[str, Dict[str, List[int]]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, version: int, rules: List[CompositeRule],
+              site_names: Optional[Dict[str, str]] = None) -> 'RuleSet':
+        """
+        Index `rules` by scope. Callers pass region, cluster and site names, so a
+        site-scoped rule is indexed under its `site_id` and, through `site_names`
+        (site id -> name), under that site's name too.
+        """
+        site_names = site_names or {}
+        rule_set = cls(version=version, loaded_at=time.monotonic(), rules=rules)
+        rule_set.scoped = {scope: {} for scope in _SCOPE_FIELDS}
+        for position, rule in enumerate(rules):
+            rule_set.by_id[rule.id] = rule
+            scope = (rule.applies_to or 'all').strip().lower()
+            scope_value = getattr(rule, _SCOPE_FIELDS[scope]) if scope in _SCOPE_FIELDS else None
+            if scope_value is None or not str(scope_value).strip():
+                # 'all', or a scope without its id, applies everywhere as before
+                rule_set.global_rules.append(rule)
+                rule_set.global_positions.append(position)
+                continue
+            keys = {scope_key(scope_value)}
+            if scope == 'site' and str(scope_value).strip() in site_names:
+                keys.add(scope_key(site_names[str(scope_value).strip()]))
+            for key in keys:
+                rule_set.scoped[scope].setdefault(key, []).append(position)
+        return rule_set
+
+    def applicable(self, region: Optional[str] = None, cluster: Optional[str] = None,
+                   site: Optional[str] = None) -> List[CompositeRule]:
+        """Rules for a reading in the given scope (names or ids), in rule order."""
+        positions = []
+        for scope, value in (('region', region), ('cluster', cluster), ('site', site)):
+            if value is not None:
+                positions.extend(self.scoped[scope].get(scope_key(value), ()))
+        if not positions:
+            return self.global_rules
+        return [self.rules[p] for p in sorted(set(positions).union(self.global_positions))]
 
+
+class Database:
+    """
+    Composite-rule storage for the rule engine.
+
+    Runs on the application's shared thread-local connection (`db.client.get_database`),
+    the same one the repositories and the scheduler use; `db_path` is kept for callers
+    that still pass it and must point at that database.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._rule_set: Optional[RuleSet] = None
+        self._rule_set_lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return get_database()
+
+    def init_schema(self):
+        """Initialize database schema"""
+        db = self.conn
+        # composite_rules itself is created by db/schema.sql; these alarm columns are
+        # only used by composite alarms.
+        for column in ("composite_rule_id TEXT", "conditions_met INTEGER", "total_conditions INTEGER"):
             try:
-                await db.execute("""
-                    ALTER TABLE alarms ADD COLUMN total_conditions INTEGER
-                """)
-            except:
+                db.execute(f"ALTER TABLE alarms ADD COLUMN {column}")
+            except sqlite3.OperationalError:
                 pass
+        db.commit()
 
-            await db.commit()
-
-    async def insert_rule(self, rule: dict):
+    def insert_rule(self, rule: dict):
         """Insert a composite rule"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO composite_rules
-                (id, name, description, severity, category, rule_type, enabled,
-                 conditions, logical_operator, time_window_minutes, aggregation_type, applies_to)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                rule['id'],
-                rule['name'],
-                rule.get('description'),
-                rule['severity'],
-                rule['category'],
-                rule['rule_type'],
-                rule.get('enabled', True),
-                json.dumps(rule['conditions']),
-                rule.get('logical_operator'),
-                rule.get('time_window_minutes'),
-                rule.get('aggregation_type'),
-                rule.get('applies_to', 'all')
-            ))
-            await db.commit()
-
-    async def get_rules(self, category: Optional[str] = None, enabled: bool = True) -> List[CompositeRule]:
+        db = self.conn
+        db.execute("""
+            INSERT OR REPLACE INTO composite_rules
+            (id, name, description, severity, category, rule_type, enabled,
+             conditions, logical_operator, time_window_minutes, aggregation_type, applies_to,
+             region_id, cluster_id, site_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            rule['id'],
+            rule['name'],
+            rule.get('description'),
+            rule['severity'],
+            rule['category'],
+            rule['rule_type'],
+            rule.get('enabled', True),
+            json.dumps(rule['conditions']),
+            rule.get('logical_operator'),
+            rule.get('time_window_minutes'),
+            rule.get('aggregation_type'),
+            rule.get('applies_to', 'all'),
+            rule.get('region_id'),
+            rule.get('cluster_id'),
+            rule.get('site_id')
+        ))
+        db.commit()
+        bump_rules_version()
+
+    def get_rules(self, category: Optional[str] = None, enabled: bool = True) -> List[CompositeRule]:
         """Get all rules or filter by category"""
-        async with aiosqlite.connect(self.db_path) as db:
-            if category:
-                cursor = await db.execute("""
-                    SELECT id, name, description, severity, category, rule_type, enabled,
-                           conditions, logical_operator, time_window_minutes, aggregation_type,
-                           applies_to, region_id, cluster_id, site_id
-                    FROM composite_rules
-                    WHERE category = ? AND enabled = ?
-                """, (category, enabled))
-            else:
-                cursor = await db.execute("""
-                    SELECT id, name, description, severity, category, rule_type, enabled,
-                           conditions, logical_operator, time_window_minutes, aggregation_type,
-                           applies_to, region_id, cluster_id, site_id
-                    FROM composite_rules
-                    WHERE enabled = ?
-                """, (enabled,))
-
-            rows = await cursor.fetchall()
-            rules = []
-            for row in rows:
+        if category:
+            cursor = self.conn.execute(
+                f"SELECT {_RULE_COLUMNS} FROM composite_rules WHERE category = ? AND enabled = ?",
+                (category, enabled),
+            )
+        else:
+            cursor = self.conn.execute(
+                f"SELECT {_RULE_COLUMNS} FROM composite_rules WHERE enabled = ?",
+                (enabled,),
+            )
+
+        rules = []
+        for row in cursor.fetchall():
+            try:
                 rules.append(CompositeRule(
-                    id=row[0],
-                    name=row[1],
-                    description=row[2],
-                    severity=row[3],
-                    category=row[4],
-                    rule_type=row[5],
-                    enabled=bool(row[6]),
-                    conditions=json.loads(row[7]),
-                    logical_operator=row[8],
-                    time_window_minutes=row[9],
-                    aggregation_type=row[10],
-                    applies_to=row[11],
-                    region_id=row[12],
-                    cluster_id=row[13],
-                    site_id=row[14]
+                    id=row['id'],
+                    name=row['name'],
+                    description=row['description'],
+                    severity=row['severity'],
+                    category=row['category'],
+                    rule_type=row['rule_type'],
+                    enabled=bool(row['enabled']),
+                    conditions=json.loads(row['conditions']),
+                    logical_operator=row['logical_operator'],
+                    time_window_minutes=row['time_window_minutes'],
+                    aggregation_type=row['aggregation_type'],
+                    applies_to=row['applies_to'],
+                    region_id=row['region_id'],
+                    cluster_id=row['cluster_id'],
+                    site_id=row['site_id']
                 ))
-            return rules
+            except (ValueError, TypeError, ValidationError) as e:
+                # One malformed rule must not take every other rule down with it.
+                print(f"Skipping composite rule {row['id']}: {e}")
+        return rules
+
+    def get_rule_set(self) -> RuleSet:
+        """Cached enabled rules; reloaded when the rules version moves or the cache ages out."""
+        rule_set = self._rule_set
+        version = get_rules_version()
+        if (
+            rule_set is not None
+            and rule_set.version == version
+            and time.monotonic() - rule_set.loaded_at <= RULE_CACHE_SECONDS
+        ):
+            return rule_set
+        with self._rule_set_lock:
+            if self._rule_set is rule_set:
+                rules = self.get_rules(enabled=True)
+                self._rule_set = RuleSet.build(version, rules, self._site_names(rules))
+            return self._rule_set
+
+    def _site_names(self, rules: List[CompositeRule]) -> Dict[str, str]:
+        """Names of the sites that site-scoped rules point at, by site id."""
+        site_ids = sorted({
+            str(rule.site_id).strip() for rule in rules
+            if (rule.applies_to or '').strip().lower() == 'site' and rule.site_id is not None
+        })
+        names = {}
+        for start in range(0, len(site_ids), 900):
+            chunk = site_ids[start:start + 900]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(
+                f"SELECT CAST(id AS TEXT) AS id, name FROM sites WHERE CAST(id AS TEXT) IN ({placeholders})",
+                chunk,
+            ):
+                if row['name']:
+                    names[row['id']] = row['name']
+        return names
 
-    async def get_rules_for_asset(self, asset_id: int) -> List[CompositeRule]:
-        """Get applicable rules for an asset"""
-        # For now, return all enabled rules
-        # TODO: Filter by site/region/cluster if needed
-        return await self.get_rules(enabled=True)
+    def invalidate_rules(self):
+        """Force cached rule sets to reload, after rule writes made outside this class."""
+        bump_rules_version()
 
-    async def count_rules(self) -> int:
+    def get_rules_for_asset(
+        self,
+        asset_id: int,
+        region: Optional[str] = None,
+        cluster: Optional[str] = None,
+        site: Optional[str] = None
+    ) -> List[CompositeRule]:
+        """Get applicable rules for an asset: global rules plus those scoped to its region, cluster or site"""
+        return self.get_rule_set().applicable(region=region, cluster=cluster, site=site)
+
+    def count_rules(self) -> int:
         """Count total rules"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("SELECT COUNT(*) FROM composite_rules")
-            row = await cursor.fetchone()
-            return row[0] if row else 0
-
-    async def get_readings_window(self, asset_id: int, minutes: int) -> List[dict]:
-        """Get readings for an asset within time window"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cutoff_time = datetime.now() - timedelta(minutes=minutes)
-            cursor = await db.execute("""
-                SELECT data, timestamp FROM readings
-                WHERE asset_id = ? AND timestamp >= ?
-                ORDER BY timestamp DESC
-            """, (asset_id, cutoff_time.isoformat()))
-
-            rows = await cursor.fetchall()
-            readings = []
-            for row in rows:
+        row = self.conn.execute("SELECT COUNT(*) FROM composite_rules").fetchone()
+        return row[0] if row else 0
+
+    def get_readings_window(self, asset_id: int, minutes: int) -> List[dict]:
+        """Get readings for an asset within time window, newest first"""
+        cutoff_time = datetime.now() - timedelta(minutes=minutes)
+        return [
+            {"data": reading["data"], "timestamp": reading["timestamp"]}
+            for reading in self.get_readings_since(asset_id, cutoff_time)
+        ]
+
+    def get_data_generation(self, domain: str) -> int:
+        """A `data_generations` counter (migrations 019/020), shared by every process."""
+        row = self.conn.execute(
+            "SELECT generation FROM data_generations WHERE domain = ?", (domain,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_readings_since(self, asset_id: int, cutoff_time: datetime) -> List[dict]:
+        """
+        Readings for an asset stamped at or after `cutoff_time`, newest first, with
+        their id and parsed `time`. Stored timestamps are not ISO-sortable, so rows
+        are walked newest-id first and the walk stops at the first older one.
+        """
+        cursor = self.conn.execute(
+            "SELECT id, data, timestamp FROM readings WHERE asset_id = ? ORDER BY id DESC",
+            (asset_id,),
+        )
+        readings = []
+        for row in cursor:
+            reading_time = parse_reading_time(row['timestamp'])
+            if reading_time is None:
+                continue
+            if reading_time < cutoff_time:
+                break
+            try:
+                data = json.loads(row['data']) if isinstance(row['data'], str) else row['data']
+            except (ValueError, TypeError):
+                continue
+            readings.append({"id": row['id'], "data": data, "timestamp": row['timestamp'], "time": reading_time})
+        return readings
+
+    def get_readings_after_id(self, asset_ids: List[int], after_id: int) -> List[dict]:
+        """Readings of `asset_ids` with id above `after_id`, oldest first, with their parsed `time`."""
+        readings = []
+        for start in range(0, len(asset_ids), 900):
+            chunk = asset_ids[start:start + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = self.conn.execute(
+                f"SELECT id, asset_id, data, timestamp FROM readings "
+                f"WHERE asset_id IN ({placeholders}) AND id > ? ORDER BY id",
+                (*chunk, after_id),
+            )
+            for row in cursor:
                 try:
-                    data = json.loads(row[0]) if isinstance(row[0], str) else row[0]
-                    readings.append({"data": data, "timestamp": row[1]})
-                except:
+                    data = json.loads(row['data']) if isinstance(row['data'], str) else row['data']
+                except (ValueError, TypeError):
                     continue
-            return readings
-
-    async def get_previous_reading(self, asset_id: int):
-        """Get the most recent reading for an asset"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("""
-                SELECT data, timestamp FROM readings
-                WHERE asset_id = ?
-                ORDER BY timestamp DESC
-                LIMIT 2
-            """, (asset_id,))
-
-            rows = await cursor.fetchall()
-            if len(rows) >= 2:
-                data = json.loads(rows[1][0]) if isinstance(rows[1][0], str) else rows[1][0]
-                return {"data": data, "timestamp": rows[1][1]}
-            return None
-
-    async def has_active_composite_alarm(self, asset_id: int, composite_rule_id: str, severity: str) -> bool:
+                readings.append({
+                    "id": row['id'],
+                    "asset_id": row['asset_id'],
+                    "data": data,
+                    "timestamp": row['timestamp'],
+                    "time": parse_reading_time(row['timestamp']),
+                })
+        readings.sort(key=lambda reading: reading["id"])
+        return readings
+
+    def get_previous_reading(self, asset_id: int):
+        """Get the reading before the latest one for an asset (ids give the order; timestamps don't sort)"""
+        rows = self.conn.execute("""
+            SELECT data, timestamp FROM readings
+            WHERE asset_id = ?
+            ORDER BY id DESC
+            LIMIT 2
+        """, (asset_id,)).fetchall()
+        if len(rows) >= 2:
+            data = json.loads(rows[1][0]) if isinstance(rows[1][0], str) else rows[1][0]
+            return {"data": data, "timestamp": rows[1][1]}
+        return None
+
+    def has_active_composite_alarm(self, asset_id: int, composite_rule_id: str, severity: str) -> bool:
         """Check for existing active/acknowledged composite alarm for an asset."""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                """
-                SELECT 1 FROM alarms
-                WHERE asset_id = ?
-                  AND composite_rule_id = ?
-                  AND severity = ?
+        cursor = self.conn.execute(
+            """
+            SELECT 1 FROM alarms
+            WHERE asset_id = ?
+              AND composite_rule_id = ?
+              AND severity = ?
+              AND status IN ('active', 'acknowledged')
+            LIMIT 1
+            """,
+            (asset_id, composite_rule_id, severity)
+        )
+        return cursor.fetchone() is not None
+
+    def get_active_composite_fingerprints(self, asset_ids: List[int]) -> Set[Tuple[int, str, str]]:
+        """`(asset_id, composite_rule_id, severity)` of every active/acknowledged composite alarm of these assets."""
+        fingerprints = set()
+        for start in range(0, len(asset_ids), 900):
+            chunk = asset_ids[start:start + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = self.conn.cursor()
+            cursor.row_factory = None  # plain tuples
+            cursor.execute(
+                f"""
+                SELECT asset_id, composite_rule_id, severity FROM alarms
+                WHERE asset_id IN ({placeholders})
+                  AND composite_rule_id IS NOT NULL
                   AND status IN ('active', 'acknowledged')
-                LIMIT 1
                 """,
-                (asset_id, composite_rule_id, severity)
+                chunk,
             )
-            return await cursor.fetchone() is not None
+            fingerprints.update(cursor)
+        return fingerprints
 
-    async def create_alarm(self, alarm: Alarm):
+    def create_alarm(self, alarm: Alarm):
         """Create a new alarm"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
+        self.create_alarms([alarm])
+
+    def create_alarms(self, alarms: List[Alarm]):
+        """Create alarms in one transaction"""
+        if not alarms:
+            return
+        db = self.conn
+        try:
+            db.executemany("""
                 INSERT INTO alarms
                 (id, timestamp, site, region, severity, category, message, status,
                  composite_rule_id, asset_id, conditions_met, total_conditions)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                alarm.id,
-                alarm.timestamp.isoformat(),
-                alarm.site,
-                alarm.region,
-                alarm.severity,
-                alarm.category,
-                alarm.message,
-                alarm.status,
-                alarm.composite_rule_id,
-                alarm.asset_id,
-                alarm.conditions_met,
-                alarm.total_conditions
-            ))
-            await db.commit()
-
-    async def get_alarms(
+            """, [
+                (
+                    alarm.id,
+                    alarm.timestamp.isoformat(),
+                    alarm.site,
+                    alarm.region,
+                    alarm.severity,
+                    alarm.category,
+                    alarm.message,
+                    alarm.status,
+                    alarm.composite_rule_id,
+                    alarm.asset_id,
+                    alarm.conditions_met,
+                    alarm.total_conditions
+                )
+                for alarm in alarms
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def get_alarms(
         self,
         status: str = "active",
         severity: Optional[str] = None,
         site: Optional[str] = None
     ) -> List[dict]:
         """Get alarms with filters"""
-        async with aiosqlite.connect(self.db_path) as db:
-            query = "SELECT * FROM alarms WHERE status = ?"
-            params = [status]
-
-            if severity:
-                query += " AND severity = ?"
-                params.append(severity)
-
-            if site:
-                query += " AND site = ?"
-                params.append(site)
-
-            query += " ORDER BY timestamp DESC LIMIT 1000"
+        query = "SELECT * FROM alarms WHERE status = ?"
+        params = [status]
 
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
+        if severity:
+            query += " AND severity = ?"
+            params.append(severity)
 
-            # Get column names
-            columns = [description[0] for description in cursor.description]
+        if site:
+            query += " AND site = ?"
+            params.append(site)
 
-            alarms = []
-            for row in rows:
-                alarm = dict(zip(columns, row))
-                alarms.append(alarm)
+        query += " ORDER BY timestamp DESC LIMIT 1000"
 
-            return alarms
+        return [dict(row) for row in self.conn.execute(query, params).fetchall()]
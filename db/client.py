@@ -1,6 +1,7 @@
 import sqlite3
 import os
 import threading
+from contextlib import contextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -55,6 +56,42 @@ def get_database() -> sqlite3.Connection:
 
     return _thread_local.connection
 
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, _statement: str):
+        self.count += 1
+
+
+@contextmanager
+def count_statements():
+    """
+    Count SQL statements run on this thread's connection inside the block.
+
+    Every execution is counted, so an `executemany` over N rows counts N times.
+    """
+    db = get_database()
+    counter = StatementCounter()
+    db.set_trace_callback(counter)
+    try:
+        yield counter
+    finally:
+        db.set_trace_callback(None)
+
+_rules_version = 0
+_rules_version_lock = threading.Lock()
+
+def bump_rules_version() -> int:
+    """Record a composite-rule or threshold write so cached rule sets reload."""
+    global _rules_version
+    with _rules_version_lock:
+        _rules_version += 1
+        return _rules_version
+
+def get_rules_version() -> int:
+    return _rules_version
+
 def ensure_column(db, table: str, column: str, ddl: str):
     cursor = db.execute(f"PRAGMA table_info({table})")
     columns = {row[1] for row in cursor.fetchall()}
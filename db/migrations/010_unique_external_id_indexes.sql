@@ -0,0 +1,52 @@
+-- Enforce one local row per IHS external id so sync can upsert with
+-- INSERT ... ON CONFLICT(external_id). Existing duplicates are collapsed onto
+-- the lowest local id first.
+
+-- Sites: repoint assets at the surviving site, then drop the duplicates.
+UPDATE assets
+SET site_id = (
+  SELECT MIN(keep.id) FROM sites keep
+  WHERE keep.external_id = (SELECT dup.external_id FROM sites dup WHERE dup.id = assets.site_id)
+)
+WHERE site_id IN (
+  SELECT id FROM sites
+  WHERE external_id IS NOT NULL
+    AND id NOT IN (SELECT MIN(id) FROM sites WHERE external_id IS NOT NULL GROUP BY external_id)
+);
+
+DELETE FROM sites
+WHERE external_id IS NOT NULL
+  AND id NOT IN (SELECT MIN(id) FROM sites WHERE external_id IS NOT NULL GROUP BY external_id);
+
+-- Assets: repoint readings and alarms at the surviving asset, then drop the duplicates.
+UPDATE readings
+SET asset_id = (
+  SELECT MIN(keep.id) FROM assets keep
+  WHERE keep.external_id = (SELECT dup.external_id FROM assets dup WHERE dup.id = readings.asset_id)
+)
+WHERE asset_id IN (
+  SELECT id FROM assets
+  WHERE external_id IS NOT NULL
+    AND id NOT IN (SELECT MIN(id) FROM assets WHERE external_id IS NOT NULL GROUP BY external_id)
+);
+
+UPDATE alarms
+SET asset_id = (
+  SELECT MIN(keep.id) FROM assets keep
+  WHERE keep.external_id = (SELECT dup.external_id FROM assets dup WHERE dup.id = alarms.asset_id)
+)
+WHERE asset_id IN (
+  SELECT id FROM assets
+  WHERE external_id IS NOT NULL
+    AND id NOT IN (SELECT MIN(id) FROM assets WHERE external_id IS NOT NULL GROUP BY external_id)
+);
+
+DELETE FROM assets
+WHERE external_id IS NOT NULL
+  AND id NOT IN (SELECT MIN(id) FROM assets WHERE external_id IS NOT NULL GROUP BY external_id);
+
+-- Replace the plain lookup indexes from 003 with unique ones.
+DROP INDEX IF EXISTS idx_sites_external_id;
+DROP INDEX IF EXISTS idx_assets_external_id;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sites_external_id_unique ON sites(external_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_assets_external_id_unique ON assets(external_id);
@@ -0,0 +1,9 @@
+-- Content hash of the last row written by the IHS sync, per site/asset.
+-- Lets the sync skip writes for records whose payload has not changed.
+CREATE TABLE IF NOT EXISTS sync_record_hashes (
+  entity TEXT NOT NULL,
+  external_id INTEGER NOT NULL,
+  content_hash TEXT NOT NULL,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (entity, external_id)
+);
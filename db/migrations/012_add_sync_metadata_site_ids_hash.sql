@@ -0,0 +1,3 @@
+-- Fingerprint of the external site id set seen by the last successful sync,
+-- so stale-site pruning only runs when that set changes.
+ALTER TABLE sync_metadata ADD COLUMN site_ids_hash TEXT;
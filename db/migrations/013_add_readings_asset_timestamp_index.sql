@@ -0,0 +1,3 @@
+-- Lookup index for de-duplicating readings on (asset_id, source timestamp).
+-- Not UNIQUE: existing duplicates are removed by scripts/compact_readings.py.
+CREATE INDEX IF NOT EXISTS idx_readings_asset_timestamp ON readings(asset_id, timestamp);
@@ -0,0 +1,32 @@
+-- Readings rollup tiers: per-asset, per-numeric-field aggregates of raw
+-- readings that have aged out of the raw retention window.
+CREATE TABLE IF NOT EXISTS readings_hourly (
+  asset_id INTEGER NOT NULL,
+  bucket_start TEXT NOT NULL,
+  field TEXT NOT NULL,
+  min_value REAL,
+  max_value REAL,
+  avg_value REAL,
+  sum_value REAL,
+  last_value REAL,
+  sample_count INTEGER NOT NULL DEFAULT 0,
+  last_reading_id INTEGER,
+  PRIMARY KEY (asset_id, bucket_start, field)
+);
+
+CREATE TABLE IF NOT EXISTS readings_daily (
+  asset_id INTEGER NOT NULL,
+  bucket_start TEXT NOT NULL,
+  field TEXT NOT NULL,
+  min_value REAL,
+  max_value REAL,
+  avg_value REAL,
+  sum_value REAL,
+  last_value REAL,
+  sample_count INTEGER NOT NULL DEFAULT 0,
+  last_reading_id INTEGER,
+  PRIMARY KEY (asset_id, bucket_start, field)
+);
+
+CREATE INDEX IF NOT EXISTS idx_readings_hourly_bucket ON readings_hourly(bucket_start);
+CREATE INDEX IF NOT EXISTS idx_readings_daily_bucket ON readings_daily(bucket_start);
@@ -0,0 +1,32 @@
+-- Typed metric columns decoded from readings.data at ingest
+-- (services/reading_metrics.py). Existing rows are filled in by
+-- scripts/backfill_reading_metrics.py.
+ALTER TABLE readings ADD COLUMN voltage_l1 REAL;
+ALTER TABLE readings ADD COLUMN voltage_l2 REAL;
+ALTER TABLE readings ADD COLUMN voltage_l3 REAL;
+ALTER TABLE readings ADD COLUMN frequency REAL;
+ALTER TABLE readings ADD COLUMN ac_power REAL;
+ALTER TABLE readings ADD COLUMN gen_power REAL;
+ALTER TABLE readings ADD COLUMN dc_voltage REAL;
+ALTER TABLE readings ADD COLUMN battery_power REAL;
+ALTER TABLE readings ADD COLUMN solar_power REAL;
+ALTER TABLE readings ADD COLUMN battery_voltage REAL;
+ALTER TABLE readings ADD COLUMN solar_voltage REAL;
+ALTER TABLE readings ADD COLUMN battery_current REAL;
+ALTER TABLE readings ADD COLUMN solar_current REAL;
+ALTER TABLE readings ADD COLUMN battery_soc REAL;
+ALTER TABLE readings ADD COLUMN rectifier_dc_voltage REAL;
+ALTER TABLE readings ADD COLUMN rectifier_dc_current REAL;
+ALTER TABLE readings ADD COLUMN fuel_level REAL;
+ALTER TABLE readings ADD COLUMN fuel_depth_cm REAL;
+ALTER TABLE readings ADD COLUMN temperature REAL;
+ALTER TABLE readings ADD COLUMN runtime_hours REAL;
+ALTER TABLE readings ADD COLUMN channel_power_1 REAL;
+ALTER TABLE readings ADD COLUMN channel_power_2 REAL;
+ALTER TABLE readings ADD COLUMN channel_power_3 REAL;
+ALTER TABLE readings ADD COLUMN channel_power_4 REAL;
+ALTER TABLE readings ADD COLUMN channel_current_1 REAL;
+ALTER TABLE readings ADD COLUMN channel_current_2 REAL;
+ALTER TABLE readings ADD COLUMN channel_current_3 REAL;
+ALTER TABLE readings ADD COLUMN channel_current_4 REAL;
+ALTER TABLE readings ADD COLUMN metrics_version INTEGER;
@@ -0,0 +1,181 @@
+-- Latest reading per asset, kept current by triggers on `readings` so every
+-- writer (sync ingest, retention, compaction, metric backfill) stays consistent.
+-- Lets "latest per asset" reads be primary-key lookups instead of window scans.
+CREATE TABLE IF NOT EXISTS latest_readings (
+  asset_id INTEGER PRIMARY KEY,
+  reading_id INTEGER NOT NULL,
+  reading_type TEXT,
+  timestamp DATETIME,
+  data TEXT,
+  created_at DATETIME,
+  voltage_l1 REAL,
+  voltage_l2 REAL,
+  voltage_l3 REAL,
+  frequency REAL,
+  ac_power REAL,
+  gen_power REAL,
+  dc_voltage REAL,
+  battery_power REAL,
+  solar_power REAL,
+  battery_voltage REAL,
+  solar_voltage REAL,
+  battery_current REAL,
+  solar_current REAL,
+  battery_soc REAL,
+  rectifier_dc_voltage REAL,
+  rectifier_dc_current REAL,
+  fuel_level REAL,
+  fuel_depth_cm REAL,
+  temperature REAL,
+  runtime_hours REAL,
+  channel_power_1 REAL,
+  channel_power_2 REAL,
+  channel_power_3 REAL,
+  channel_power_4 REAL,
+  channel_current_1 REAL,
+  channel_current_2 REAL,
+  channel_current_3 REAL,
+  channel_current_4 REAL,
+  metrics_version INTEGER
+);
+
+-- Newer ingest replaces the asset's row; out-of-order (older) inserts are ignored.
+CREATE TRIGGER IF NOT EXISTS trg_readings_latest_insert AFTER INSERT ON readings
+BEGIN
+  INSERT INTO latest_readings (
+    asset_id, reading_id, reading_type, timestamp, data, created_at, voltage_l1, voltage_l2,
+    voltage_l3, frequency, ac_power, gen_power, dc_voltage, battery_power, solar_power,
+    battery_voltage, solar_voltage, battery_current, solar_current, battery_soc,
+    rectifier_dc_voltage, rectifier_dc_current, fuel_level, fuel_depth_cm, temperature,
+    runtime_hours, channel_power_1, channel_power_2, channel_power_3, channel_power_4,
+    channel_current_1, channel_current_2, channel_current_3, channel_current_4, metrics_version
+  ) VALUES (
+    NEW.asset_id, NEW.id, NEW.reading_type, NEW.timestamp, NEW.data, NEW.created_at,
+    NEW.voltage_l1, NEW.voltage_l2, NEW.voltage_l3, NEW.frequency, NEW.ac_power, NEW.gen_power,
+    NEW.dc_voltage, NEW.battery_power, NEW.solar_power, NEW.battery_voltage, NEW.solar_voltage,
+    NEW.battery_current, NEW.solar_current, NEW.battery_soc, NEW.rectifier_dc_voltage,
+    NEW.rectifier_dc_current, NEW.fuel_level, NEW.fuel_depth_cm, NEW.temperature,
+    NEW.runtime_hours, NEW.channel_power_1, NEW.channel_power_2, NEW.channel_power_3,
+    NEW.channel_power_4, NEW.channel_current_1, NEW.channel_current_2, NEW.channel_current_3,
+    NEW.channel_current_4, NEW.metrics_version
+  )
+  ON CONFLICT(asset_id) DO UPDATE SET
+    reading_id = excluded.reading_id,
+    reading_type = excluded.reading_type,
+    timestamp = excluded.timestamp,
+    data = excluded.data,
+    created_at = excluded.created_at,
+    voltage_l1 = excluded.voltage_l1,
+    voltage_l2 = excluded.voltage_l2,
+    voltage_l3 = excluded.voltage_l3,
+    frequency = excluded.frequency,
+    ac_power = excluded.ac_power,
+    gen_power = excluded.gen_power,
+    dc_voltage = excluded.dc_voltage,
+    battery_power = excluded.battery_power,
+    solar_power = excluded.solar_power,
+    battery_voltage = excluded.battery_voltage,
+    solar_voltage = excluded.solar_voltage,
+    battery_current = excluded.battery_current,
+    solar_current = excluded.solar_current,
+    battery_soc = excluded.battery_soc,
+    rectifier_dc_voltage = excluded.rectifier_dc_voltage,
+    rectifier_dc_current = excluded.rectifier_dc_current,
+    fuel_level = excluded.fuel_level,
+    fuel_depth_cm = excluded.fuel_depth_cm,
+    temperature = excluded.temperature,
+    runtime_hours = excluded.runtime_hours,
+    channel_power_1 = excluded.channel_power_1,
+    channel_power_2 = excluded.channel_power_2,
+    channel_power_3 = excluded.channel_power_3,
+    channel_power_4 = excluded.channel_power_4,
+    channel_current_1 = excluded.channel_current_1,
+    channel_current_2 = excluded.channel_current_2,
+    channel_current_3 = excluded.channel_current_3,
+    channel_current_4 = excluded.channel_current_4,
+    metrics_version = excluded.metrics_version
+  WHERE excluded.reading_id > latest_readings.reading_id;
+END;
+
+-- Keep the copy in sync when the latest row itself is rewritten (e.g. metric backfill).
+CREATE TRIGGER IF NOT EXISTS trg_readings_latest_update AFTER UPDATE ON readings
+WHEN NEW.id = (SELECT reading_id FROM latest_readings WHERE asset_id = NEW.asset_id)
+BEGIN
+  UPDATE latest_readings SET
+    reading_type = NEW.reading_type,
+    timestamp = NEW.timestamp,
+    data = NEW.data,
+    created_at = NEW.created_at,
+    voltage_l1 = NEW.voltage_l1,
+    voltage_l2 = NEW.voltage_l2,
+    voltage_l3 = NEW.voltage_l3,
+    frequency = NEW.frequency,
+    ac_power = NEW.ac_power,
+    gen_power = NEW.gen_power,
+    dc_voltage = NEW.dc_voltage,
+    battery_power = NEW.battery_power,
+    solar_power = NEW.solar_power,
+    battery_voltage = NEW.battery_voltage,
+    solar_voltage = NEW.solar_voltage,
+    battery_current = NEW.battery_current,
+    solar_current = NEW.solar_current,
+    battery_soc = NEW.battery_soc,
+    rectifier_dc_voltage = NEW.rectifier_dc_voltage,
+    rectifier_dc_current = NEW.rectifier_dc_current,
+    fuel_level = NEW.fuel_level,
+    fuel_depth_cm = NEW.fuel_depth_cm,
+    temperature = NEW.temperature,
+    runtime_hours = NEW.runtime_hours,
+    channel_power_1 = NEW.channel_power_1,
+    channel_power_2 = NEW.channel_power_2,
+    channel_power_3 = NEW.channel_power_3,
+    channel_power_4 = NEW.channel_power_4,
+    channel_current_1 = NEW.channel_current_1,
+    channel_current_2 = NEW.channel_current_2,
+    channel_current_3 = NEW.channel_current_3,
+    channel_current_4 = NEW.channel_current_4,
+    metrics_version = NEW.metrics_version
+  WHERE asset_id = NEW.asset_id;
+END;
+
+-- Deleting an asset's latest reading falls back to its newest remaining one.
+CREATE TRIGGER IF NOT EXISTS trg_readings_latest_delete AFTER DELETE ON readings
+WHEN OLD.id = (SELECT reading_id FROM latest_readings WHERE asset_id = OLD.asset_id)
+BEGIN
+  DELETE FROM latest_readings WHERE asset_id = OLD.asset_id;
+  INSERT INTO latest_readings (
+    asset_id, reading_id, reading_type, timestamp, data, created_at, voltage_l1, voltage_l2,
+    voltage_l3, frequency, ac_power, gen_power, dc_voltage, battery_power, solar_power,
+    battery_voltage, solar_voltage, battery_current, solar_current, battery_soc,
+    rectifier_dc_voltage, rectifier_dc_current, fuel_level, fuel_depth_cm, temperature,
+    runtime_hours, channel_power_1, channel_power_2, channel_power_3, channel_power_4,
+    channel_current_1, channel_current_2, channel_current_3, channel_current_4, metrics_version
+  )
+  SELECT
+    asset_id, id, reading_type, timestamp, data, created_at, voltage_l1, voltage_l2,
+    voltage_l3, frequency, ac_power, gen_power, dc_voltage, battery_power, solar_power,
+    battery_voltage, solar_voltage, battery_current, solar_current, battery_soc,
+    rectifier_dc_voltage, rectifier_dc_current, fuel_level, fuel_depth_cm, temperature,
+    runtime_hours, channel_power_1, channel_power_2, channel_power_3, channel_power_4,
+    channel_current_1, channel_current_2, channel_current_3, channel_current_4, metrics_version
+  FROM readings WHERE asset_id = OLD.asset_id ORDER BY id DESC LIMIT 1;
+END;
+
+-- Populate from existing readings.
+INSERT OR REPLACE INTO latest_readings (
+  asset_id, reading_id, reading_type, timestamp, data, created_at, voltage_l1, voltage_l2,
+  voltage_l3, frequency, ac_power, gen_power, dc_voltage, battery_power, solar_power,
+  battery_voltage, solar_voltage, battery_current, solar_current, battery_soc,
+  rectifier_dc_voltage, rectifier_dc_current, fuel_level, fuel_depth_cm, temperature,
+  runtime_hours, channel_power_1, channel_power_2, channel_power_3, channel_power_4,
+  channel_current_1, channel_current_2, channel_current_3, channel_current_4, metrics_version
+)
+SELECT
+  asset_id, id, reading_type, timestamp, data, created_at, voltage_l1, voltage_l2, voltage_l3,
+  frequency, ac_power, gen_power, dc_voltage, battery_power, solar_power, battery_voltage,
+  solar_voltage, battery_current, solar_current, battery_soc, rectifier_dc_voltage,
+  rectifier_dc_current, fuel_level, fuel_depth_cm, temperature, runtime_hours, channel_power_1,
+  channel_power_2, channel_power_3, channel_power_4, channel_current_1, channel_current_2,
+  channel_current_3, channel_current_4, metrics_version
+FROM readings
+WHERE id IN (SELECT MAX(id) FROM readings GROUP BY asset_id);
@@ -0,0 +1,5 @@
+-- Covers the open-alarm fingerprint lookup used for alarm deduplication, and the
+-- cold-start load of the in-memory index, without touching the table rows.
+CREATE INDEX IF NOT EXISTS idx_alarms_open_fingerprint
+  ON alarms(asset_id, threshold_id, severity, id)
+  WHERE status IN ('active', 'acknowledged');
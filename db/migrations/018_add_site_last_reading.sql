@@ -0,0 +1,58 @@
+-- Newest reading id per site, kept current by triggers on `latest_readings` and
+-- `assets`. Scope resolution ranks sites by recent telemetry from this index
+-- instead of grouping the readings table by site.
+CREATE TABLE IF NOT EXISTS site_last_reading (
+  site_id INTEGER PRIMARY KEY,
+  reading_id INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_site_last_reading_reading ON site_last_reading(reading_id);
+
+-- A newer latest reading raises its site's id.
+CREATE TRIGGER IF NOT EXISTS trg_site_last_reading_insert AFTER INSERT ON latest_readings
+BEGIN
+  INSERT INTO site_last_reading (site_id, reading_id)
+  SELECT site_id, NEW.reading_id FROM assets WHERE id = NEW.asset_id AND site_id IS NOT NULL
+  ON CONFLICT(site_id) DO UPDATE SET reading_id = excluded.reading_id
+  WHERE excluded.reading_id > site_last_reading.reading_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_site_last_reading_update AFTER UPDATE OF reading_id ON latest_readings
+BEGIN
+  INSERT INTO site_last_reading (site_id, reading_id)
+  SELECT site_id, NEW.reading_id FROM assets WHERE id = NEW.asset_id AND site_id IS NOT NULL
+  ON CONFLICT(site_id) DO UPDATE SET reading_id = excluded.reading_id
+  WHERE excluded.reading_id > site_last_reading.reading_id;
+END;
+
+-- Losing a latest reading, or an asset moving between sites, recomputes the
+-- sites involved from their assets' latest readings. (Foreign keys keep assets
+-- from being added after, or deleted before, their readings.)
+CREATE TRIGGER IF NOT EXISTS trg_site_last_reading_delete AFTER DELETE ON latest_readings
+BEGIN
+  DELETE FROM site_last_reading
+  WHERE site_id = (SELECT site_id FROM assets WHERE id = OLD.asset_id);
+  INSERT INTO site_last_reading (site_id, reading_id)
+  SELECT a.site_id, MAX(l.reading_id)
+  FROM assets a JOIN latest_readings l ON l.asset_id = a.id
+  WHERE a.site_id = (SELECT site_id FROM assets WHERE id = OLD.asset_id)
+  GROUP BY a.site_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_site_last_reading_asset_move AFTER UPDATE OF site_id ON assets
+WHEN OLD.site_id IS NOT NEW.site_id
+BEGIN
+  DELETE FROM site_last_reading WHERE site_id IN (OLD.site_id, NEW.site_id);
+  INSERT INTO site_last_reading (site_id, reading_id)
+  SELECT a.site_id, MAX(l.reading_id)
+  FROM assets a JOIN latest_readings l ON l.asset_id = a.id
+  WHERE a.site_id IN (OLD.site_id, NEW.site_id)
+  GROUP BY a.site_id;
+END;
+
+-- Populate from existing readings.
+INSERT OR REPLACE INTO site_last_reading (site_id, reading_id)
+SELECT a.site_id, MAX(l.reading_id)
+FROM assets a JOIN latest_readings l ON l.asset_id = a.id
+WHERE a.site_id IS NOT NULL
+GROUP BY a.site_id;
@@ -0,0 +1,57 @@
+-- Change counters for the tables dashboard responses are built from, bumped by
+-- triggers so every writer (sync, alarm evaluation, manual edits) and every
+-- worker process sees the same value. Readings need none: their MAX(id) moves
+-- on every ingest.
+CREATE TABLE IF NOT EXISTS data_generations (
+  domain TEXT PRIMARY KEY,
+  generation INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO data_generations (domain, generation) VALUES ('sites', 0), ('alarms', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_sites_insert AFTER INSERT ON sites
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'sites';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_sites_update AFTER UPDATE ON sites
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'sites';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_sites_delete AFTER DELETE ON sites
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'sites';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_assets_insert AFTER INSERT ON assets
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'sites';
+END;
+
+-- Not `last_reading_timestamp`, which ingest rewrites on every batch.
+CREATE TRIGGER IF NOT EXISTS trg_generation_assets_update
+AFTER UPDATE OF external_id, name, type, site_id, tenant_channels, config ON assets
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'sites';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_assets_delete AFTER DELETE ON assets
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'sites';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_alarms_insert AFTER INSERT ON alarms
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'alarms';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_alarms_update AFTER UPDATE ON alarms
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'alarms';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_alarms_delete AFTER DELETE ON alarms
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'alarms';
+END;
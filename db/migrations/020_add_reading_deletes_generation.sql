@@ -0,0 +1,9 @@
+-- Counts deleted readings (retention, compaction, stale-site pruning, cache
+-- reset, manual deletes), so every process holding readings in memory, such as
+-- the historical-rule windows, sees that they are gone.
+INSERT OR IGNORE INTO data_generations (domain, generation) VALUES ('reading_deletes', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_readings_delete AFTER DELETE ON readings
+BEGIN
+  UPDATE data_generations SET generation = generation + 1 WHERE domain = 'reading_deletes';
+END;
@@ -1,6 +1,138 @@
-from typing import List, Optional, Dict, Any
+import os
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Dict, Any, Tuple
 from db.client import get_database
 
+OPEN_STATUSES = ('active', 'acknowledged')
+
+# How often lookups compare the index against the 'alarms' generation.
+OPEN_ALARM_INDEX_CHECK_SECONDS = float(os.getenv('OPEN_ALARM_INDEX_CHECK_SECONDS', '1'))
+
+# (asset_id, threshold_id, severity) of a threshold alarm
+Fingerprint = Tuple[int, str, str]
+
+
+def _fingerprint(alarm: Dict[str, Any]) -> Optional[Fingerprint]:
+    if alarm.get('status', 'active') not in OPEN_STATUSES:
+        return None
+    if alarm.get('asset_id') is None or alarm.get('threshold_id') is None:
+        return None
+    return (alarm['asset_id'], alarm['threshold_id'], alarm['severity'])
+
+
+class OpenAlarmIndex:
+    """
+    Fingerprints of open (active/acknowledged) threshold alarms, held in memory so
+    alarm deduplication is a set lookup instead of a query.
+
+    Loaded from the database on first use (warmed at startup) and kept current by
+    `AlarmRepository` writes. Every row written to `alarms` bumps the 'alarms'
+    generation (`data_generations`, migration 019); the index counts the rows its
+    own writes changed, so a generation it cannot account for means someone else
+    (a script such as `import_alarms.py`, another worker, raw SQL) changed alarms,
+    and it reloads. The generation is checked at most every
+    `OPEN_ALARM_INDEX_CHECK_SECONDS`; `invalidate()` forces a reload at once.
+    """
+
+    def __init__(self, check_seconds: float = OPEN_ALARM_INDEX_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._by_alarm: Optional[Dict[str, Fingerprint]] = None
+        self._counts: Counter = Counter()
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _current_generation() -> int:
+        row = get_database().execute(
+            "SELECT generation FROM data_generations WHERE domain = 'alarms'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def load(self):
+        db = get_database()
+        # Read before the rows: a write landing in between only costs one more reload.
+        generation = self._current_generation()
+        cursor = db.execute('''
+            SELECT id, asset_id, threshold_id, severity FROM alarms
+            WHERE status IN ('active', 'acknowledged')
+              AND asset_id IS NOT NULL
+              AND threshold_id IS NOT NULL
+        ''')
+        by_alarm = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+        with self._lock:
+            self._by_alarm = by_alarm
+            self._counts = Counter(by_alarm.values())
+            self._generation = generation
+            self._checked_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._by_alarm is None:
+            self.load()
+        elif time.monotonic() - self._checked_at >= self.check_seconds:
+            self._checked_at = time.monotonic()
+            if self._current_generation() != self._generation:
+                self.load()
+
+    def invalidate(self):
+        with self._lock:
+            self._by_alarm = None
+            self._counts = Counter()
+
+    def note_writes(self, rows: int):
+        """Account for `rows` alarm rows this process wrote and applied to the index."""
+        with self._lock:
+            if self._generation is not None:
+                self._generation += rows
+
+    def contains(self, fingerprint: Fingerprint) -> bool:
+        self._ensure_loaded()
+        return self._counts[fingerprint] > 0
+
+    def add(self, alarm_id: str, fingerprint: Fingerprint):
+        self._ensure_loaded()
+        with self._lock:
+            self._discard(alarm_id)
+            self._by_alarm[alarm_id] = fingerprint
+            self._counts[fingerprint] += 1
+
+    def discard(self, alarm_id: str):
+        if self._by_alarm is None:
+            return
+        with self._lock:
+            self._discard(alarm_id)
+
+    def discard_threshold(self, threshold_id: str):
+        if self._by_alarm is None:
+            return
+        with self._lock:
+            for alarm_id in [a for a, fp in self._by_alarm.items() if fp[1] == threshold_id]:
+                self._discard(alarm_id)
+
+    def clear(self):
+        with self._lock:
+            self._by_alarm = {}
+            self._counts = Counter()
+
+    def _discard(self, alarm_id: str):
+        if self._by_alarm is None:
+            return
+        fingerprint = self._by_alarm.pop(alarm_id, None)
+        if fingerprint is not None:
+            self._counts[fingerprint] -= 1
+            if self._counts[fingerprint] <= 0:
+                del self._counts[fingerprint]
+
+
+_open_alarm_index = OpenAlarmIndex()
+
+
+def get_open_alarm_index() -> OpenAlarmIndex:
+    return _open_alarm_index
+
+
 class AlarmRepository:
     def get_all(self, status: Optional[str] = None, severity: Optional[str] = None,
                 category: Optional[str] = None, site: Optional[str] = None,
@@ -63,6 +195,53 @@ class AlarmRepository:
             alarm.get('source', 'excel')
         ))
         db.commit()
+        get_open_alarm_index().note_writes(1)
+        self._track(alarm)
+
+    def create_many(self, alarms: List[Dict[str, Any]], commit: bool = True) -> int:
+        if not alarms:
+            return 0
+        db = get_database()
+        db.executemany('''
+            INSERT INTO alarms (
+                id, timestamp, site, region, severity, category, message, status,
+                details, threshold_id, asset_id, reading_id, source
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                alarm['id'],
+                alarm['timestamp'],
+                alarm['site'],
+                alarm.get('region'),
+                alarm['severity'],
+                alarm['category'],
+                alarm['message'],
+                alarm['status'],
+                alarm.get('details'),
+                alarm.get('threshold_id'),
+                alarm.get('asset_id'),
+                alarm.get('reading_id'),
+                alarm.get('source', 'excel'),
+            )
+            for alarm in alarms
+        ])
+        if commit:
+            db.commit()
+        # With commit=False the caller must `get_open_alarm_index().invalidate()` if it rolls back.
+        get_open_alarm_index().note_writes(len(alarms))
+        for alarm in alarms:
+            self._track(alarm)
+        return len(alarms)
+
+    def has_open_alarm(self, asset_id: int, threshold_id: str, severity: str) -> bool:
+        """Whether an active/acknowledged alarm exists for this fingerprint (in-memory lookup)."""
+        return get_open_alarm_index().contains((asset_id, threshold_id, severity))
+
+    @staticmethod
+    def _track(alarm: Dict[str, Any]):
+        fingerprint = _fingerprint(alarm)
+        if fingerprint is not None:
+            get_open_alarm_index().add(alarm['id'], fingerprint)
 
     def get_all_with_threshold_info(self, status: Optional[str] = None, severity: Optional[str] = None,
                                      category: Optional[str] = None, site: Optional[str] = None,
@@ -154,6 +333,8 @@ class AlarmRepository:
               AND status IN ('active', 'acknowledged')
         ''', (threshold_id,))
         db.commit()
+        get_open_alarm_index().note_writes(cursor.rowcount)
+        get_open_alarm_index().discard_threshold(threshold_id)
         return cursor.rowcount
 
     def archive_all(self, include_archived: bool = False) -> int:
@@ -168,33 +349,47 @@ class AlarmRepository:
         else:
             cursor = db.execute("UPDATE alarms SET status = 'archived' WHERE status != 'archived'")
         db.commit()
+        get_open_alarm_index().clear()
+        get_open_alarm_index().note_writes(cursor.rowcount)
         return cursor.rowcount
 
     def update_status(self, alarm_id: str, status: str, by: Optional[str] = None, resolution_notes: Optional[str] = None):
         db = get_database()
+        updated = 0
         if status == 'acknowledged':
-            db.execute('''
+            updated = db.execute('''
                 UPDATE alarms
                 SET status = ?, acknowledged_at = CURRENT_TIMESTAMP, acknowledged_by = ?
                 WHERE id = ?
-            ''', (status, by, alarm_id))
+            ''', (status, by, alarm_id)).rowcount
         elif status == 'resolved':
-            db.execute('''
+            updated = db.execute('''
                 UPDATE alarms
                 SET status = ?, resolved_at = CURRENT_TIMESTAMP, resolved_by = ?, resolution_notes = ?
                 WHERE id = ?
-            ''', (status, by, resolution_notes, alarm_id))
+            ''', (status, by, resolution_notes, alarm_id)).rowcount
         db.commit()
+        get_open_alarm_index().note_writes(updated)
+
+        alarm = self.get_by_id(alarm_id)
+        if alarm and _fingerprint(alarm):
+            self._track(alarm)
+        else:
+            get_open_alarm_index().discard(alarm_id)
 
     def delete(self, alarm_id: str):
         db = get_database()
-        db.execute('DELETE FROM alarms WHERE id = ?', (alarm_id,))
+        cursor = db.execute('DELETE FROM alarms WHERE id = ?', (alarm_id,))
         db.commit()
+        get_open_alarm_index().note_writes(cursor.rowcount)
+        get_open_alarm_index().discard(alarm_id)
 
     def delete_all(self) -> int:
         db = get_database()
         cursor = db.execute('DELETE FROM alarms')
         db.commit()
+        get_open_alarm_index().clear()
+        get_open_alarm_index().note_writes(cursor.rowcount)
         return cursor.rowcount
 
     def get_active_counts_by_site(self) -> Dict[str, int]:
@@ -48,6 +48,19 @@ class AssetRepository:
         row = cursor.fetchone()
         return dict(row) if row else None
 
+    def get_by_ids(self, asset_ids: List[int]) -> List[Dict]:
+        if not asset_ids:
+            return []
+        db = get_database()
+        assets: List[Dict] = []
+        # Avoid SQLite parameter limits by chunking.
+        for i in range(0, len(asset_ids), 900):
+            chunk = asset_ids[i:i + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = db.execute(f'SELECT * FROM assets WHERE id IN ({placeholders})', tuple(chunk))
+            assets.extend(dict(row) for row in cursor.fetchall())
+        return sorted(assets, key=lambda a: (a['site_id'], a['name']))
+
     def get_by_external_id(self, external_id: int) -> Optional[Dict]:
         db = get_database()
         cursor = db.execute('SELECT * FROM assets WHERE external_id = ?', (external_id,))
@@ -113,3 +126,49 @@ class AssetRepository:
         )
         db.commit()
         return cursor.lastrowid
+
+    def upsert_many_by_external_id(self, assets: List[Dict], commit: bool = True) -> Dict[int, int]:
+        """
+        Bulk upsert assets keyed by `external_id` in a single transaction.
+
+        Returns a mapping of external_id -> local asset id for every input row.
+        Pass `commit=False` to leave the transaction open for the caller.
+        """
+        if not assets:
+            return {}
+        db = get_database()
+        db.executemany('''
+            INSERT INTO assets (external_id, name, type, site_id, tenant_channels, config)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(external_id) DO UPDATE SET
+                name = excluded.name,
+                type = excluded.type,
+                site_id = excluded.site_id,
+                tenant_channels = excluded.tenant_channels,
+                config = excluded.config
+        ''', [
+            (
+                int(asset['external_id']),
+                asset['name'],
+                asset['type'],
+                asset['site_id'],
+                asset.get('tenant_channels'),
+                asset.get('config'),
+            )
+            for asset in assets
+        ])
+        if commit:
+            db.commit()
+        return self.get_id_map_by_external_ids([int(asset['external_id']) for asset in assets])
+
+    def get_id_map_by_external_ids(self, external_ids: List[int]) -> Dict[int, int]:
+        db = get_database()
+        id_map: Dict[int, int] = {}
+        unique_ids = list(dict.fromkeys(external_ids))
+        # Avoid SQLite parameter limits by chunking.
+        for i in range(0, len(unique_ids), 900):
+            chunk = unique_ids[i:i + 900]
+            placeholders = ",".join("?" for _ in chunk)
+            cursor = db.execute(f'SELECT external_id, id FROM assets WHERE external_id IN ({placeholders})', tuple(chunk))
+            id_map.update({int(row[0]): int(row[1]) for row in cursor.fetchall()})
+        return id_map
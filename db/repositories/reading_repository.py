@@ -1,16 +1,60 @@
-from typing import List, Optional, Dict, Any
+import logging
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from db.client import get_database
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+# Typed metric columns decoded from `data` at ingest (see services/reading_metrics.py).
+METRIC_COLUMNS = (
+    'voltage_l1', 'voltage_l2', 'voltage_l3', 'frequency', 'ac_power', 'gen_power',
+    'dc_voltage', 'battery_power', 'solar_power', 'battery_voltage', 'solar_voltage',
+    'battery_current', 'solar_current', 'battery_soc', 'rectifier_dc_voltage',
+    'rectifier_dc_current', 'fuel_level', 'fuel_depth_cm', 'temperature', 'runtime_hours',
+    'channel_power_1', 'channel_power_2', 'channel_power_3', 'channel_power_4',
+    'channel_current_1', 'channel_current_2', 'channel_current_3', 'channel_current_4',
+    'metrics_version',
+)
+
+
+# Called with the ids of assets that received new readings, after they are committed.
+IngestListener = Callable[[List[int]], None]
+_ingest_listeners: List[IngestListener] = []
+
+
+def add_ingest_listener(listener: IngestListener):
+    if listener not in _ingest_listeners:
+        _ingest_listeners.append(listener)
+
+
+def remove_ingest_listener(listener: IngestListener):
+    if listener in _ingest_listeners:
+        _ingest_listeners.remove(listener)
+
+
+def notify_ingest(asset_ids: List[int]):
+    if not asset_ids:
+        return
+    for listener in list(_ingest_listeners):
+        try:
+            listener(asset_ids)
+        except Exception as e:
+            logger.error(f"Reading ingest listener failed: {e}", exc_info=True)
+
+
 class ReadingRepository:
+    # `latest_readings` is kept current by triggers on `readings` (migration 016),
+    # so "latest per asset" is a primary-key lookup rather than a scan of history.
+    _LATEST_COLUMNS = 'reading_id AS id, asset_id, reading_type, timestamp, data, created_at'
+
     def get_latest_by_asset_id(self, asset_id: int) -> Optional[Dict]:
         db = get_database()
         cursor = db.execute(
-            '''
-            SELECT * FROM readings
-            WHERE asset_id = ?
-            ORDER BY id DESC
-            LIMIT 1
-            ''',
+            f'SELECT {self._LATEST_COLUMNS} FROM latest_readings WHERE asset_id = ?',
             (asset_id,),
         )
         row = cursor.fetchone()
@@ -21,25 +65,77 @@ class ReadingRepository:
             return []
 
         db = get_database()
-        placeholders = ','.join(['?'] * len(asset_ids))
+        rows: List[Dict] = []
+        # Avoid SQLite parameter limits by chunking.
+        for i in range(0, len(asset_ids), 900):
+            chunk = asset_ids[i:i + 900]
+            placeholders = ','.join(['?'] * len(chunk))
+            cursor = db.execute(
+                f'SELECT {self._LATEST_COLUMNS} FROM latest_readings WHERE asset_id IN ({placeholders})',
+                tuple(chunk),
+            )
+            rows.extend(dict(row) for row in cursor.fetchall())
+        return rows
 
-        # Use the autoincrement `id` as the recency source (timestamp strings may not be ISO-sortable).
-        cursor = db.execute(
-            f'''
-            SELECT id, asset_id, reading_type, timestamp, data, created_at
-            FROM (
-              SELECT
-                r.*,
-                ROW_NUMBER() OVER (PARTITION BY asset_id ORDER BY id DESC) as rn
-              FROM readings r
-              WHERE asset_id IN ({placeholders})
+    def get_latest_metrics_by_asset_ids(self, asset_ids: List[int], metrics_version: int) -> List[Dict]:
+        """
+        Latest reading per asset with its typed metric columns.
+
+        `data` is only returned for rows not yet decoded at `metrics_version`,
+        so callers can fall back to parsing it without loading every blob.
+        """
+        if not asset_ids:
+            return []
+
+        db = get_database()
+        rows: List[Dict] = []
+        for i in range(0, len(asset_ids), 900):
+            chunk = asset_ids[i:i + 900]
+            placeholders = ','.join(['?'] * len(chunk))
+            cursor = db.execute(
+                f'''
+                SELECT reading_id AS id, asset_id, reading_type, timestamp, {', '.join(METRIC_COLUMNS)},
+                  CASE WHEN metrics_version IS NULL OR metrics_version < ? THEN data END AS data
+                FROM latest_readings
+                WHERE asset_id IN ({placeholders})
+                ''',
+                (metrics_version, *chunk),
             )
-            WHERE rn = 1
+            rows.extend(dict(row) for row in cursor.fetchall())
+        return rows
+
+    def get_data_by_id(self, reading_id: int) -> Optional[str]:
+        db = get_database()
+        row = db.execute('SELECT data FROM readings WHERE id = ?', (reading_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_undecoded_after_id(self, after_id: int, metrics_version: int, limit: int) -> List[Dict]:
+        db = get_database()
+        cursor = db.execute(
+            '''
+            SELECT id, data FROM readings
+            WHERE id > ? AND (metrics_version IS NULL OR metrics_version < ?)
+            ORDER BY id
+            LIMIT ?
             ''',
-            tuple(asset_ids),
+            (after_id, metrics_version, limit),
         )
         return [dict(row) for row in cursor.fetchall()]
 
+    def update_metrics_many(self, metrics_by_id: Dict[int, Dict[str, Any]]) -> int:
+        if not metrics_by_id:
+            return 0
+        db = get_database()
+        db.executemany(
+            f"UPDATE readings SET {', '.join(f'{c} = ?' for c in METRIC_COLUMNS)} WHERE id = ?",
+            [
+                (*(metrics.get(column) for column in METRIC_COLUMNS), reading_id)
+                for reading_id, metrics in metrics_by_id.items()
+            ],
+        )
+        db.commit()
+        return len(metrics_by_id)
+
     def get_recent_by_asset_ids(self, asset_ids: List[int], limit_per_asset: int = 25) -> List[Dict]:
         if not asset_ids:
             return []
@@ -113,6 +209,139 @@ class ReadingRepository:
         db.commit()
         return cursor.lastrowid
 
+    def create_many(self, readings: Iterable[Dict[str, Any]], commit: bool = True) -> int:
+        """
+        Insert readings with one `executemany` and advance
+        `assets.last_reading_timestamp` for the touched assets in the same transaction.
+
+        A reading whose (asset_id, timestamp) is already stored is skipped, as is
+        one without a timestamp (the column is NOT NULL). Decoded metrics passed
+        under a reading's `metrics` key fill the typed columns. Returns the number
+        of rows actually inserted.
+
+        With `commit=True`, a failed batch is rolled back and retried row by row,
+        so one bad reading only loses itself, and ingest listeners are then told
+        which assets got a new reading. With `commit=False` a failure is raised
+        to the caller, which calls `notify_ingest` after its own commit.
+        """
+        rows = []
+        missing_timestamp = 0
+        for r in readings:
+            if r.get('timestamp') is None:
+                missing_timestamp += 1
+                continue
+            metrics = r.get('metrics') or {}
+            rows.append((
+                r['asset_id'], r['reading_type'], r['timestamp'], r['data'],
+                *(metrics.get(column) for column in METRIC_COLUMNS),
+                r['asset_id'], r['timestamp'],
+            ))
+        if missing_timestamp:
+            logger.warning(f"Skipped {missing_timestamp} readings without a timestamp")
+        if not rows:
+            return 0
+
+        # Drop already-stored readings up front so listeners only hear about assets
+        # that really changed; NOT EXISTS still guards against concurrent writers.
+        stored = self.get_existing_keys([(row[0], row[2]) for row in rows])
+        fresh = []
+        for row in rows:
+            key = (row[0], row[2])
+            if key not in stored:
+                stored.add(key)
+                fresh.append(row)
+        if not fresh:
+            return 0
+
+        db = get_database()
+        try:
+            inserted = self._insert_rows(fresh)
+            if commit:
+                db.commit()
+        except sqlite3.Error as e:
+            if not commit:
+                raise
+            db.rollback()
+            logger.warning(f"Batch insert of {len(fresh)} readings failed ({e}); retrying row by row")
+            inserted, fresh = self._insert_rows_one_by_one(fresh)
+        if commit:
+            notify_ingest(sorted({row[0] for row in fresh}))
+        return inserted
+
+    @staticmethod
+    def _insert_rows(rows: List[Tuple]) -> int:
+        db = get_database()
+        cursor = db.executemany(f'''
+            INSERT INTO readings (asset_id, reading_type, timestamp, data, {', '.join(METRIC_COLUMNS)})
+            SELECT ?, ?, ?, ?, {', '.join('?' * len(METRIC_COLUMNS))}
+            WHERE NOT EXISTS (SELECT 1 FROM readings WHERE asset_id = ? AND timestamp = ?)
+        ''', rows)
+        inserted = cursor.rowcount
+        # Only new readings advance the timestamp, so a replayed older reading cannot
+        # move it back. Later rows win, matching the id-ordered recency of the read paths.
+        latest_by_asset: Dict[int, Any] = {}
+        for row in rows:
+            latest_by_asset[row[0]] = row[2]
+        db.executemany(
+            'UPDATE assets SET last_reading_timestamp = ? WHERE id = ?',
+            [(timestamp, asset_id) for asset_id, timestamp in latest_by_asset.items()],
+        )
+        return inserted
+
+    def _insert_rows_one_by_one(self, rows: List[Tuple]) -> Tuple[int, List[Tuple]]:
+        """Insert and commit each row on its own; returns the count and the rows stored."""
+        db = get_database()
+        inserted = 0
+        stored = []
+        for row in rows:
+            try:
+                inserted += self._insert_rows([row])
+                db.commit()
+            except sqlite3.Error as e:
+                db.rollback()
+                logger.error(f"Dropping reading for asset {row[0]} at {row[2]}: {e}")
+                continue
+            stored.append(row)
+        return inserted, stored
+
+    def get_existing_keys(self, keys: List[Tuple[int, Any]]) -> Set[Tuple[int, Any]]:
+        """The (asset_id, timestamp) pairs from `keys` that are already stored."""
+        db = get_database()
+        existing: Set[Tuple[int, Any]] = set()
+        # Two variables per pair; stay under SQLite's variable limit.
+        for i in range(0, len(keys), 450):
+            chunk = keys[i:i + 450]
+            values = ','.join(['(?, ?)'] * len(chunk))
+            cursor = db.execute(
+                f'''
+                SELECT r.asset_id, r.timestamp
+                FROM (VALUES {values}) AS k
+                CROSS JOIN readings r ON r.asset_id = k.column1 AND r.timestamp = k.column2
+                ''',
+                tuple(v for key in chunk for v in key),
+            )
+            existing.update((row[0], row[1]) for row in cursor.fetchall())
+        return existing
+
+    def count_duplicates(self) -> int:
+        db = get_database()
+        cursor = db.execute('''
+            SELECT COALESCE(SUM(n - 1), 0) FROM (
+              SELECT COUNT(*) AS n FROM readings GROUP BY asset_id, timestamp HAVING n > 1
+            )
+        ''')
+        return int(cursor.fetchone()[0])
+
+    def delete_duplicates(self) -> int:
+        """Keep the first-ingested row for each (asset_id, timestamp) and delete the rest."""
+        db = get_database()
+        cursor = db.execute('''
+            DELETE FROM readings
+            WHERE id NOT IN (SELECT MIN(id) FROM readings GROUP BY asset_id, timestamp)
+        ''')
+        db.commit()
+        return cursor.rowcount
+
     def delete_by_asset_id(self, asset_id: int):
         db = get_database()
         db.execute('DELETE FROM readings WHERE asset_id = ?', (asset_id,))
@@ -127,6 +356,41 @@ class ReadingRepository:
         db.commit()
         return cursor.rowcount
 
+    def get_oldest_after_id(self, after_id: int, limit: int) -> List[Dict]:
+        """Raw readings in id (ingest) order, starting after `after_id`."""
+        db = get_database()
+        cursor = db.execute(
+            '''
+            SELECT id, asset_id, timestamp, data, created_at FROM readings
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+            ''',
+            (after_id, limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_latest_ids_by_asset_ids(self, asset_ids: List[int]) -> List[int]:
+        if not asset_ids:
+            return []
+        db = get_database()
+        placeholders = ','.join(['?'] * len(asset_ids))
+        cursor = db.execute(
+            f'SELECT reading_id FROM latest_readings WHERE asset_id IN ({placeholders})',
+            tuple(asset_ids),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def delete_by_ids(self, reading_ids: List[int], commit: bool = True) -> int:
+        if not reading_ids:
+            return 0
+        db = get_database()
+        placeholders = ','.join(['?'] * len(reading_ids))
+        cursor = db.execute(f'DELETE FROM readings WHERE id IN ({placeholders})', tuple(reading_ids))
+        if commit:
+            db.commit()
+        return cursor.rowcount
+
     def delete_older_than(self, days: int):
         db = get_database()
         db.execute('''
@@ -134,3 +398,78 @@ class ReadingRepository:
             WHERE timestamp < datetime('now', '-' || ? || ' days')
         ''', (days,))
         db.commit()
+
+
+class BufferedReadingWriter:
+    """
+    Buffers readings and writes them through `ReadingRepository.create_many`.
+
+    A flush happens once `flush_size` readings are pending, or when
+    `flush_interval` seconds have passed since the last flush. A long sync
+    therefore commits regularly instead of once at the end. Use it as a
+    context manager, or call `close()`, so the tail is written.
+
+    Readings already stored for the same (asset_id, timestamp) are skipped
+    and counted in `duplicates`.
+    """
+
+    def __init__(
+        self,
+        repo: Optional[ReadingRepository] = None,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.repo = repo or ReadingRepository()
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.written = 0
+        self.duplicates = 0
+        self.flushes = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+
+    def add(self, reading: Dict[str, Any]):
+        self._pending.append(reading)
+        if len(self._pending) >= self.flush_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def add_many(self, readings: Iterable[Dict[str, Any]]):
+        for reading in readings:
+            self.add(reading)
+
+    def flush_if_due(self):
+        """Flush pending readings if the interval has elapsed (cheap to call often)."""
+        if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        pending, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        written = self.repo.create_many(pending)
+        self.written += written
+        self.duplicates += len(pending) - written
+        self.flushes += 1
+        return written
+
+    def close(self) -> int:
+        self.flush()
+        return self.written
+
+    @property
+    def dedup_ratio(self) -> float:
+        seen = self.written + self.duplicates
+        return self.duplicates / seen if seen else 0.0
+
+    def __enter__(self) -> "BufferedReadingWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On error, keep what was already committed but drop the unflushed tail.
+        if exc_type is None:
+            self.flush()
+        else:
+            self._pending = []
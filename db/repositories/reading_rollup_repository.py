@@ -0,0 +1,86 @@
+from typing import Dict, List, Tuple
+from db.client import get_database
+
+TIERS = ('hourly', 'daily')
+
+# (asset_id, bucket_start, field) -> aggregate of one batch of raw readings
+RollupKey = Tuple[int, str, str]
+
+
+class ReadingRollupRepository:
+    """Per-asset, per-field aggregates in `readings_hourly` / `readings_daily`."""
+
+    @staticmethod
+    def _table(tier: str) -> str:
+        if tier not in TIERS:
+            raise ValueError(f"Unknown rollup tier: {tier}")
+        return f'readings_{tier}'
+
+    def merge(self, tier: str, rollups: Dict[RollupKey, Dict], commit: bool = True) -> int:
+        """
+        Fold batch aggregates into the tier table.
+
+        Buckets that already exist are combined (min/max/sum/count merge; `last`
+        follows the highest source reading id), so a bucket can be built up over
+        several retention batches.
+        """
+        if not rollups:
+            return 0
+        table = self._table(tier)
+        db = get_database()
+        db.executemany(f'''
+            INSERT INTO {table} (
+                asset_id, bucket_start, field, min_value, max_value, avg_value,
+                sum_value, last_value, sample_count, last_reading_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(asset_id, bucket_start, field) DO UPDATE SET
+                min_value = MIN(min_value, excluded.min_value),
+                max_value = MAX(max_value, excluded.max_value),
+                sum_value = sum_value + excluded.sum_value,
+                sample_count = sample_count + excluded.sample_count,
+                avg_value = (sum_value + excluded.sum_value) / (sample_count + excluded.sample_count),
+                last_value = CASE WHEN excluded.last_reading_id > last_reading_id
+                                  THEN excluded.last_value ELSE last_value END,
+                last_reading_id = MAX(last_reading_id, excluded.last_reading_id)
+        ''', [
+            (
+                asset_id, bucket_start, field,
+                agg['min'], agg['max'], agg['sum'] / agg['count'],
+                agg['sum'], agg['last'], agg['count'], agg['last_reading_id'],
+            )
+            for (asset_id, bucket_start, field), agg in rollups.items()
+        ])
+        if commit:
+            db.commit()
+        return len(rollups)
+
+    def get_in_range(self, tier: str, asset_ids: List[int], start: str, end: str) -> List[Dict]:
+        """Rollup rows with `start <= bucket_start < end` (ISO 'YYYY-MM-DD HH:MM:SS' strings)."""
+        if not asset_ids:
+            return []
+        table = self._table(tier)
+        db = get_database()
+        rows: List[Dict] = []
+        # Avoid SQLite parameter limits by chunking.
+        for i in range(0, len(asset_ids), 900):
+            chunk = asset_ids[i:i + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = db.execute(f'''
+                SELECT * FROM {table}
+                WHERE asset_id IN ({placeholders})
+                  AND bucket_start >= ? AND bucket_start < ?
+                ORDER BY bucket_start
+            ''', (*chunk, start, end))
+            rows.extend(dict(row) for row in cursor.fetchall())
+        return rows
+
+    def delete_before(self, tier: str, bucket_start: str, limit: int = 5000) -> int:
+        """Delete up to `limit` rollup rows older than `bucket_start`; call repeatedly to drain."""
+        table = self._table(tier)
+        db = get_database()
+        cursor = db.execute(f'''
+            DELETE FROM {table}
+            WHERE rowid IN (SELECT rowid FROM {table} WHERE bucket_start < ? LIMIT ?)
+        ''', (bucket_start, limit))
+        db.commit()
+        return cursor.rowcount
@@ -37,6 +37,19 @@ class SiteRepository:
         row = cursor.fetchone()
         return dict(row) if row else None
 
+    def get_by_ids(self, site_ids: List[int]) -> Dict[int, Dict]:
+        if not site_ids:
+            return {}
+        db = get_database()
+        sites: Dict[int, Dict] = {}
+        # Avoid SQLite parameter limits by chunking.
+        for i in range(0, len(site_ids), 900):
+            chunk = site_ids[i:i + 900]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = db.execute(f'SELECT * FROM sites WHERE id IN ({placeholders})', tuple(chunk))
+            sites.update({row['id']: dict(row) for row in cursor.fetchall()})
+        return sites
+
     def create(self, site: Dict[str, Any]) -> int:
         db = get_database()
         cursor = db.execute('''
@@ -115,6 +128,54 @@ class SiteRepository:
         db.commit()
         return cursor.lastrowid
 
+    def upsert_many_by_external_id(self, sites: List[Dict], commit: bool = True) -> Dict[int, int]:
+        """
+        Bulk upsert sites keyed by `external_id` in a single transaction.
+
+        Returns a mapping of external_id -> local site id for every input row.
+        Pass `commit=False` to leave the transaction open for the caller.
+        """
+        if not sites:
+            return {}
+        db = get_database()
+        db.executemany('''
+            INSERT INTO sites (external_id, name, region, zone, state, cluster_code, zone_external_id, is_lagos)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+            ON CONFLICT(external_id) DO UPDATE SET
+                name = excluded.name,
+                region = excluded.region,
+                zone = excluded.zone,
+                state = excluded.state,
+                cluster_code = excluded.cluster_code,
+                zone_external_id = excluded.zone_external_id
+        ''', [
+            (
+                int(site['external_id']),
+                site['name'],
+                site.get('region'),
+                site.get('zone'),
+                site.get('state'),
+                site.get('cluster_code'),
+                site.get('zone_external_id'),
+            )
+            for site in sites
+        ])
+        if commit:
+            db.commit()
+        return self.get_id_map_by_external_ids([int(site['external_id']) for site in sites])
+
+    def get_id_map_by_external_ids(self, external_ids: List[int]) -> Dict[int, int]:
+        db = get_database()
+        id_map: Dict[int, int] = {}
+        unique_ids = list(dict.fromkeys(external_ids))
+        # Avoid SQLite parameter limits by chunking.
+        for i in range(0, len(unique_ids), 900):
+            chunk = unique_ids[i:i + 900]
+            placeholders = ",".join("?" for _ in chunk)
+            cursor = db.execute(f'SELECT external_id, id FROM sites WHERE external_id IN ({placeholders})', tuple(chunk))
+            id_map.update({int(row[0]): int(row[1]) for row in cursor.fetchall()})
+        return id_map
+
     def delete_by_ids(self, site_ids: List[int]) -> int:
         if not site_ids:
             return 0
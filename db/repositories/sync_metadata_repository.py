@@ -1,4 +1,4 @@
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from db.client import get_database
 import json
 from datetime import datetime
@@ -69,3 +69,51 @@ class SyncMetadataRepository:
             'status': 'failed',
             'errors': errors
         })
+
+    def get_site_ids_hash(self) -> Optional[str]:
+        metadata = self.get_metadata() or {}
+        return metadata.get('site_ids_hash')
+
+    def record_site_ids_hash(self, site_ids_hash: str):
+        self.update_metadata({'site_ids_hash': site_ids_hash})
+
+    def get_record_hashes(self, entity: str, external_ids: List[int]) -> Dict[int, str]:
+        db = get_database()
+        hashes: Dict[int, str] = {}
+        unique_ids = list(dict.fromkeys(external_ids))
+        # Avoid SQLite parameter limits by chunking.
+        for i in range(0, len(unique_ids), 900):
+            chunk = unique_ids[i:i + 900]
+            placeholders = ",".join("?" for _ in chunk)
+            cursor = db.execute(
+                f'SELECT external_id, content_hash FROM sync_record_hashes WHERE entity = ? AND external_id IN ({placeholders})',
+                (entity, *chunk),
+            )
+            hashes.update({int(row[0]): row[1] for row in cursor.fetchall()})
+        return hashes
+
+    def save_record_hashes(self, entity: str, hashes: Dict[int, str], commit: bool = True):
+        if not hashes:
+            return
+        db = get_database()
+        now = datetime.now().isoformat()
+        db.executemany('''
+            INSERT INTO sync_record_hashes (entity, external_id, content_hash, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(entity, external_id) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                updated_at = excluded.updated_at
+        ''', [(entity, external_id, content_hash, now) for external_id, content_hash in hashes.items()])
+        if commit:
+            db.commit()
+
+    def delete_orphaned_record_hashes(self) -> int:
+        """Drop hashes whose site/asset row no longer exists (e.g. after pruning)."""
+        db = get_database()
+        cursor = db.execute('''
+            DELETE FROM sync_record_hashes
+            WHERE (entity = 'site' AND external_id NOT IN (SELECT external_id FROM sites WHERE external_id IS NOT NULL))
+               OR (entity = 'asset' AND external_id NOT IN (SELECT external_id FROM assets WHERE external_id IS NOT NULL))
+        ''')
+        db.commit()
+        return cursor.rowcount
@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict, Any
-from db.client import get_database
+from db.client import bump_rules_version, get_database
 
 class ThresholdRepository:
     def get_all(self) -> List[Dict]:
@@ -48,6 +48,7 @@ class ThresholdRepository:
             threshold.get('logic_operator')
         ))
         db.commit()
+        bump_rules_version()
 
     def update(self, threshold_id: str, updates: Dict[str, Any]):
         db = get_database()
@@ -66,11 +67,13 @@ class ThresholdRepository:
             WHERE id = ?
         ''', values)
         db.commit()
+        bump_rules_version()
 
     def delete(self, threshold_id: str):
         db = get_database()
         db.execute('DELETE FROM thresholds WHERE id = ?', (threshold_id,))
         db.commit()
+        bump_rules_version()
 
     def increment_trigger_count(self, threshold_id: str):
         db = get_database()
@@ -80,3 +83,16 @@ class ThresholdRepository:
             WHERE id = ?
         ''', (threshold_id,))
         db.commit()
+
+    def increment_trigger_counts(self, counts: Dict[str, int], commit: bool = True):
+        """Add `counts[threshold_id]` triggers per threshold in one batch."""
+        if not counts:
+            return
+        db = get_database()
+        db.executemany('''
+            UPDATE thresholds
+            SET trigger_count = trigger_count + ?, last_triggered = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', [(count, threshold_id) for threshold_id, count in counts.items()])
+        if commit:
+            db.commit()
@@ -106,9 +106,119 @@ CREATE TABLE IF NOT EXISTS readings (
   timestamp DATETIME NOT NULL,
   data TEXT NOT NULL,
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  -- Typed metrics decoded from `data` at ingest (services/reading_metrics.py)
+  voltage_l1 REAL,
+  voltage_l2 REAL,
+  voltage_l3 REAL,
+  frequency REAL,
+  ac_power REAL,
+  gen_power REAL,
+  dc_voltage REAL,
+  battery_power REAL,
+  solar_power REAL,
+  battery_voltage REAL,
+  solar_voltage REAL,
+  battery_current REAL,
+  solar_current REAL,
+  battery_soc REAL,
+  rectifier_dc_voltage REAL,
+  rectifier_dc_current REAL,
+  fuel_level REAL,
+  fuel_depth_cm REAL,
+  temperature REAL,
+  runtime_hours REAL,
+  channel_power_1 REAL,
+  channel_power_2 REAL,
+  channel_power_3 REAL,
+  channel_power_4 REAL,
+  channel_current_1 REAL,
+  channel_current_2 REAL,
+  channel_current_3 REAL,
+  channel_current_4 REAL,
+  metrics_version INTEGER,
   FOREIGN KEY (asset_id) REFERENCES assets(id)
 );
 
+-- Latest reading per asset (maintained by triggers, see migration 016)
+CREATE TABLE IF NOT EXISTS latest_readings (
+  asset_id INTEGER PRIMARY KEY,
+  reading_id INTEGER NOT NULL,
+  reading_type TEXT,
+  timestamp DATETIME,
+  data TEXT,
+  created_at DATETIME,
+  voltage_l1 REAL,
+  voltage_l2 REAL,
+  voltage_l3 REAL,
+  frequency REAL,
+  ac_power REAL,
+  gen_power REAL,
+  dc_voltage REAL,
+  battery_power REAL,
+  solar_power REAL,
+  battery_voltage REAL,
+  solar_voltage REAL,
+  battery_current REAL,
+  solar_current REAL,
+  battery_soc REAL,
+  rectifier_dc_voltage REAL,
+  rectifier_dc_current REAL,
+  fuel_level REAL,
+  fuel_depth_cm REAL,
+  temperature REAL,
+  runtime_hours REAL,
+  channel_power_1 REAL,
+  channel_power_2 REAL,
+  channel_power_3 REAL,
+  channel_power_4 REAL,
+  channel_current_1 REAL,
+  channel_current_2 REAL,
+  channel_current_3 REAL,
+  channel_current_4 REAL,
+  metrics_version INTEGER
+);
+
+-- Newest reading id per site (maintained by triggers, see migration 018)
+CREATE TABLE IF NOT EXISTS site_last_reading (
+  site_id INTEGER PRIMARY KEY,
+  reading_id INTEGER NOT NULL
+);
+
+-- Change counters for sites/assets, alarms and reading deletes (bumped by triggers, see migrations 019 and 020)
+CREATE TABLE IF NOT EXISTS data_generations (
+  domain TEXT PRIMARY KEY,
+  generation INTEGER NOT NULL DEFAULT 0
+);
+
+-- Readings rollup tiers (aggregates of raw readings past the retention window)
+CREATE TABLE IF NOT EXISTS readings_hourly (
+  asset_id INTEGER NOT NULL,
+  bucket_start TEXT NOT NULL,
+  field TEXT NOT NULL,
+  min_value REAL,
+  max_value REAL,
+  avg_value REAL,
+  sum_value REAL,
+  last_value REAL,
+  sample_count INTEGER NOT NULL DEFAULT 0,
+  last_reading_id INTEGER,
+  PRIMARY KEY (asset_id, bucket_start, field)
+);
+
+CREATE TABLE IF NOT EXISTS readings_daily (
+  asset_id INTEGER NOT NULL,
+  bucket_start TEXT NOT NULL,
+  field TEXT NOT NULL,
+  min_value REAL,
+  max_value REAL,
+  avg_value REAL,
+  sum_value REAL,
+  last_value REAL,
+  sample_count INTEGER NOT NULL DEFAULT 0,
+  last_reading_id INTEGER,
+  PRIMARY KEY (asset_id, bucket_start, field)
+);
+
 -- Generated Reports table
 CREATE TABLE IF NOT EXISTS generated_reports (
   id TEXT PRIMARY KEY,
@@ -136,7 +246,10 @@ CREATE INDEX IF NOT EXISTS idx_thresholds_enabled ON thresholds(enabled);
 CREATE INDEX IF NOT EXISTS idx_thresholds_category ON thresholds(category);
 CREATE INDEX IF NOT EXISTS idx_readings_asset_id ON readings(asset_id);
 CREATE INDEX IF NOT EXISTS idx_readings_timestamp ON readings(timestamp);
+CREATE INDEX IF NOT EXISTS idx_readings_hourly_bucket ON readings_hourly(bucket_start);
+CREATE INDEX IF NOT EXISTS idx_readings_daily_bucket ON readings_daily(bucket_start);
 CREATE INDEX IF NOT EXISTS idx_assets_site_id ON assets(site_id);
+CREATE INDEX IF NOT EXISTS idx_site_last_reading_reading ON site_last_reading(reading_id);
 CREATE INDEX IF NOT EXISTS idx_assets_type ON assets(type);
 CREATE INDEX IF NOT EXISTS idx_sites_name ON sites(name);
 CREATE INDEX IF NOT EXISTS idx_reports_type ON generated_reports(report_type);
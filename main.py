@@ -3,9 +3,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from routers import alarms, thresholds, threshold_options, power_flow, energy_mix, composite_alarms, sync, sites, assets, tenants, regional, energy_sources, debug, reports
 from apscheduler.schedulers.background import BackgroundScheduler
-from services.alarm_monitor import get_alarm_monitor
+from services.alarm_monitor import EVALUATION_MODE, get_alarm_monitor
 from services.ihs_sync_service import get_ihs_sync_service
 from services.energy_mix_scheduler import update_energy_mix_history, update_energy_mix_history_hourly, run_initial_backfill
+from services.readings_retention import run_readings_retention
 from datetime import datetime, timedelta
 import logging
 import os
@@ -61,6 +62,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"[Lifespan] ⚠️  Failed to recalculate trigger counts: {e}", flush=True)
 
+    # Load open-alarm fingerprints used for alarm deduplication
+    try:
+        from db.repositories.alarm_repository import get_open_alarm_index
+        get_open_alarm_index().load()
+        print("[Lifespan] ✅ Open-alarm index loaded", flush=True)
+    except Exception as e:
+        print(f"[Lifespan] ⚠️  Failed to load open-alarm index: {e}", flush=True)
+
     # Fix alarm float precision (one-time migration)
     try:
         from scripts.fix_alarm_precision import fix_alarm_precision
@@ -79,23 +88,6 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"[Lifespan] ⚠️  Failed to cleanup energy mix data: {e}", flush=True)
 
-    # Run initial backfill of energy mix data
-    try:
-        print("[Lifespan] Running initial energy mix data backfill...", flush=True)
-        run_initial_backfill()
-        print("[Lifespan] ✅ Energy mix data backfill completed", flush=True)
-    except Exception as e:
-        print(f"[Lifespan] ⚠️  Failed to run energy mix backfill: {e}", flush=True)
-
-    # Seed missing energy mix data for 24h chart coverage
-    try:
-        from scripts.seed_energy_mix_24h import seed_missing_energy_mix_data
-        seeded = seed_missing_energy_mix_data()
-        if seeded > 0:
-            print(f"[Lifespan] ✅ Seeded {seeded} missing energy mix hours", flush=True)
-    except Exception as e:
-        print(f"[Lifespan] ⚠️  Failed to seed energy mix data: {e}", flush=True)
-
     # Start schedulers
     print("[Lifespan] Initializing schedulers...", flush=True)
 
@@ -119,7 +111,35 @@ async def lifespan(app: FastAPI):
         id='ihs_sync_startup'
     )
 
-    # Energy mix update every 30 minutes (current snapshot)
+    # One-time backfill of typed reading metrics; off the startup path since
+    # readers fall back to parsing `readings.data` until it completes.
+    from scripts.backfill_reading_metrics import backfill_reading_metrics
+    scheduler.add_job(
+        backfill_reading_metrics,
+        'date',
+        run_date=datetime.now() + timedelta(seconds=5),
+        id='reading_metrics_backfill'
+    )
+
+    # Hourly energy-mix buckets, loaded once and then updated on ingest.
+    from services.energy_mix_aggregator import get_energy_mix_aggregator
+    scheduler.add_job(
+        get_energy_mix_aggregator().start,
+        'date',
+        run_date=datetime.now() + timedelta(seconds=1),
+        id='energy_mix_aggregator_start'
+    )
+
+    # Backfill missing energy-mix hours (then seed any still missing); off the
+    # startup path since it reads up to 7 days of readings.
+    scheduler.add_job(
+        run_initial_backfill,
+        'date',
+        run_date=datetime.now() + timedelta(seconds=2),
+        id='energy_mix_backfill'
+    )
+
+    # Energy mix update every 30 minutes (folds missed readings, stores the current hour)
     scheduler.add_job(
         update_energy_mix_history,
         'interval',
@@ -137,6 +157,11 @@ async def lifespan(app: FastAPI):
         replace_existing=True
     )
 
+    # Evaluate assets as their readings are ingested; the 2-minute job below keeps
+    # syncing readings and re-runs a full pass when thresholds change.
+    if EVALUATION_MODE == 'event':
+        alarm_monitor.start_event_consumer()
+
     # Alarm evaluation every 2 minutes
     scheduler.add_job(
         alarm_monitor.evaluate_all_assets,
@@ -146,6 +171,15 @@ async def lifespan(app: FastAPI):
         replace_existing=True
     )
 
+    # Readings retention: roll aged raw readings into hourly/daily aggregates
+    scheduler.add_job(
+        run_readings_retention,
+        'interval',
+        minutes=15,
+        id='readings_retention',
+        replace_existing=True
+    )
+
     scheduler.start()
     print("[Lifespan] Schedulers started (IHS sync: 30min, Alarms: 2min)", flush=True)
 
@@ -154,6 +188,11 @@ async def lifespan(app: FastAPI):
     # SHUTDOWN
     print("[Lifespan] Stopping schedulers...", flush=True)
     scheduler.shutdown(wait=False)
+    get_alarm_monitor().stop_event_consumer()
+    from services.energy_mix_aggregator import get_energy_mix_aggregator
+    get_energy_mix_aggregator().stop()
+    from services.ihs_client_factory import close_async_ihs_api_client
+    await close_async_ihs_api_client()
     print("[Lifespan] Shutdown complete", flush=True)
 
 app = FastAPI(title="IHS Backend API", lifespan=lifespan)
@@ -165,6 +204,8 @@ app.add_middleware(
     allow_origins=CORS_ORIGINS or ["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets polling dashboards read the ETag to send back as If-None-Match.
+    expose_headers=["ETag"],
 )
 
 app.include_router(alarms.router, prefix="/api/alarms", tags=["alarms"])
@@ -9,12 +9,11 @@ router = APIRouter()
 @router.get("/assets/{asset_id}/readings/latest")
 def get_latest_reading(asset_id: int):
     reading_repo = ReadingRepository()
-    readings = reading_repo.get_latest_by_asset_ids([asset_id])
+    reading = reading_repo.get_latest_by_asset_id(asset_id)
 
-    if not readings:
+    if not reading:
         return None
 
-    reading = readings[0]
     return {
         "id": reading['id'],
         "asset_id": reading['asset_id'],
@@ -1,17 +1,25 @@
-from fastapi import APIRouter, Query, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
+import asyncio
+import json
+import os
 from alarm_monitor import AlarmMonitor
 from config import config
 
 router = APIRouter()
 monitor = None
 
+# Largest number of readings accepted by one /evaluate/batch request
+MAX_BATCH_READINGS = int(os.getenv('COMPOSITE_EVALUATE_MAX_BATCH', '5000'))
+
 class EvaluateRequest(BaseModel):
     asset_id: int
     reading: dict
     site: Optional[str] = "Unknown"
     region: Optional[str] = "Unknown"
+    cluster: Optional[str] = None
 
 async def get_monitor():
     global monitor
@@ -22,6 +30,54 @@ async def get_monitor():
         print(f"✅ {rule_count} composite rules loaded")
     return monitor
 
+def _alarm_to_dict(alarm) -> dict:
+    return {
+        "id": alarm.id,
+        "timestamp": alarm.timestamp.isoformat(),
+        "site": alarm.site,
+        "region": alarm.region,
+        "severity": alarm.severity,
+        "category": alarm.category,
+        "message": alarm.message,
+        "status": alarm.status,
+        "composite_rule_id": alarm.composite_rule_id,
+        "asset_id": alarm.asset_id,
+        "conditions_met": alarm.conditions_met,
+        "total_conditions": alarm.total_conditions,
+        "samples": alarm.samples,
+        "rate_of_change": alarm.rate_of_change
+    }
+
+async def _read_batch(request: Request) -> List[EvaluateRequest]:
+    """Readings from a JSON array (or {"readings": [...]}) or an NDJSON body, one object per line."""
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = []
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            items.extend(json.loads(line) for line in lines if line.strip())
+            if len(items) > MAX_BATCH_READINGS:
+                break
+        if buffer.strip():
+            items.append(json.loads(buffer))
+    else:
+        body = await request.json()
+        items = body.get("readings") if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of readings")
+
+    if len(items) > MAX_BATCH_READINGS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_READINGS} readings per batch")
+
+    readings = []
+    for index, item in enumerate(items):
+        try:
+            readings.append(EvaluateRequest.model_validate(item))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail={"index": index, "errors": e.errors(include_url=False, include_context=False)})
+    return readings
+
 @router.post("/evaluate")
 async def evaluate_alarms(request: EvaluateRequest):
     """Evaluate all 33 rules for a single reading and save alarms to database"""
@@ -31,35 +87,14 @@ async def evaluate_alarms(request: EvaluateRequest):
             asset_id=request.asset_id,
             reading=request.reading,
             site=request.site,
-            region=request.region
+            region=request.region,
+            cluster=request.cluster
         )
 
         # Save alarms to database
-        for alarm in alarms:
-            try:
-                await mon.db.create_alarm(alarm)
-            except Exception as e:
-                print(f"Failed to save alarm {alarm.id}: {str(e)}")
+        await mon.save_alarms(alarms)
 
-        alarm_dicts = [
-            {
-                "id": alarm.id,
-                "timestamp": alarm.timestamp.isoformat(),
-                "site": alarm.site,
-                "region": alarm.region,
-                "severity": alarm.severity,
-                "category": alarm.category,
-                "message": alarm.message,
-                "status": alarm.status,
-                "composite_rule_id": alarm.composite_rule_id,
-                "asset_id": alarm.asset_id,
-                "conditions_met": alarm.conditions_met,
-                "total_conditions": alarm.total_conditions,
-                "samples": alarm.samples,
-                "rate_of_change": alarm.rate_of_change
-            }
-            for alarm in alarms
-        ]
+        alarm_dicts = [_alarm_to_dict(alarm) for alarm in alarms]
 
         return {
             "alarms": alarm_dicts,
@@ -68,6 +103,39 @@ async def evaluate_alarms(request: EvaluateRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/evaluate/batch")
+async def evaluate_alarms_batch(request: Request):
+    """
+    Evaluate many readings in one request and save all new alarms in one
+    transaction. Accepts a JSON array of {asset_id, reading, site, region, cluster}
+    objects, or the same objects as NDJSON (Content-Type: application/x-ndjson).
+    """
+    try:
+        readings = await _read_batch(request)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+
+    try:
+        mon = await get_monitor()
+        alarms_per_reading = await mon.evaluate_batch([reading.model_dump() for reading in readings])
+
+        results = [
+            {
+                "asset_id": reading.asset_id,
+                "alarms": [_alarm_to_dict(alarm) for alarm in alarms],
+                "count": len(alarms)
+            }
+            for reading, alarms in zip(readings, alarms_per_reading)
+        ]
+        # Already JSON-safe; skips jsonable_encoder's walk over every alarm
+        return JSONResponse({
+            "results": results,
+            "readings": len(results),
+            "count": sum(result["count"] for result in results)
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/rules/")
 async def get_rules(
     category: Optional[str] = Query(None, description="Category filter")
@@ -132,3 +200,12 @@ async def get_rule_stats():
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/engine/stats")
+async def get_engine_stats():
+    """Rule cache version and rate-change previous-value cache hit ratio"""
+    try:
+        mon = await get_monitor()
+        return await asyncio.to_thread(mon.engine.stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
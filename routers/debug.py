@@ -1,13 +1,15 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 
 from db.repositories.site_repository import SiteRepository
-from services.ihs_client_factory import get_ihs_api_client
+from services.ihs_client_factory import get_async_ihs_api_client
 
 router = APIRouter()
 
 
 @router.get("/debug/verify-site/{site_name}")
-def verify_site_in_iot_api(site_name: str):
+async def verify_site_in_iot_api(site_name: str):
     """
     Debug helper: prove a site is present in the live IoT API.
 
@@ -26,12 +28,15 @@ def verify_site_in_iot_api(site_name: str):
     per_page = 100
     approx_page = max(1, external_id // per_page)
 
-    client = get_ihs_api_client()
+    client = get_async_ihs_api_client()
+
+    # Fetch the candidate pages concurrently on the shared async pool.
+    pages = sorted({max(1, approx_page - 1), approx_page, approx_page + 1})
+    responses = await asyncio.gather(*(client.get_sites(page=page, per_page=per_page) for page in pages))
 
     found = None
     scanned_pages = []
-    for page in {max(1, approx_page - 1), approx_page, approx_page + 1}:
-        resp = client.get_sites(page=page, per_page=per_page)
+    for page, resp in zip(pages, responses):
         data = resp.get("data", []) if isinstance(resp, dict) else []
         scanned_pages.append(page)
         for api_site in data:
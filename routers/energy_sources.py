@@ -4,12 +4,13 @@ from db.repositories.alarm_repository import AlarmRepository
 from db.repositories.reading_repository import ReadingRepository
 from services.ihs_sites_cache import get_cached_sites_with_assets, trigger_refresh_if_stale
 from services.ihs_sync_service import get_ihs_sync_service
+from services.response_cache import cached_endpoint
 import json
 import re
 
 router = APIRouter()
 
-ENERGY_KEYS = [
+ENERGY_KEYS = (
     'total_energy',
     'total_energy_consumption',
     'total_pvc_energy',
@@ -25,36 +26,36 @@ ENERGY_KEYS = [
     't3_e',
     'e1_batt',
     'e2_solar_y2',
-]
+)
 
-FUEL_LEVEL_KEYS = [
+FUEL_LEVEL_KEYS = (
     'Fuel Level (L)',
     'Diesel Deep (CM)',
     'Diesel Deep With Offset (CM)',
     'fuel_level',
     'diesel_deep_with_offset_cm',
     'diesel_deep_cm',
-]
+)
 
-CONSUMPTION_KEYS = [
+CONSUMPTION_KEYS = (
     'Consumption (L)',
     'consumption',
     'Fuel Consumption (L)',
-]
+)
 
-SOLAR_ENERGY_KEYS = [
+SOLAR_ENERGY_KEYS = (
     'e2_solar_y2',
     'Energy2',
-]
+)
 
-GENERATOR_RUNTIME_KEYS = [
+GENERATOR_RUNTIME_KEYS = (
     'Engine_Runtime',
     'engine_run_time',
     'engine_runtime',
     'runtime_hours',
-]
+)
 
-AC_POWER_KEYS = [
+AC_POWER_KEYS = (
     'Total_Active_Power (kW)',
     'Total Active Power (kW)',
     'total_power_kw',
@@ -66,7 +67,7 @@ AC_POWER_KEYS = [
     'Power1',
     'Power2',
     'Power3',
-]
+)
 
 def _parse_float(value) -> float:
     if value is None:
@@ -81,17 +82,18 @@ def _parse_float(value) -> float:
         return float(match.group(0)) if match else 0.0
     return 0.0
 
-def _extract_optional_value(data: dict, keys: list[str]) -> float | None:
+def _extract_optional_value(data: dict, keys: tuple[str, ...]) -> float | None:
     if not isinstance(data, dict):
         return None
     for key in keys:
-        if key in data:
-            raw = data.get(key)
-            if raw is None:
-                continue
-            if isinstance(raw, str) and raw.strip().lower() in {'', 'n/a', 'na', 'none', 'null'}:
-                continue
-            return _parse_float(raw)
+        if key not in data:
+            continue
+        raw = data[key]
+        if raw is None:
+            continue
+        if isinstance(raw, str) and raw.strip().lower() in {'', 'n/a', 'na', 'none', 'null'}:
+            continue
+        return _parse_float(raw)
     return None
 
 def _parse_timestamp(value) -> datetime | None:
@@ -128,12 +130,13 @@ def _extract_energy_kwh(data: dict) -> float:
         return 0.0
     total = 0.0
     for key in ENERGY_KEYS:
-        if key in data:
-            value = _parse_float(data.get(key))
-            # Filter common sentinel/overflow values (prevents exploding totals)
-            if abs(value) >= 1_000_000.0:
-                continue
-            total += max(0.0, value)
+        if key not in data:
+            continue
+        value = _parse_float(data[key])
+        # Filter common sentinel/overflow values (prevents exploding totals)
+        if abs(value) >= 1_000_000.0:
+            continue
+        total += max(0.0, value)
     return total
 
 def _extract_solar_energy_kwh(data: dict) -> float:
@@ -143,7 +146,7 @@ def _extract_solar_energy_kwh(data: dict) -> float:
     for key in SOLAR_ENERGY_KEYS:
         if key not in data:
             continue
-        value = _parse_float(data.get(key))
+        value = _parse_float(data[key])
         if abs(value) >= 1_000_000.0:
             continue
         total += max(0.0, value)
@@ -153,23 +156,25 @@ def _extract_generator_runtime_hours(data: dict) -> float:
     if not isinstance(data, dict):
         return 0.0
     for key in GENERATOR_RUNTIME_KEYS:
-        if key in data:
-            runtime = _parse_float(data.get(key))
-            if runtime:
-                # Some payloads report runtime in seconds (e.g. 1,193,046.4s ~= 331.4h).
-                if runtime >= 100_000:
-                    runtime = runtime / 3600.0
-                return max(0.0, runtime)
+        if key not in data:
+            continue
+        runtime = _parse_float(data[key])
+        if runtime:
+            # Some payloads report runtime in seconds (e.g. 1,193,046.4s ~= 331.4h).
+            if runtime >= 100_000:
+                runtime = runtime / 3600.0
+            return max(0.0, runtime)
     return 0.0
 
 def _extract_ac_power_kw(data: dict) -> float:
     if not isinstance(data, dict):
         return 0.0
     for key in AC_POWER_KEYS:
-        if key in data:
-            power = _normalize_power_kw(data.get(key))
-            if power:
-                return power
+        if key not in data:
+            continue
+        power = _normalize_power_kw(data[key])
+        if power:
+            return power
     return 0.0
 
 def _attach_tenant_channels(asset: dict) -> dict:
@@ -299,6 +304,7 @@ def transform_site(site: dict, assets: list) -> dict:
     }
 
 @router.get("/energy-sources-with-alarms")
+@cached_endpoint('energy-sources-with-alarms', depends=('readings', 'sites', 'alarms'))
 def get_energy_sources_with_alarms(history_hours: int = 0, include_empty: bool = True):
     """Get all sites with assets and active alarms (for frontend dashboard)"""
     alarm_repo = AlarmRepository()
@@ -490,6 +496,7 @@ def get_energy_sources_with_alarms(history_hours: int = 0, include_empty: bool =
         reading_type = latest.get('reading_type')
         latest_energy = _extract_energy_kwh(data)
         oldest_energy = 0.0
+        oldest_data = {}
         if oldest:
             oldest_data = json.loads(oldest['data']) if oldest.get('data') else {}
             oldest_energy = _extract_energy_kwh(oldest_data)
@@ -499,13 +506,11 @@ def get_energy_sources_with_alarms(history_hours: int = 0, include_empty: bool =
             latest_solar = _extract_solar_energy_kwh(data)
             oldest_solar = 0.0
             if oldest:
-                oldest_data = json.loads(oldest['data']) if oldest.get('data') else {}
                 oldest_solar = _extract_solar_energy_kwh(oldest_data)
             solar_energy_kwh += safe_delta(latest_solar, oldest_solar)
         elif reading_type == 'GENERATOR':
             latest_runtime = _extract_generator_runtime_hours(data)
             if oldest:
-                oldest_data = json.loads(oldest['data']) if oldest.get('data') else {}
                 oldest_runtime = _extract_generator_runtime_hours(oldest_data)
                 if latest_runtime >= oldest_runtime > 0:
                     generator_runtime_delta += (latest_runtime - oldest_runtime)
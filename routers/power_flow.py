@@ -4,10 +4,13 @@ import json
 import random
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Query
 
 from db.client import get_database
 from db.repositories.reading_repository import ReadingRepository
+from services.reading_metrics import MAX_CHANNEL_INDEX, METRICS_VERSION, extract_metrics_from_json
+from services.response_cache import cached_endpoint
+from services.site_scope import get_site_scope_resolver
 
 router = APIRouter()
 
@@ -32,14 +35,9 @@ def _to_float(value: Any, default: float = 0.0) -> float:
         return default
 
 
-def _pick(data: Dict[str, Any], keys: List[str], default: float = 0.0) -> float:
-    for key in keys:
-        if key in data:
-            v = _to_float(data.get(key), None)
-            if v is None:
-                continue
-            return v
-    return default
+def _metric(metrics: Dict[str, Any], column: str, default: float = 0.0) -> float:
+    value = metrics.get(column)
+    return default if value is None else value
 
 
 def _avg(values: List[float]) -> float:
@@ -55,67 +53,11 @@ def _resolve_site_ids(
     site: Optional[str],
     sample_size: int,
 ) -> Tuple[List[int], Optional[str], Optional[str]]:
-    db = get_database()
-
-    if site:
-        row = db.execute(
-            "SELECT id, name FROM sites WHERE name = ? COLLATE NOCASE LIMIT 1", (site,)
-        ).fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail=f"Site '{site}' not found")
-        return [int(row["id"])], None, str(row["name"])
-
-    sample_size = max(1, int(sample_size))
-
-    # Prefer sites that actually have readings (ordered by most recent reading id).
-    # This prevents zero-only samples when a region has many sites without fresh telemetry.
-    where: List[str] = []
-    params_list: List[Any] = []
-    label: Optional[str] = None
-    state_label: Optional[str] = None
-
-    if region:
-        where.append("(s.region = ? OR s.zone = ?)")
-        params_list.extend([region, region])
-        label = region
-
-    if state:
-        where.append("s.state = ?")
-        params_list.append(state)
-        state_label = state
-
-    where_clause = ("WHERE " + " AND ".join(where)) if where else ""
-    params: Tuple[Any, ...] = tuple(params_list)
-
-    cursor = db.execute(
-        f"""
-        SELECT a.site_id AS site_id
-        FROM readings r
-        JOIN assets a ON r.asset_id = a.id
-        JOIN sites s ON a.site_id = s.id
-        {where_clause}
-        GROUP BY a.site_id
-        ORDER BY MAX(r.id) DESC
-        LIMIT ?
-        """,
-        (*params, sample_size),
-    )
-
-    site_ids = [int(r["site_id"]) for r in cursor.fetchall()]
-
-    if not site_ids:
-        # Fall back to sites list if there are no readings yet.
-        cursor2 = db.execute(
-            f"SELECT id FROM sites s {where_clause}",
-            params,
-        )
-        site_ids = [int(r["id"]) for r in cursor2.fetchall()][:sample_size]
-
-    if not site_ids:
-        raise HTTPException(status_code=404, detail="No sites matched the requested scope")
-
-    return site_ids, state_label, label
-
+    """`(site_ids, state_label, label)` of a scope, from the shared site-scope resolver."""
+    scope = get_site_scope_resolver().resolve(region=region, state=state, site=site, sample_size=sample_size)
+    if scope.site is not None:
+        return list(scope.site_ids), None, str(scope.site)
+    return list(scope.site_ids), scope.state, scope.region
 
 
 def _parse_config(raw: Any) -> Dict[str, Any]:
@@ -138,6 +80,20 @@ def _normalize_kw(value: Any) -> float:
     return kw
 
 
+def _raw_reading_data(reading_repo: ReadingRepository, reading: Dict[str, Any]) -> Dict[str, Any]:
+    """Parsed `readings.data` for the rare fields that have no typed column (cached on the row)."""
+    if "_raw" not in reading:
+        raw = reading.get("data")
+        if raw is None:
+            raw = reading_repo.get_data_by_id(int(reading["id"]))
+        try:
+            parsed = json.loads(raw) if isinstance(raw, str) else (raw or {})
+        except Exception:
+            parsed = {}
+        reading["_raw"] = parsed if isinstance(parsed, dict) else {}
+    return reading["_raw"]
+
+
 def _get_assets_for_sites(site_ids: List[int]) -> Dict[int, Dict[str, Any]]:
     """Return mapping asset_id -> asset info for assets belonging to site_ids."""
     db = get_database()
@@ -159,6 +115,7 @@ def _get_assets_for_sites(site_ids: List[int]) -> Dict[int, Dict[str, Any]]:
 
 
 @router.get("/power-flow")
+@cached_endpoint('power-flow', depends=('readings', 'sites'))
 def get_power_flow(
     region: Optional[str] = Query(default=None),
     state: Optional[str] = Query(default=None),
@@ -180,10 +137,10 @@ def get_power_flow(
     asset_site = _get_assets_for_sites(site_ids)
     asset_ids = list(asset_site.keys())
 
-    # Fetch latest readings in batches to avoid SQLite variable limit.
+    # Fetch latest readings (typed metric columns) in batches to avoid SQLite variable limit.
     readings: List[Dict[str, Any]] = []
     for chunk in _chunks(asset_ids, _MAX_SQL_VARS):
-        readings.extend(reading_repo.get_latest_by_asset_ids(chunk))
+        readings.extend(reading_repo.get_latest_metrics_by_asset_ids(chunk, METRICS_VERSION))
 
     # Per-site aggregation (lets us compute availability ratios)
     per_site: Dict[int, Dict[str, Any]] = {
@@ -218,39 +175,24 @@ def get_power_flow(
         if not site_id or site_id not in per_site:
             continue
 
-        raw = reading.get("data")
-        try:
-            data = json.loads(raw) if isinstance(raw, str) else (raw or {})
-        except Exception:
-            continue
-        if not isinstance(data, dict):
-            continue
+        # `data` is only returned for rows not decoded yet (pre-backfill); decode those here.
+        metrics: Dict[str, Any] = reading
+        if reading.get("data") is not None:
+            metrics = extract_metrics_from_json(reading["data"])
+            if metrics is None:
+                continue
 
         reading_type = str(reading.get("reading_type") or asset_info.get("type") or "").upper()
         site_bucket = per_site[site_id]
 
         if reading_type == "AC_METER":
-            v1 = _pick(data, ["voltage_1", "voltage_l1", "Voltage_1 (VAC)", "V_L1_N", "V_L1_N (VAC)"])
-            v2 = _pick(data, ["voltage_2", "voltage_l2", "Voltage_2 (VAC)", "V_L2_N", "V_L2_N (VAC)"])
-            v3 = _pick(data, ["voltage_3", "voltage_l3", "Voltage_3 (VAC)", "V_L3_N", "V_L3_N (VAC)"])
+            v1 = _metric(metrics, "voltage_l1")
+            v2 = _metric(metrics, "voltage_l2")
+            v3 = _metric(metrics, "voltage_l3")
             avg_v = _avg([v for v in [v1, v2, v3] if v > 0])
 
-            freq = _pick(data, ["frequency", "Frequency (Hz)", "AC_Frequency"], 0.0)
-            p_kw = _pick(
-                data,
-                [
-                    "total_active_power",
-                    "total_power_kw",
-                    "total_power",
-                    "Total_Active_Power (kW)",
-                    "Total Active Power (kW)",
-                    "Total_Active_Power (kw)",
-                    "active_power_1",
-                    "active_power_2",
-                    "active_power_3",
-                ],
-                0.0,
-            )
+            freq = _metric(metrics, "frequency")
+            p_kw = _metric(metrics, "ac_power")
 
             if avg_v > 0:
                 site_bucket["grid_voltage"] = avg_v
@@ -262,33 +204,8 @@ def get_power_flow(
                 site_bucket["grid_available"] = True
 
         elif reading_type == "GENERATOR":
-            # Some generator meters report AC-like fields (same schema as AC meter)
-            p_kw = _pick(
-                data,
-                [
-                    "power_kw",
-                    "gen_total_watt",
-                    "Gen_Total_Power",
-                    "total_power_kw",
-                    "total_active_power",
-                    "Total Power (KW)",
-                    "Total_Active_Power (kW)",
-                    "Total_Active_Power (kw)",
-                    "P_SUM",
-                    "p1",
-                    "p2",
-                    "p3",
-                    "P1",
-                    "P2",
-                    "P3",
-                ],
-                0.0,
-            )
-            if p_kw == 0.0:
-                p1 = _pick(data, ["p1", "P1"], 0.0)
-                p2 = _pick(data, ["p2", "P2"], 0.0)
-                p3 = _pick(data, ["p3", "P3"], 0.0)
-                p_kw = p1 + p2 + p3
+            # Decoded at ingest: total power, falling back to the per-phase sum.
+            p_kw = _metric(metrics, "gen_power")
             site_bucket["gen_power"] += max(0.0, _normalize_kw(p_kw))
 
         elif reading_type == "DC_METER":
@@ -296,7 +213,7 @@ def get_power_flow(
             config = asset_info.get("config") or {}
             channels = config.get("channels") if isinstance(config.get("channels"), list) else []
 
-            system_v = _pick(data, ["Voltage", "System_DC_Voltage", "dc_voltage"], 0.0)
+            system_v = _metric(metrics, "dc_voltage")
 
             # Channel-aware mapping (preferred when config provides indices)
             if channels:
@@ -309,8 +226,14 @@ def get_power_flow(
                     if not isinstance(ch_index, int):
                         continue
 
-                    p_raw = data.get(f"Power{ch_index}")
-                    c_raw = data.get(f"Current{ch_index}")
+                    if 1 <= ch_index <= MAX_CHANNEL_INDEX:
+                        p_raw = metrics.get(f"channel_power_{ch_index}")
+                        c_raw = metrics.get(f"channel_current_{ch_index}")
+                    else:
+                        # Channels past the typed columns still come from the raw payload.
+                        raw_data = _raw_reading_data(reading_repo, reading)
+                        p_raw = raw_data.get(f"Power{ch_index}")
+                        c_raw = raw_data.get(f"Current{ch_index}")
                     power_kw = _normalize_kw(p_raw)
                     current = _to_float(c_raw, 0.0)
 
@@ -333,14 +256,14 @@ def get_power_flow(
                 continue
 
             # Fallback schema: dedicated battery/solar DC meter assets
-            batt_kw = _normalize_kw(_pick(data, ["p1_batt", "battery_power", "Battery_Power", "Power1"], 0.0))
-            solar_kw = _normalize_kw(_pick(data, ["p2_solar_y2", "solar_power", "Solar_Power", "Power2"], 0.0))
+            batt_kw = _normalize_kw(_metric(metrics, "battery_power"))
+            solar_kw = _normalize_kw(_metric(metrics, "solar_power"))
 
-            batt_v = _pick(data, ["vrms1_batt", "battery_voltage", "Battery_V", "Battery"], 0.0)
-            solar_v = _pick(data, ["vrms2_solar_y2", "vrms1_batt"], 0.0)
+            batt_v = _metric(metrics, "battery_voltage")
+            solar_v = _metric(metrics, "solar_voltage")
 
-            batt_i = _pick(data, ["irms1_batt", "battery_current", "Current1"], 0.0)
-            solar_i = _pick(data, ["irms2_solar_y2", "Current2"], 0.0)
+            batt_i = _metric(metrics, "battery_current")
+            solar_i = _metric(metrics, "solar_current")
 
             if "solar" in asset_name and solar_v == 0.0:
                 solar_v = batt_v
@@ -359,20 +282,20 @@ def get_power_flow(
             if solar_i > 0:
                 site_bucket["solar_current"] = max(site_bucket["solar_current"], solar_i)
 
-            soc_val = _pick(data, ["battery_soc", "state_of_charge"], None)
+            soc_val = _metric(metrics, "battery_soc", None)
             if soc_val is not None:
                 site_bucket["battery_soc"] = soc_val
 
         elif reading_type == "RECTIFIER":
-            dc_v = _pick(data, ["System_DC_Voltage", "dc_voltage", "DC_Output_V", "Battery_V"], 0.0)
-            dc_i = _pick(data, ["Total_DC_Load_Current", "Total_DC_Load_Current (A)", "Total_DC_Load_Amp"], 0.0)
+            dc_v = _metric(metrics, "rectifier_dc_voltage")
+            dc_i = _metric(metrics, "rectifier_dc_current")
             if dc_v > 0 and dc_i > 0:
                 site_bucket["rectifier_kw"] += (dc_v * dc_i) / 1000.0
             if dc_v > 0:
                 site_bucket["rectifier_dc_v"] = max(site_bucket["rectifier_dc_v"], dc_v)
 
         elif reading_type == "FUEL_LEVEL":
-            fuel = _pick(data, ["fuel_level", "Fuel Level", "Fuel Level (L)", "fuel_level_liters"], 0.0)
+            fuel = _metric(metrics, "fuel_level")
             if fuel > 0:
                 site_bucket["fuel_level"] = fuel
 
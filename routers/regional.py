@@ -2,12 +2,14 @@ from fastapi import APIRouter
 from db.repositories.site_repository import SiteRepository
 from db.repositories.asset_repository import AssetRepository
 from db.repositories.reading_repository import ReadingRepository
+from services.response_cache import cached_endpoint
 import json
 from typing import Dict, List
 
 router = APIRouter()
 
 @router.get("/regional-data")
+@cached_endpoint('regional-data', depends=('sites',))
 def get_regional_data():
     """Get regional overview data grouped by zones"""
     site_repo = SiteRepository()
@@ -7,7 +7,7 @@ from datetime import datetime
 from services.report_service import ReportService
 from services.csv_export_service import CSVExportService
 from services.ihs_csv_export_service import IHSCsvExportService
-from services.ihs_client_factory import get_ihs_api_client
+from services.ihs_client_factory import get_async_ihs_api_client
 
 router = APIRouter()
 report_service = ReportService()
@@ -84,11 +84,11 @@ def get_report(report_id: str):
     return report
 
 @router.get("/export/assets")
-def export_assets():
+async def export_assets():
     try:
-        ihs_client = get_ihs_api_client()
+        ihs_client = get_async_ihs_api_client()
         service = IHSCsvExportService(ihs_client)
-        csv_content = service.generate_assets_csv()
+        csv_content = await service.generate_assets_csv()
 
         if not csv_content:
             raise HTTPException(status_code=404, detail="No assets found")
@@ -103,11 +103,11 @@ def export_assets():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/export/sites")
-def export_sites():
+async def export_sites():
     try:
-        ihs_client = get_ihs_api_client()
+        ihs_client = get_async_ihs_api_client()
         service = IHSCsvExportService(ihs_client)
-        csv_content = service.generate_sites_csv()
+        csv_content = await service.generate_sites_csv()
 
         if not csv_content:
             raise HTTPException(status_code=404, detail="No sites found")
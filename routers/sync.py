@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from db.client import get_database
+from db.repositories.alarm_repository import get_open_alarm_index
 from db.repositories.sync_metadata_repository import SyncMetadataRepository
 from services.ihs_sync_service import get_ihs_sync_service
+from services.site_scope import get_site_scope_resolver
 
 router = APIRouter()
 
@@ -41,6 +43,8 @@ def reset_cache(confirm: bool = False):
     assets_deleted = db.execute("DELETE FROM assets").rowcount
     sites_deleted = db.execute("DELETE FROM sites WHERE external_id IS NOT NULL").rowcount
     db.commit()
+    get_open_alarm_index().invalidate()
+    get_site_scope_resolver().invalidate()
 
     return {
         "success": True,
@@ -2,9 +2,10 @@ from fastapi import APIRouter
 from db.repositories.site_repository import SiteRepository
 from db.repositories.asset_repository import AssetRepository
 from db.repositories.reading_repository import ReadingRepository
+from services.response_cache import cached_endpoint
 from utils.tenant_normalizer import normalize_tenant_name
 import json
-from typing import Dict, List
+from typing import Dict, List, Sequence
 import re
 
 router = APIRouter()
@@ -42,17 +43,31 @@ def _clamp_power_kw(power_kw: float, max_kw: float = 2000.0) -> float:
         return 0.0
     return value
 
-def _first_nonzero(values) -> float:
-    for value in values:
-        power = _normalize_power_kw(value)
-        if power != 0:
-            return power
+# Power aliases per reading type, in order of preference.
+AC_TOTAL_POWER_KEYS = ('Total_Active_Power (kW)', 'Total Active Power (kW)', 'total_active_power',
+                       'total_power_kw', 'total_power')
+AC_PHASE_POWER_KEYS = ('active_power_1', 'active_power_2', 'active_power_3')
+AC_LINE_POWER_KEYS = ('power_l1', 'power_l2', 'power_l3', 'Power1', 'Power2', 'Power3')
+GEN_TOTAL_POWER_KEYS = ('Gen_Total_Power (kW)', 'Gen_Total_Power', 'Gen Total Power (kW)', 'power_kw', 'total_power_kw')
+GEN_PHASE_POWER_KEYS = ('P1', 'P2', 'P3', 'p1', 'p2', 'p3')
+DC_BATTERY_POWER_KEYS = ('Power1 (kW)', 'Power1', 'battery_power', 'Battery Power (kW)')
+DC_SOLAR_POWER_KEYS = ('Power2 (kW)', 'Power2', 'solar_power', 'Solar Power (kW)')
+DC_CHANNEL_POWER_KEYS = ('Power1', 'Power2', 'Power3', 'Power4', 'Power5', 'Power6')
+DC_CHANNEL_POWER_LOWER_KEYS = ('power1', 'power2', 'power3', 'power4', 'power5', 'power6')
+
+def _first_nonzero(data: Dict, keys: Sequence[str]) -> float:
+    """First of `keys` with a non-zero power, in kW."""
+    for key in keys:
+        if key in data:
+            power = _normalize_power_kw(data[key])
+            if power != 0:
+                return power
     return 0.0
 
-def _sum_power_fields(data: Dict, keys: List[str]) -> float:
+def _sum_power_fields(data: Dict, keys: Sequence[str]) -> float:
     if not isinstance(data, dict):
         return 0.0
-    return sum(_normalize_power_kw(data.get(key)) for key in keys if key in data)
+    return sum(_normalize_power_kw(data[key]) for key in keys if key in data)
 
 def _normalize_tenant_id(value: str) -> str:
     if not value:
@@ -152,6 +167,7 @@ def group_sites_by_tenant(sites: List[Dict]) -> Dict[str, List[Dict]]:
     return tenant_sites
 
 @router.get("/tenants")
+@cached_endpoint('tenants', depends=('readings', 'sites'))
 def get_tenants():
     """Get all tenants with their sites and basic metrics using tenant_channels"""
     asset_repo = AssetRepository()
@@ -265,34 +281,16 @@ def get_tenants():
                 reading_type = reading['reading_type']
 
                 if reading_type == 'AC_METER':
-                    power = _first_nonzero([
-                        data.get('Total_Active_Power (kW)'),
-                        data.get('Total Active Power (kW)'),
-                        data.get('total_active_power'),
-                        data.get('total_power_kw'),
-                        data.get('total_power'),
-                    ])
+                    power = _first_nonzero(data, AC_TOTAL_POWER_KEYS)
                     if power == 0:
-                        power = _sum_power_fields(
-                            data,
-                            ['active_power_1', 'active_power_2', 'active_power_3']
-                        )
+                        power = _sum_power_fields(data, AC_PHASE_POWER_KEYS)
                     if power == 0:
-                        power = _sum_power_fields(
-                            data,
-                            ['power_l1', 'power_l2', 'power_l3', 'Power1', 'Power2', 'Power3']
-                        )
+                        power = _sum_power_fields(data, AC_LINE_POWER_KEYS)
                     tenant_info['energySources']['grid'] += _clamp_power_kw(power)
                 elif reading_type == 'GENERATOR':
-                    power = _first_nonzero([
-                        data.get('Gen_Total_Power (kW)'),
-                        data.get('Gen_Total_Power'),
-                        data.get('Gen Total Power (kW)'),
-                        data.get('power_kw'),
-                        data.get('total_power_kw'),
-                    ])
+                    power = _first_nonzero(data, GEN_TOTAL_POWER_KEYS)
                     if power == 0:
-                        power = _sum_power_fields(data, ['P1', 'P2', 'P3', 'p1', 'p2', 'p3'])
+                        power = _sum_power_fields(data, GEN_PHASE_POWER_KEYS)
                     tenant_info['energySources']['generator'] += _clamp_power_kw(power)
                 elif reading_type == 'DC_METER':
                     # DC Meter readings can be multi-tenant. When channel indices are available for this tenant,
@@ -308,29 +306,13 @@ def get_tenants():
                             tenant_power += power
                         tenant_info['energySources']['battery'] += tenant_power
                     else:
-                        battery_power = _first_nonzero([
-                            data.get('Power1 (kW)'),
-                            data.get('Power1'),
-                            data.get('battery_power'),
-                            data.get('Battery Power (kW)'),
-                        ])
-                        solar_power = _first_nonzero([
-                            data.get('Power2 (kW)'),
-                            data.get('Power2'),
-                            data.get('solar_power'),
-                            data.get('Solar Power (kW)'),
-                        ])
+                        battery_power = _first_nonzero(data, DC_BATTERY_POWER_KEYS)
+                        solar_power = _first_nonzero(data, DC_SOLAR_POWER_KEYS)
 
                         if battery_power == 0 and solar_power == 0:
-                            total_power = _sum_power_fields(
-                                data,
-                                ['Power1', 'Power2', 'Power3', 'Power4', 'Power5', 'Power6']
-                            )
+                            total_power = _sum_power_fields(data, DC_CHANNEL_POWER_KEYS)
                             if total_power == 0:
-                                total_power = _sum_power_fields(
-                                    data,
-                                    ['power1', 'power2', 'power3', 'power4', 'power5', 'power6']
-                                )
+                                total_power = _sum_power_fields(data, DC_CHANNEL_POWER_LOWER_KEYS)
                             battery_power = total_power
 
                         tenant_info['energySources']['battery'] += battery_power
@@ -1,5 +1,6 @@
 from models import CompositeRule, EvaluationResult
 from rules.parameter_mapper import extract_value
+from services.extractor_registry import schema_for
 from rules.simple_rules import SimpleRuleEvaluator
 
 class CompositeRuleEvaluator:
@@ -8,7 +9,7 @@ class CompositeRuleEvaluator:
     def __init__(self):
         self.simple_evaluator = SimpleRuleEvaluator()
 
-    async def evaluate(self, rule: CompositeRule, reading: dict) -> EvaluationResult:
+    def evaluate(self, rule: CompositeRule, reading: dict) -> EvaluationResult:
         """Evaluate multi-condition rule with AND/OR logic"""
         if not rule.conditions or len(rule.conditions) == 0:
             return EvaluationResult(
@@ -19,9 +20,10 @@ class CompositeRuleEvaluator:
 
         results = []
         values = []
+        schema = schema_for(reading)
 
         for condition in rule.conditions:
-            value = extract_value(condition.parameter, reading)
+            value = extract_value(condition.parameter, reading, schema)
             if value is None:
                 results.append(False)
                 values.append(None)
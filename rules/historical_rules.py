@@ -1,7 +1,223 @@
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+import os
+import threading
+import time
 from models import CompositeRule, EvaluationResult
 from rules.parameter_mapper import extract_value
 from rules.simple_rules import SimpleRuleEvaluator
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_WINDOW_MINUTES = 4320  # 3 days
+HISTORICAL_WINDOW_MAX = int(os.getenv('HISTORICAL_WINDOW_MAX', '20000'))
+HISTORICAL_WINDOW_IDLE_SECONDS = float(os.getenv('HISTORICAL_WINDOW_IDLE_SECONDS', '3600'))
+# How often reads compare the windows against the 'reading_deletes' generation.
+HISTORICAL_WINDOW_CHECK_SECONDS = float(os.getenv('HISTORICAL_WINDOW_CHECK_SECONDS', '5'))
+
+# (asset_id, parameter, window minutes); rules sharing all three share a window
+WindowKey = Tuple[int, str, int]
+
+
+class SlidingWindow:
+    """
+    One parameter's readings over a time window, with amortised O(1)
+    avg/sum/min/max: a running sum and count plus monotonic deques for the
+    extremes. Readings without a value for the parameter still count as samples.
+    """
+
+    def __init__(self):
+        self.last_id = 0
+        self._readings = deque()  # (time, value or None), oldest first
+        self._sum = 0.0
+        self._count = 0
+        self._min = deque()  # (time, value), values increasing
+        self._max = deque()  # (time, value), values decreasing
+
+    @property
+    def newest_time(self) -> Optional[datetime]:
+        return self._readings[-1][0] if self._readings else None
+
+    def push(self, reading_time: datetime, value: Optional[float]):
+        """Append a reading; must not be older than the newest one already held."""
+        self._readings.append((reading_time, value))
+        if value is None:
+            return
+        self._sum += value
+        self._count += 1
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((reading_time, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((reading_time, value))
+
+    def expire(self, cutoff_time: datetime):
+        """Drop readings stamped before `cutoff_time`."""
+        while self._readings and self._readings[0][0] < cutoff_time:
+            _, value = self._readings.popleft()
+            if value is not None:
+                self._sum -= value
+                self._count -= 1
+        while self._min and self._min[0][0] < cutoff_time:
+            self._min.popleft()
+        while self._max and self._max[0][0] < cutoff_time:
+            self._max.popleft()
+
+    @property
+    def samples(self) -> int:
+        return len(self._readings)
+
+    def aggregate(self, agg_type: str) -> float | None:
+        if not self._count:
+            return None
+        if agg_type == 'sum':
+            return self._sum
+        if agg_type == 'min':
+            return self._min[0][1]
+        if agg_type == 'max':
+            return self._max[0][1]
+        return self._sum / self._count  # avg, and the default
+
+
+class HistoricalWindowStore:
+    """
+    Sliding windows per (asset, parameter, window), so historical rules are
+    evaluated without reading history on every call.
+
+    A window is built from the database the first time it is needed, including
+    after a restart. Later readings are folded in by `on_ingest`, which is
+    registered as a reading-ingest listener. Deleting readings, in any process,
+    bumps the 'reading_deletes' generation (migration 020) and every window is
+    rebuilt on next use. The generation is checked at most every
+    `HISTORICAL_WINDOW_CHECK_SECONDS`; `invalidate()` drops windows at once.
+    Windows are kept in LRU order: at most `HISTORICAL_WINDOW_MAX` of them, and
+    none unused for longer than `HISTORICAL_WINDOW_IDLE_SECONDS` (e.g. those of
+    deleted assets).
+    """
+
+    def __init__(self, db, max_windows: int = HISTORICAL_WINDOW_MAX,
+                 idle_seconds: float = HISTORICAL_WINDOW_IDLE_SECONDS,
+                 check_seconds: float = HISTORICAL_WINDOW_CHECK_SECONDS):
+        self.db = db
+        self.max_windows = max(1, int(max_windows))
+        self.idle_seconds = idle_seconds
+        self.check_seconds = check_seconds
+        self._windows: "OrderedDict[WindowKey, SlidingWindow]" = OrderedDict()
+        self._used_at: Dict[WindowKey, float] = {}
+        self._keys_by_asset: Dict[int, List[WindowKey]] = {}
+        self._deletes_generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def read(self, asset_id: int, parameter: str, minutes: int, agg_type: str) -> Tuple[int, Optional[float]]:
+        """Sample count and `agg_type` aggregate of a window, read under the lock."""
+        key = (asset_id, parameter, minutes)
+        generation = self._check_deletes()
+        with self._lock:
+            window = self._windows.get(key)
+        if window is None:
+            window = self._build(parameter, minutes, asset_id)
+            with self._lock:
+                # Another thread may have built it meanwhile; keep the first one. One
+                # built before readings were deleted is used once, not kept.
+                if key not in self._windows and generation == self._deletes_generation:
+                    self._windows[key] = window
+                    self._keys_by_asset.setdefault(asset_id, []).append(key)
+        with self._lock:
+            window = self._windows.get(key, window)
+            if key in self._windows:
+                self._windows.move_to_end(key)
+                self._used_at[key] = time.monotonic()
+                self._evict()
+            window.expire(datetime.now() - timedelta(minutes=minutes))
+            return window.samples, window.aggregate(agg_type)
+
+    def _check_deletes(self) -> int:
+        with self._lock:
+            if (self._deletes_generation is not None
+                    and time.monotonic() - self._checked_at < self.check_seconds):
+                return self._deletes_generation
+            self._checked_at = time.monotonic()
+        generation = self.db.get_data_generation('reading_deletes')
+        with self._lock:
+            if generation != self._deletes_generation:
+                self._clear()
+                self._deletes_generation = generation
+        return generation
+
+    def _evict(self):
+        idle_before = time.monotonic() - self.idle_seconds
+        while self._windows:
+            key = next(iter(self._windows))
+            if len(self._windows) <= self.max_windows and self._used_at.get(key, 0) >= idle_before:
+                break
+            self._drop(key)
+            self.evictions += 1
+
+    def _build(self, parameter: str, minutes: int, asset_id: int) -> SlidingWindow:
+        window = SlidingWindow()
+        readings = self.db.get_readings_since(asset_id, datetime.now() - timedelta(minutes=minutes))
+        # Newest-first by id; pushed oldest first by time.
+        for reading in sorted(readings, key=lambda r: (r['time'], r['id'])):
+            window.push(reading['time'], extract_value(parameter, reading['data']))
+        window.last_id = max((r['id'] for r in readings), default=0)
+        return window
+
+    def on_ingest(self, asset_ids: List[int]):
+        """Fold newly committed readings into the windows of these assets."""
+        with self._lock:
+            tracked = [asset_id for asset_id in asset_ids if asset_id in self._keys_by_asset]
+            if not tracked:
+                return
+            after_id = min(self._windows[key].last_id for a in tracked for key in self._keys_by_asset[a])
+
+        readings = self.db.get_readings_after_id(tracked, after_id)
+
+        with self._lock:
+            for reading in readings:
+                for key in list(self._keys_by_asset.get(reading['asset_id'], ())):
+                    window = self._windows[key]
+                    if reading['id'] <= window.last_id:
+                        continue
+                    window.last_id = reading['id']
+                    if reading['time'] is None:
+                        continue
+                    newest = window.newest_time
+                    if newest is not None and reading['time'] < newest:
+                        # Arrived out of order; rebuilt from the database on next use.
+                        self._drop(key)
+                        continue
+                    window.push(reading['time'], extract_value(key[1], reading['data']))
+                    window.expire(reading['time'] - timedelta(minutes=key[2]))
+
+    def _drop(self, key: WindowKey):
+        self._windows.pop(key, None)
+        self._used_at.pop(key, None)
+        keys = self._keys_by_asset.get(key[0], [])
+        if key in keys:
+            keys.remove(key)
+        if not keys:
+            self._keys_by_asset.pop(key[0], None)
+
+    def invalidate(self, asset_id: Optional[int] = None):
+        """Forget windows (of one asset, or all), e.g. after readings were deleted."""
+        with self._lock:
+            if asset_id is None:
+                self._clear()
+                return
+            for key in list(self._keys_by_asset.get(asset_id, [])):
+                self._drop(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._windows), "max_size": self.max_windows, "evictions": self.evictions}
+
+    def _clear(self):
+        self._windows.clear()
+        self._used_at.clear()
+        self._keys_by_asset.clear()
+
 
 class HistoricalRuleEvaluator:
     """Evaluates rules requiring historical data aggregation"""
@@ -9,8 +225,9 @@ class HistoricalRuleEvaluator:
     def __init__(self, db):
         self.db = db
         self.simple_evaluator = SimpleRuleEvaluator()
+        self.windows = HistoricalWindowStore(db)
 
-    async def evaluate(self, rule: CompositeRule, asset_id: int) -> EvaluationResult:
+    def evaluate(self, rule: CompositeRule, asset_id: int) -> EvaluationResult:
         """Evaluate rule requiring historical data"""
         if not rule.conditions or len(rule.conditions) == 0:
             return EvaluationResult(
@@ -19,32 +236,26 @@ class HistoricalRuleEvaluator:
                 reason="No conditions"
             )
 
-        # Get readings for time window
-        minutes = rule.time_window_minutes or 4320  # Default 3 days
-        readings = await self.db.get_readings_window(asset_id, minutes)
+        condition = rule.conditions[0]
+        minutes = rule.time_window_minutes or DEFAULT_WINDOW_MINUTES
+        # Aggregate is maintained incrementally by the window
+        agg_type = rule.aggregation_type or 'avg'
+        samples, aggregate_value = self.windows.read(asset_id, condition.parameter, minutes, agg_type)
 
-        if len(readings) < 10:  # Need minimum data points
+        if samples < 10:  # Need minimum data points
             return EvaluationResult(
                 triggered=False,
-                message=f"Insufficient data: {len(readings)} readings",
+                message=f"Insufficient data: {samples} readings",
                 reason="Insufficient data",
-                samples=len(readings)
+                samples=samples
             )
 
-        # Calculate aggregate
-        condition = rule.conditions[0]
-        aggregate_value = self.calculate_aggregate(
-            readings,
-            condition.parameter,
-            rule.aggregation_type or 'avg'
-        )
-
         if aggregate_value is None:
             return EvaluationResult(
                 triggered=False,
                 message=f"No valid data for {condition.parameter}",
                 reason="No valid data",
-                samples=len(readings)
+                samples=samples
             )
 
         # Compare against threshold
@@ -54,41 +265,12 @@ class HistoricalRuleEvaluator:
             condition.value
         )
 
-        agg_type = rule.aggregation_type or 'avg'
         message = f"{agg_type.upper()} {condition.parameter} over {minutes//60}h: {aggregate_value:.2f}{condition.unit}"
 
         return EvaluationResult(
             triggered=triggered,
             value=aggregate_value,
             threshold=condition.value,
-            samples=len(readings),
+            samples=samples,
             message=message
         )
-
-    def calculate_aggregate(
-        self,
-        readings: List[dict],
-        parameter: str,
-        agg_type: str
-    ) -> float | None:
-        """Calculate aggregate value from readings"""
-        values = []
-
-        for reading in readings:
-            value = extract_value(parameter, reading.get('data', {}))
-            if value is not None:
-                values.append(value)
-
-        if not values:
-            return None
-
-        if agg_type == 'avg':
-            return sum(values) / len(values)
-        elif agg_type == 'sum':
-            return sum(values)
-        elif agg_type == 'min':
-            return min(values)
-        elif agg_type == 'max':
-            return max(values)
-        else:
-            return sum(values) / len(values)  # Default to avg
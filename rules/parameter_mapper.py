@@ -1,3 +1,8 @@
+from functools import lru_cache
+
+from services.extractor_registry import ReadingSchema
+from services.threshold_engine import ExtractionPlan, extract_value as extract_plan_value
+
 PARAMETER_MAP = {
     # Fuel
     "fuel_level": ["fuel_level", "diesel_deep_cm"],
@@ -37,16 +42,15 @@ PARAMETER_MAP = {
     "rectifier_power": ["rectifier_power", "output_power"]
 }
 
-def extract_value(parameter: str, reading: dict) -> float | None:
-    """Extract parameter value from reading with fallback fields"""
+@lru_cache(maxsize=None)
+def compile_extractor(parameter: str) -> ExtractionPlan:
+    """Extraction plan for a rule parameter, shared with the threshold engine's extractor"""
     fields = PARAMETER_MAP.get(parameter, [parameter])
     if isinstance(fields, str):
         fields = [fields]
+    return ExtractionPlan((("first", tuple(fields)),))
 
-    for field in fields:
-        if field in reading and reading[field] is not None:
-            try:
-                return float(reading[field])
-            except (ValueError, TypeError):
-                continue
-    return None
+
+def extract_value(parameter: str, reading: dict, schema: ReadingSchema | None = None) -> float | None:
+    """Extract parameter value from reading with fallback fields"""
+    return extract_plan_value(compile_extractor(parameter), reading, schema)
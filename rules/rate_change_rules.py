@@ -1,21 +1,91 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
 from models import CompositeRule, EvaluationResult
 from rules.parameter_mapper import extract_value
 from rules.simple_rules import SimpleRuleEvaluator
 
+RATE_CHANGE_CACHE_SIZE = int(os.getenv('RATE_CHANGE_CACHE_SIZE', '50000'))
+
+
+class PreviousValue(NamedTuple):
+    # Identity of the reading `value` came from (e.g. its row id), if the caller has one
+    reading_key: Any
+    value: float
+    # Value before that, so re-evaluating the same reading compares against it again
+    previous: Optional[float]
+
+
+class PreviousValueCache:
+    """Bounded LRU of the last value evaluated per (asset, parameter), with hit/miss counters."""
+
+    def __init__(self, max_size: int = RATE_CHANGE_CACHE_SIZE):
+        self.max_size = max(1, int(max_size))
+        self._entries: "OrderedDict[Tuple[int, str], PreviousValue]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[int, str]) -> Optional[PreviousValue]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple[int, str], entry: PreviousValue):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
 class RateChangeEvaluator:
     """Evaluates rules based on rate of change between consecutive readings"""
 
-    def __init__(self, db):
+    def __init__(self, db, cache_size: int = RATE_CHANGE_CACHE_SIZE):
         self.db = db
         self.simple_evaluator = SimpleRuleEvaluator()
+        self.cache = PreviousValueCache(cache_size)
 
-    async def evaluate(
+    def evaluate(
         self,
         rule: CompositeRule,
         asset_id: int,
-        current_reading: dict
+        current_reading: dict,
+        reading_key: Any = None
     ) -> EvaluationResult:
-        """Detect sudden changes between consecutive readings"""
+        """
+        Detect sudden changes between consecutive readings.
+
+        The previous value comes from the cache of values this evaluator has seen,
+        falling back to the asset's previous stored reading on a miss. Pass
+        `reading_key` (e.g. the reading id) when the same reading may be evaluated
+        again, so it is compared against its predecessor rather than itself.
+        """
         if not rule.conditions or len(rule.conditions) == 0:
             return EvaluationResult(
                 triggered=False,
@@ -23,19 +93,31 @@ class RateChangeEvaluator:
                 reason="No conditions"
             )
 
-        # Get previous reading
-        prev_reading = await self.db.get_previous_reading(asset_id)
-        if not prev_reading:
+        condition = rule.conditions[0]
+        current_value = extract_value(condition.parameter, current_reading)
+
+        key = (asset_id, condition.parameter)
+        cached = self.cache.get(key)
+        same_reading = cached is not None and reading_key is not None and cached.reading_key == reading_key
+        if cached is None:
+            # Cache miss: fall back to the previous stored reading
+            prev_reading = self.db.get_previous_reading(asset_id)
+            has_previous = prev_reading is not None
+            prev_value = extract_value(condition.parameter, prev_reading.get('data', {})) if prev_reading else None
+        else:
+            has_previous = True
+            prev_value = cached.previous if same_reading else cached.value
+
+        if current_value is not None and not same_reading:
+            self.cache.put(key, PreviousValue(reading_key, current_value, prev_value))
+
+        if not has_previous:
             return EvaluationResult(
                 triggered=False,
                 message="No previous reading available",
                 reason="No previous reading"
             )
 
-        condition = rule.conditions[0]
-        current_value = extract_value(condition.parameter, current_reading)
-        prev_value = extract_value(condition.parameter, prev_reading.get('data', {}))
-
         if current_value is None or prev_value is None:
             return EvaluationResult(
                 triggered=False,
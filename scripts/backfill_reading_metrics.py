@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Backfill the typed metric columns on `readings` from the stored JSON payloads.
+
+Runs once per METRICS_VERSION, in id order and committed batch by batch so it
+never holds a long write lock. If interrupted, it resumes from the rows that are
+still undecoded. Until it finishes, readers fall back to parsing `data`.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.client import get_database
+from db.repositories.reading_repository import ReadingRepository
+from services.reading_metrics import METRICS_VERSION, extract_metrics_from_json
+
+MIGRATION_VERSION = f'backfill_reading_metrics_{METRICS_VERSION:03d}'
+BATCH_SIZE = 1000
+
+
+def backfill_reading_metrics(batch_size: int = BATCH_SIZE) -> int:
+    """Decode metrics for existing readings. Returns count of updated rows, or -1 if already applied."""
+    db = get_database()
+
+    cursor = db.execute('SELECT version FROM schema_migrations WHERE version = ?', (MIGRATION_VERSION,))
+    if cursor.fetchone():
+        return -1
+
+    repo = ReadingRepository()
+    updated = 0
+    after_id = 0
+    while True:
+        rows = repo.get_undecoded_after_id(after_id, METRICS_VERSION, batch_size)
+        if not rows:
+            break
+        after_id = rows[-1]['id']
+        # Rows whose payload isn't a JSON object are still stamped, so they aren't revisited.
+        updated += repo.update_metrics_many({
+            row['id']: extract_metrics_from_json(row['data']) or {'metrics_version': METRICS_VERSION}
+            for row in rows
+        })
+
+    db.execute('INSERT INTO schema_migrations (version) VALUES (?)', (MIGRATION_VERSION,))
+    db.commit()
+    return updated
+
+
+if __name__ == '__main__':
+    result = backfill_reading_metrics()
+    if result == -1:
+        print("Migration already applied")
+    else:
+        print(f"Decoded metrics for {result} readings")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: alias probing vs the shared extractor registry.
+
+Loads the Excel-derived sample payloads in data/excel (one payload per sheet
+row, keyed by the column headers, as the devices report them) and runs each
+extractor over every payload two ways:
+  - probe:    walk the alias list key by key, as the extractors used to;
+  - registry: `services.extractor_registry`, aliases resolved once per payload shape.
+Checks that both give the same values, then reports payloads/s for each.
+The dashboard pickers ship the probe side, since they read too few aliases per
+payload for the registry to pay off; their registry side shows what it would cost.
+
+The .xlsx files are read with the standard library (zipfile + ElementTree).
+
+Run: python3 scripts/bench_extractors.py --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routers import energy_sources, tenants
+from rules.parameter_mapper import PARAMETER_MAP, compile_extractor as compile_rule_extractor
+from services import energy_mix_buckets, reading_metrics, threshold_engine
+from services.extractor_registry import schema_for, stats
+
+EXCEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "excel")
+_NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def _cell_value(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return text
+
+
+def load_payloads(path: str) -> list:
+    with zipfile.ZipFile(path) as book:
+        names = book.namelist()
+        shared = []
+        if "xl/sharedStrings.xml" in names:
+            root = ET.fromstring(book.read("xl/sharedStrings.xml"))
+            shared = ["".join(item.itertext()) for item in root.findall("m:si", _NS)]
+        sheet = ET.fromstring(book.read("xl/worksheets/sheet1.xml"))
+
+    rows = []
+    for row in sheet.findall(".//m:sheetData/m:row", _NS):
+        values = []
+        for cell in row.findall("m:c", _NS):
+            node = cell.find("m:v", _NS)
+            text = node.text if node is not None else None
+            if cell.get("t") == "s" and text is not None:
+                text = shared[int(text)]
+            values.append(text)
+        rows.append(values)
+
+    header, body = rows[0], rows[1:]
+    return [
+        {key: _cell_value(value) for key, value in zip(header, values) if key and value is not None}
+        for values in body
+    ]
+
+
+# Alias probing as the extractors did it before the registry.
+
+def _probe_first(data, keys):
+    for key in keys:
+        if key in data:
+            value = reading_metrics._to_float(data.get(key))
+            if value is not None:
+                return value
+    return None
+
+
+def _probe_plan(plan, data):
+    if plan is None:
+        return None
+    value = None
+    for reducer, keys in plan.steps:
+        values = []
+        for key in keys:
+            if key in data:
+                try:
+                    values.append(float(data[key]))
+                except (ValueError, TypeError):
+                    continue
+        if reducer == "first":
+            value = values[0] if values else None
+        elif reducer == "avg":
+            value = sum(values) / len(values) if values else None
+        else:
+            value = sum(values) if values else None
+        if value:
+            break
+    if plan.decihertz and value is not None and value > 100:
+        return value / 10
+    return value
+
+
+def _probe_metrics(data):
+    metrics = {column: _probe_first(data, keys) for column, keys in reading_metrics._SIMPLE_METRICS.items()}
+    gen_power = _probe_first(data, reading_metrics.GEN_POWER_KEYS) or 0.0
+    if gen_power == 0.0:
+        gen_power = sum(_probe_first(data, [f"p{n}", f"P{n}"]) or 0.0 for n in (1, 2, 3))
+    metrics["gen_power"] = gen_power
+    for n in range(1, reading_metrics.MAX_CHANNEL_INDEX + 1):
+        metrics[f"channel_power_{n}"] = reading_metrics._to_float(data.get(f"Power{n}"))
+        metrics[f"channel_current_{n}"] = reading_metrics._to_float(data.get(f"Current{n}"))
+    metrics["metrics_version"] = reading_metrics.METRICS_VERSION
+    return metrics
+
+
+def _registry_pick(data, keys, schema):
+    for key in schema.present(keys):
+        if data[key] is not None:
+            try:
+                return float(data[key])
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def _probe_dashboard(data):
+    return (
+        [energy_mix_buckets.pick(data, keys) for keys in _ENERGY_MIX_KEYS],
+        [tenants._sum_power_fields(data, keys) for keys in _TENANT_KEYS],
+        [
+            energy_sources._parse_float(data.get(k))
+            for keys in _ENERGY_SOURCE_KEYS for k in keys if k in data
+        ],
+    )
+
+
+def _registry_dashboard(data):
+    # Each dashboard endpoint parses its own copy of a reading, so each looks up the schema.
+    energy_mix_schema, tenant_schema, energy_source_schema = schema_for(data), schema_for(data), schema_for(data)
+    return (
+        [_registry_pick(data, keys, energy_mix_schema) for keys in _ENERGY_MIX_KEYS],
+        [sum(tenants._normalize_power_kw(data[k]) for k in tenant_schema.present(keys)) for keys in _TENANT_KEYS],
+        [
+            energy_sources._parse_float(data[k])
+            for keys in _ENERGY_SOURCE_KEYS for k in energy_source_schema.present(keys)
+        ],
+    )
+
+
+_ENERGY_MIX_KEYS = (
+    energy_mix_buckets.AC_POWER_KEYS, energy_mix_buckets.GEN_POWER_KEYS,
+    energy_mix_buckets.BATTERY_POWER_KEYS, energy_mix_buckets.SOLAR_POWER_KEYS,
+)
+_TENANT_KEYS = (
+    tenants.AC_PHASE_POWER_KEYS, tenants.AC_LINE_POWER_KEYS, tenants.GEN_PHASE_POWER_KEYS,
+    tenants.DC_CHANNEL_POWER_KEYS,
+)
+_ENERGY_SOURCE_KEYS = (
+    energy_sources.ENERGY_KEYS, energy_sources.FUEL_LEVEL_KEYS,
+    energy_sources.GENERATOR_RUNTIME_KEYS, energy_sources.AC_POWER_KEYS,
+)
+_THRESHOLD_PLANS = [
+    threshold_engine.compile_extractor(parameter)
+    for parameter in sorted(set(threshold_engine._PLANS) | set(threshold_engine.PARAMETER_FIELD_MAP))
+]
+_RULE_PLANS = [compile_rule_extractor(parameter) for parameter in sorted(PARAMETER_MAP)]
+
+
+def _probe_plans(data):
+    return [_probe_plan(plan, data) for plan in _THRESHOLD_PLANS + _RULE_PLANS]
+
+
+def _registry_plans(data):
+    schema = schema_for(data)
+    return [threshold_engine.extract_value(plan, data, schema) for plan in _THRESHOLD_PLANS + _RULE_PLANS]
+
+
+EXTRACTORS = [
+    ("reading_metrics", _probe_metrics, reading_metrics.extract_metrics),
+    ("threshold+rule plans", _probe_plans, _registry_plans),
+    ("dashboard pickers", _probe_dashboard, _registry_dashboard),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark alias probing vs the extractor registry")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payloads = []
+    for name in sorted(os.listdir(EXCEL_DIR)):
+        if name.endswith(".xlsx"):
+            rows = load_payloads(os.path.join(EXCEL_DIR, name))
+            print(f"{name:<45} {len(rows):>5} payloads, {len(rows[0]) if rows else 0} keys")
+            payloads.extend(rows)
+
+    print(f"\n{'extractor':<22} {'probe/s':>12} {'registry/s':>12} {'speedup':>8}")
+    for label, probe, registry in EXTRACTORS:
+        mismatches = sum(1 for data in payloads if probe(data) != registry(data))
+        if mismatches:
+            print(f"{label}: {mismatches} payloads differ between probe and registry")
+            sys.exit(1)
+
+        rates = []
+        for extract in (probe, registry):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for data in payloads:
+                    extract(data)
+            rates.append(len(payloads) * args.repeat / (time.perf_counter() - start))
+        print(f"{label:<22} {rates[0]:>12,.0f} {rates[1]:>12,.0f} {rates[1] / rates[0]:>7.2f}x")
+    print(f"\nregistry: {stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: `/api/power-flow` with JSON-decoded vs typed-column readings.
+
+Seeds a throwaway SQLite DB with N sites (AC meter, generator, DC meter with
+channel config, rectifier and fuel sensor per site) and several readings per
+asset, then times `get_power_flow()`:
+  - before: metric columns empty, so every latest reading is `json.loads`-ed
+    and alias-probed per request (the pre-change behaviour);
+  - after:  metric columns filled by the backfill, read straight from SQL.
+Both responses are compared to make sure the typed path is equivalent.
+
+Run: python3 scripts/bench_power_flow.py --sites 2000 --readings-per-asset 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DC_CONFIG = {"channels": [
+    {"index": 1, "type": "battery", "name": "Battery"},
+    {"index": 2, "type": "solar", "name": "Solar"},
+    {"index": 3, "type": "tenant", "name": "MTN"},
+    {"index": 4, "type": "tenant", "name": "Airtel"},
+]}
+
+
+def _payload(asset_type: str, ts: str) -> dict:
+    r = random.uniform
+    if asset_type == "AC_METER":
+        return {"date": ts, "voltage_1": r(180, 240), "voltage_2": r(180, 240), "voltage_3": r(180, 240),
+                "frequency": 50.0, "total_active_power": r(0, 15), "current_1": r(0, 30)}
+    if asset_type == "GENERATOR":
+        return {"date": ts, "P1": r(0, 5), "P2": r(0, 5), "P3": r(0, 5), "engine_speed": 1500}
+    if asset_type == "DC_METER":
+        return {"date": ts, "Voltage": r(46, 54), "Power1": r(-2000, 2000), "Power2": r(0, 3000),
+                "Power3": r(0, 1500), "Power4": r(0, 1500), "Current1": r(0, 40), "Current2": r(0, 40)}
+    if asset_type == "RECTIFIER":
+        return {"date": ts, "System_DC_Voltage": r(48, 54), "Total_DC_Load_Current": r(10, 80)}
+    return {"date": ts, "fuel_level": r(100, 1000), "diesel_deep_cm": r(10, 150)}
+
+
+def time_calls(fn, repeat: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/power-flow")
+    parser.add_argument("--sites", type=int, default=2000)
+    parser.add_argument("--readings-per-asset", type=int, default=5)
+    parser.add_argument("--sample-size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp.name, "bench.db")
+
+    from db.client import get_database
+    from routers.power_flow import get_power_flow
+    from scripts.backfill_reading_metrics import backfill_reading_metrics
+
+    random.seed(7)
+    db = get_database()
+    asset_types = ["AC_METER", "GENERATOR", "DC_METER", "RECTIFIER", "FUEL_LEVEL"]
+    readings = []
+    for i in range(args.sites):
+        site_id = db.execute(
+            "INSERT INTO sites (external_id, name, region, state) VALUES (?, ?, ?, ?)",
+            (i + 1, f"Site {i + 1}", "Bench", "Lagos"),
+        ).lastrowid
+        for asset_type in asset_types:
+            config = json.dumps(DC_CONFIG) if asset_type == "DC_METER" else None
+            asset_id = db.execute(
+                "INSERT INTO assets (name, type, site_id, config) VALUES (?, ?, ?, ?)",
+                (f"{asset_type} {i + 1}", asset_type, site_id, config),
+            ).lastrowid
+            for n in range(args.readings_per_asset):
+                ts = f"01/01/2025 00:{n:02d}:00"
+                readings.append((asset_id, asset_type, ts, json.dumps(_payload(asset_type, ts))))
+    db.executemany("INSERT INTO readings (asset_id, reading_type, timestamp, data) VALUES (?, ?, ?, ?)", readings)
+    db.commit()
+    print(f"Seeded {args.sites} sites, {args.sites * len(asset_types)} assets, {len(readings)} readings")
+
+    def call():
+        return get_power_flow(region=None, state=None, site=None, sample_size=args.sample_size)
+
+    before_result = call()
+    before = time_calls(call, args.repeat)
+    print(f"before (JSON decode):  {before * 1000:8.1f} ms/request")
+
+    start = time.perf_counter()
+    decoded = backfill_reading_metrics()
+    print(f"backfill: {decoded} readings in {time.perf_counter() - start:.2f}s")
+
+    after_result = call()
+    after = time_calls(call, args.repeat)
+    print(f"after (typed columns): {after * 1000:8.1f} ms/request")
+    print(f"speedup: {before / after:.2f}x")
+
+    assert json.dumps(before_result, sort_keys=True) == json.dumps(after_result, sort_keys=True), \
+        "typed-column response differs from JSON-decoded response"
+    print("responses identical")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark: readings-only sync, serial vs concurrent fetcher.
+
+Spins up the local mock IHS API, seeds a throwaway SQLite DB with N assets,
+then times:
+  - the old serial path (one `get_latest_asset_reading` + one commit per asset),
+    measured on a sample and extrapolated to N assets;
+  - `IHSSyncService.sync_readings_only()` using the concurrent fetcher.
+
+Run: python3 scripts/bench_readings_fetch.py --assets 5000 --latency-ms 20 --workers 32
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark readings-only sync")
+    parser.add_argument("--assets", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rate-limit", type=float, default=0, help="requests/sec per host (0 = unlimited)")
+    parser.add_argument("--serial-sample", type=int, default=250)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ["IHS_READINGS_WORKERS"] = str(args.workers)
+    os.environ["IHS_RATE_LIMIT_PER_SEC"] = str(args.rate_limit)
+
+    from scripts.mock_ihs_api import start_mock_server
+
+    assets_per_site = 4
+    site_count = (args.assets + assets_per_site - 1) // assets_per_site
+    server, base_url, sites, counter = start_mock_server(site_count, assets_per_site, args.latency_ms)
+    os.environ["IHS_API_BASE_URL"] = base_url
+    os.environ["IHS_API_TOKEN"] = "bench"
+
+    from db.client import get_database
+    from db.repositories.reading_repository import ReadingRepository
+    from services.ihs_api_client import IHSApiClient
+    from services.ihs_sync_service import IHSSyncService
+
+    db = get_database()
+    for site in sites:
+        cursor = db.execute(
+            "INSERT INTO sites (external_id, name, region) VALUES (?, ?, ?)",
+            (site["id"], site["name"], "Bench"),
+        )
+        db.executemany(
+            "INSERT INTO assets (external_id, name, type, site_id) VALUES (?, ?, ?, ?)",
+            [(a["id"], a["name"], "AC_METER", cursor.lastrowid) for a in site["assets"]],
+        )
+    db.commit()
+    assets = [dict(r) for r in db.execute("SELECT * FROM assets LIMIT ?", (args.assets,)).fetchall()]
+    print(f"Seeded {len(assets)} assets; mock latency {args.latency_ms:.0f}ms")
+
+    # Serial baseline (pre-change code path)
+    client = IHSApiClient(base_url, "bench")
+    repo = ReadingRepository()
+    sample = assets[: max(1, min(args.serial_sample, len(assets)))]
+    start = time.perf_counter()
+    for asset in sample:
+        reading = client.get_latest_asset_reading(asset["external_id"])
+        if reading:
+            repo.create({
+                "asset_id": asset["id"],
+                "reading_type": asset["type"],
+                "timestamp": reading.get("date"),
+                "data": json.dumps(reading),
+            })
+    serial_elapsed = time.perf_counter() - start
+    serial_projected = serial_elapsed / len(sample) * len(assets)
+    print(f"Serial:     {serial_elapsed:.2f}s for {len(sample)} assets -> ~{serial_projected:.1f}s projected for {len(assets)}")
+
+    # Concurrent fetcher
+    db.execute("DELETE FROM readings")
+    db.commit()
+    service = IHSSyncService()
+    counter["requests"] = 0
+    start = time.perf_counter()
+    result = service.sync_readings_only()
+    concurrent_elapsed = time.perf_counter() - start
+    print(
+        f"Concurrent: {concurrent_elapsed:.2f}s for {result.get('readings')} readings "
+        f"({args.workers} workers, {counter['requests']} requests)"
+    )
+    if concurrent_elapsed > 0:
+        print(f"Speedup:    {serial_projected / concurrent_elapsed:.1f}x")
+
+    server.shutdown()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: `RuleEngine` throughput per composite `rule_type`.
+
+Seeds a throwaway SQLite DB with the 33 default rules (`seed_rules.RULES`) and
+N assets, each with a few days of readings, then evaluates one fresh reading
+per asset against the rules of each type through `RuleEngine.evaluate_readings`
+(the batch entry point behind `/evaluate/batch`; `/evaluate` calls
+`evaluate_reading`, which dispatches to the same evaluators per reading).
+Reports readings/s and rule evaluations/s for simple, composite, historical
+and rate_change rules.
+
+Run: python3 scripts/bench_rule_engine.py --assets 200 --readings-per-asset 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RULE_TYPES = ["simple", "composite", "historical", "rate_change"]
+
+
+def _payload() -> dict:
+    r = random.uniform
+    return {
+        "fuel_level": r(5, 1000), "voltage": r(170, 245), "current_total": r(0, 90),
+        "frequency": r(47, 53), "battery_voltage": r(44, 56), "battery_current": r(-40, 40),
+        "solar_current": r(0, 40), "gen_voltage": r(0, 245), "gen_current": r(0, 60),
+        "temperature": r(15, 55), "tenant_power": r(0, 150), "grid_power_kw": r(0, 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RuleEngine throughput per rule type")
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--readings-per-asset", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp.name, "bench.db")
+
+    from db.client import get_database
+    from seed_rules import RULES
+    from services.rule_engine import RuleEngine
+
+    random.seed(5)
+    db = get_database()
+    site_id = db.execute(
+        "INSERT INTO sites (external_id, name, region, state) VALUES (1, 'Bench Site', 'Bench', 'Lagos')"
+    ).lastrowid
+    now = datetime.now()
+    readings = []
+    for i in range(args.assets):
+        asset_id = db.execute(
+            "INSERT INTO assets (name, type, site_id) VALUES (?, ?, ?)", (f"Asset {i + 1}", "FUEL_LEVEL", site_id)
+        ).lastrowid
+        for n in range(args.readings_per_asset):
+            ts = (now - timedelta(minutes=60 * n)).isoformat()
+            readings.append((asset_id, "bench", ts, json.dumps(_payload())))
+    db.executemany("INSERT INTO readings (asset_id, reading_type, timestamp, data) VALUES (?, ?, ?, ?)", readings)
+    db.commit()
+
+    engine = RuleEngine()
+    engine.db.init_schema()
+    for rule in RULES:
+        engine.db.insert_rule(rule)
+    rules = engine.rules()
+    print(f"Seeded {args.assets} assets, {len(readings)} readings, {len(rules)} rules")
+
+    batch = [(asset_id, _payload()) for asset_id in range(1, args.assets + 1)]
+
+    print(f"{'rule_type':<12} {'rules':>5} {'readings/s':>12} {'evals/s':>12} {'triggered':>10}")
+    for rule_type in RULE_TYPES:
+        typed = [rule for rule in rules if rule.rule_type == rule_type]
+        engine.evaluate_readings(batch, typed)  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            triggered = [hit for hits in engine.evaluate_readings(batch, typed) for hit in hits]
+        elapsed = (time.perf_counter() - start) / args.repeat
+        per_second = len(batch) / elapsed
+        print(f"{rule_type:<12} {len(typed):>5} {per_second:>12,.0f} {per_second * len(typed):>12,.0f} {len(triggered):>10}")
+    print(f"rate-change previous-value cache: {engine.rate_change_evaluator.cache.stats()}")
+
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sync write phase, per-row upserts vs bulk page upserts.
+
+Builds a synthetic `/sites` payload (default 10k sites) and times writing it
+into a throwaway SQLite DB twice with each strategy: a cold pass (all inserts)
+and a warm pass (all updates).
+
+  - per-row: `upsert_by_external_id` for each site and asset (SELECT + write + commit)
+  - bulk:    `IHSSyncService._upsert_site_page` for each page of 100 sites
+             (INSERT ... ON CONFLICT via executemany, one transaction per page)
+
+Run: python3 scripts/bench_sync_upsert.py --sites 10000 --assets-per-site 2
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync write phase")
+    parser.add_argument("--sites", type=int, default=10000)
+    parser.add_argument("--assets-per-site", type=int, default=2)
+    parser.add_argument("--per-page", type=int, default=100)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp.name, "bench.db")
+    os.environ.setdefault("IHS_API_BASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("IHS_API_TOKEN", "bench")
+
+    from scripts.mock_ihs_api import build_sites
+    from db.client import get_database
+    from services.ihs_sync_service import IHSSyncService
+
+    payload = build_sites(args.sites, args.assets_per_site)
+    pages = [payload[i:i + args.per_page] for i in range(0, len(payload), args.per_page)]
+    service = IHSSyncService()
+    db = get_database()
+
+    def reset():
+        db.execute("DELETE FROM assets")
+        db.execute("DELETE FROM sites")
+        db.commit()
+
+    def per_row():
+        for ihs_site in payload:
+            site_id = service.site_repo.upsert_by_external_id(ihs_site["id"], service._extract_site_fields(ihs_site))
+            for ihs_asset in ihs_site.get("assets", []):
+                row = service._build_asset_row(ihs_asset, site_id)
+                service.asset_repo.upsert_by_external_id(row["external_id"], row)
+
+    def bulk():
+        stats = {"sites": 0, "assets": 0}
+        seen = set()
+        for page in pages:
+            service._upsert_site_page(page, seen, stats)
+
+    print(f"Payload: {len(payload)} sites, {len(payload) * args.assets_per_site} assets, {len(pages)} pages")
+    results = {}
+    for name, fn in (("per-row", per_row), ("bulk", bulk)):
+        reset()
+        start = time.perf_counter()
+        fn()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        fn()
+        warm = time.perf_counter() - start
+        results[name] = (cold, warm)
+        print(f"{name:8s} cold (insert): {cold:7.2f}s   warm (update): {warm:7.2f}s")
+
+    print(
+        f"Speedup  cold: {results['per-row'][0] / results['bulk'][0]:.1f}x   "
+        f"warm: {results['per-row'][1] / results['bulk'][1]:.1f}x"
+    )
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
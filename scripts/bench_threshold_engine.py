@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Benchmark: AlarmMonitor threshold evaluation, pairwise loop vs compiled engine.
+
+Builds N synthetic assets (AC meters, generators, DC meters, rectifiers, fuel
+sensors) with realistic latest-reading payloads and M thresholds mixing
+single- and multi-condition rules, then times one evaluation cycle:
+  - before: for every (asset, threshold) pair, `_should_evaluate_threshold`
+    + `_evaluate_threshold` (the pre-change loop, kept in this script);
+  - after:  `ThresholdEngine` compile + grouped, vectorised evaluation.
+Both produce the same violations; the script asserts that.
+
+Run: python3 scripts/bench_threshold_engine.py --assets 10000 --thresholds 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.extractor_registry import ReadingSchema, schema_for
+from services.threshold_engine import compile_extractor, extract_value
+
+ASSET_TYPES = ["AC_METER", "GENERATOR", "DC_METER", "RECTIFIER", "FUEL_LEVEL"]
+
+# (category, parameter, low, high) ranges the generated thresholds are drawn from
+THRESHOLD_SPECS = [
+    ("Grid ACEM", "voltage", 180, 240),
+    ("Grid ACEM", "frequency", 48, 52),
+    ("Grid", "current_sum", 0, 90),
+    ("Gen ACEM", "gen_voltage", 180, 240),
+    ("Gen ACEM", "gen_frequency", 48, 52),
+    ("Generator", "coolant_temp", 60, 110),
+    ("Generator", "engine_speed", 1400, 1600),
+    ("Battery", "battery_voltage", 44, 56),
+    ("Battery", "battery_current", 0, 60),
+    ("Solar", "solar_current", 0, 40),
+    ("Fuel Sensor", "fuel_depth_cm", 10, 150),
+    ("Fuel", "fuel_level", 100, 1000),
+    ("Temperature Sensor", "equipment_temp", 20, 50),
+]
+
+
+def _payload(asset_type: str) -> dict:
+    r = random.uniform
+    if asset_type == "AC_METER":
+        return {"voltage_1": r(170, 245), "voltage_2": r(170, 245), "voltage_3": r(170, 245),
+                "frequency": r(47, 53), "current_1": r(0, 30), "current_2": r(0, 30), "current_3": r(0, 30)}
+    if asset_type == "GENERATOR":
+        return {"Phase_L1_V": r(170, 245), "Phase_L2_V": r(170, 245), "Phase_L3_V": r(170, 245),
+                "AC_Frequency": r(470, 530), "Coolant_Temperature": r(50, 115), "Engine_Speed": r(1350, 1650),
+                "Equipment_Area_Temperature": r(15, 55)}
+    if asset_type == "DC_METER":
+        return {"Voltage": r(42, 57), "Current1": r(0, 70), "Current4": r(0, 45), "Power1": r(-2000, 2000)}
+    if asset_type == "RECTIFIER":
+        return {"System_DC_Voltage": r(42, 57), "Total_DC_Load_Current": r(0, 70), "temperature": r(15, 55)}
+    return {"diesel_deep_cm": r(5, 160), "Fuel Level (L)": r(50, 1100)}
+
+
+def _condition(low: float, high: float) -> tuple:
+    """An operator/limit pair on the tail of the normal range, like a real alarm threshold."""
+    margin = (high - low) * random.uniform(0.0, 0.15)
+    if random.random() < 0.5:
+        return random.choice(["<", "<="]), round(low + margin, 1)
+    return random.choice([">", ">="]), round(high - margin, 1)
+
+
+def _threshold(i: int) -> dict:
+    category, parameter, low, high = random.choice(THRESHOLD_SPECS)
+    condition, value = _condition(low, high)
+    threshold = {
+        "id": f"th_{i}", "name": f"Threshold {i}", "category": category, "parameter": parameter,
+        "condition": condition, "value": value,
+        "unit": "", "severity": random.choice(["critical", "major", "minor"]), "description": f"Threshold {i}",
+        "conditions": None, "logic_operator": None,
+    }
+    if i % 3 == 0:
+        # Multi-condition rule over two parameters of the same category
+        same = [spec for spec in THRESHOLD_SPECS if spec[0] == category]
+        conditions = []
+        for _, param, lo, hi in random.sample(same, min(2, len(same))):
+            op, limit = _condition(lo, hi)
+            conditions.append({"parameter": param, "condition": op, "value": limit, "unit": ""})
+        threshold["conditions"] = json.dumps(conditions)
+        threshold["logic_operator"] = random.choice(["AND", "OR"])
+    return threshold
+
+
+def _evaluate_threshold(threshold: Dict, reading_data: Dict) -> Optional[Dict]:
+    """
+    The pre-engine pairwise evaluation of one threshold against one reading, kept
+    here as the baseline: violation details if violated, None otherwise.
+    """
+    # Multi-condition thresholds (synced from composite_rules) live in `thresholds.conditions`.
+    raw_conditions = threshold.get("conditions")
+    if raw_conditions:
+        try:
+            conditions = json.loads(raw_conditions) if isinstance(raw_conditions, str) else raw_conditions
+        except Exception:
+            conditions = None
+
+        if isinstance(conditions, list) and conditions:
+            logic = (threshold.get("logic_operator") or "AND").upper()
+            results = []
+            last_value = None
+            last_condition = None
+            last_threshold_value = None
+
+            last_unit = None
+            last_parameter = None
+            schema = schema_for(reading_data)
+            for cond in conditions:
+                if not isinstance(cond, dict):
+                    continue
+                param = cond.get("parameter") or threshold.get("parameter") or ""
+                value = _extract_value(param, reading_data, schema)
+                if value is None:
+                    results.append(False)
+                    continue
+
+                op = cond.get("condition") or cond.get("operator")
+                threshold_value = cond.get("value")
+                if op is None or threshold_value is None:
+                    results.append(False)
+                    continue
+
+                last_value = value
+                last_condition = op
+                last_threshold_value = threshold_value
+                last_unit = cond.get("unit")
+                last_parameter = param
+                results.append(_compare(value, op, threshold_value))
+
+            triggered = all(results) if logic == "AND" else any(results)
+            if triggered and last_value is not None:
+                return {
+                    "current_value": last_value,
+                    "threshold_value": last_threshold_value,
+                    "condition": last_condition,
+                    "unit": last_unit,
+                    "parameter": last_parameter,
+                }
+            return None
+
+    # Single-condition threshold
+    parameter = threshold.get("parameter") or ""
+    value = _extract_value(parameter, reading_data)
+    if value is None:
+        return None
+
+    condition = threshold.get("condition")
+    threshold_value = threshold.get("value")
+    if condition is None or threshold_value is None:
+        return None
+
+    if _compare(value, condition, threshold_value):
+        return {"current_value": value, "threshold_value": threshold_value, "condition": condition, "unit": threshold.get("unit"), "parameter": parameter}
+    return None
+
+
+def _compare(value: float, condition: str, threshold_value: float) -> bool:
+    if condition == "<=":
+        return value <= threshold_value
+    if condition == "<":
+        return value < threshold_value
+    if condition == ">=":
+        return value >= threshold_value
+    if condition == ">":
+        return value > threshold_value
+    if condition == "==":
+        return value == threshold_value
+    if condition == "!=":
+        return value != threshold_value
+    return False
+
+
+def _extract_value(parameter: str, reading_data: Dict, schema: Optional[ReadingSchema] = None) -> Optional[float]:
+    """
+    Extract parameter value from reading data.
+    Handles multiple possible field names for the same parameter; which of
+    them a payload shape carries is resolved once by the extractor registry.
+    """
+    return extract_value(compile_extractor(parameter), reading_data, schema)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AlarmMonitor threshold evaluation")
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--thresholds", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp.name, "bench.db")
+
+    from services.alarm_monitor import AlarmMonitor
+    from services.threshold_engine import ThresholdEngine
+
+    random.seed(11)
+    assets = []
+    readings = {}
+    for i in range(args.assets):
+        asset_type = ASSET_TYPES[i % len(ASSET_TYPES)]
+        assets.append({"id": i + 1, "name": f"{asset_type}_{i + 1}", "type": asset_type, "site_id": i // 5 + 1})
+        readings[i + 1] = json.dumps(_payload(asset_type))
+    thresholds = [_threshold(i) for i in range(args.thresholds)]
+    monitor = AlarmMonitor()
+
+    def before():
+        violations = []
+        for asset in assets:
+            reading_data = json.loads(readings[asset["id"]])
+            for threshold in thresholds:
+                if monitor._should_evaluate_threshold(threshold, asset):
+                    violation = _evaluate_threshold(threshold, reading_data)
+                    if violation:
+                        violations.append((asset["id"], threshold["id"], violation))
+        return violations
+
+    def after():
+        engine = ThresholdEngine(thresholds)
+        data_by_asset = {
+            asset["id"]: json.loads(readings[asset["id"]])
+            for asset in assets
+            if engine.thresholds_for(asset["type"])
+        }
+        return [
+            (asset["id"], threshold["id"], violation)
+            for asset, threshold, violation in engine.evaluate(assets, data_by_asset)
+        ]
+
+    def timed(fn):
+        fn()  # warm-up
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = fn()
+        return result, (time.perf_counter() - start) / args.repeat
+
+    print(f"{args.assets} assets x {args.thresholds} thresholds")
+    before_result, before_time = timed(before)
+    print(f"before (pairwise loop):   {before_time * 1000:8.1f} ms/cycle")
+    after_result, after_time = timed(after)
+    print(f"after (compiled engine):  {after_time * 1000:8.1f} ms/cycle")
+    print(f"speedup: {before_time / after_time:.2f}x, {len(after_result)} violations")
+
+    assert before_result == after_result, "engine violations differ from the pairwise loop"
+    print("violations identical")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+One-off compaction: remove duplicate readings per (asset_id, timestamp).
+
+Ingest now skips readings that are already stored, but rows written before
+that change may contain the same source reading many times. Keeps the first
+ingested row of each group. Safe to re-run.
+
+Run: python3 scripts/compact_readings.py [--dry-run] [--vacuum]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.client import get_database
+from db.repositories.reading_repository import ReadingRepository
+
+
+def compact_readings(dry_run: bool = False, vacuum: bool = False) -> int:
+    repo = ReadingRepository()
+    db = get_database()
+
+    total = db.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+    duplicates = repo.count_duplicates()
+    ratio = duplicates / total if total else 0.0
+    print(f"🔍 {total} readings, {duplicates} duplicates ({ratio:.1%})")
+
+    if dry_run or not duplicates:
+        return 0
+
+    deleted = repo.delete_duplicates()
+    print(f"✅ Deleted {deleted} duplicate readings")
+
+    if vacuum:
+        print("🧹 Reclaiming space (VACUUM)...")
+        db.execute("VACUUM")
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove duplicate readings")
+    parser.add_argument("--dry-run", action="store_true", help="only report the duplicate count")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards")
+    args = parser.parse_args()
+    compact_readings(dry_run=args.dry_run, vacuum=args.vacuum)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Load test: `/api/alarms/composite/evaluate` one reading per request vs
+`/api/alarms/composite/evaluate/batch` (JSON array and NDJSON).
+
+Seeds a throwaway SQLite DB with the 33 default rules and runs the composite
+alarms router in-process (through httpx's ASGI transport), or against a
+running server with --url. N gateway readings from a fleet of --assets assets
+(round-robin, so each asset reports N / assets times) are sent three ways:
+  - single: N POSTs to /evaluate;
+  - batch:  N / batch-size POSTs to /evaluate/batch with a JSON array;
+  - ndjson: the same batches as application/x-ndjson.
+Open alarms deduplicate later ones, so each pass uses its own fleet (seeded
+locally; a --url server needs assets 1..3 * assets).
+
+The in-process transport has no socket or server cost per request, which
+flatters the single-reading pass; --url against uvicorn gives the ratio
+clients actually see.
+
+Run: python3 scripts/loadtest_composite_evaluate.py --readings 5000 --assets 500 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+PREFIX = "/api/alarms/composite"
+
+
+def _profile() -> dict:
+    r = random.uniform
+    return {
+        "fuel_level": r(5, 1000), "voltage": r(0, 245), "current_total": r(0, 90),
+        "frequency": r(47, 53), "battery_voltage": r(44, 56), "battery_current": r(-40, 40),
+        "solar_current": r(0, 40), "gen_voltage": r(0, 245), "temperature": r(15, 55),
+        "grid_power_kw": r(0, 5),
+    }
+
+
+def _payloads(count: int, assets: int, first_asset_id: int) -> list:
+    # Each asset keeps a steady operating profile with a little noise between
+    # readings, the way a gateway reports; the first reading raises its alarms
+    # and later ones mostly find them already open.
+    profiles = [_profile() for _ in range(assets)]
+    return [
+        {
+            "asset_id": first_asset_id + i % assets,
+            "reading": {key: value * random.uniform(0.99, 1.01) for key, value in profiles[i % assets].items()},
+            "site": f"Site {i % assets % 50}",
+            "region": "Lagos",
+        }
+        for i in range(count)
+    ]
+
+
+async def run(client: httpx.AsyncClient, args) -> None:
+    n = args.readings
+    fleet = args.assets
+
+    single = _payloads(n, fleet, 1)
+    start = time.perf_counter()
+    alarms_single = 0
+    for payload in single:
+        response = await client.post(f"{PREFIX}/evaluate", json=payload)
+        response.raise_for_status()
+        alarms_single += response.json()["count"]
+    single_rate = n / (time.perf_counter() - start)
+
+    def batches(payloads):
+        return [payloads[i:i + args.batch_size] for i in range(0, len(payloads), args.batch_size)]
+
+    batched = _payloads(n, fleet, fleet + 1)
+    start = time.perf_counter()
+    alarms_batch = 0
+    for batch in batches(batched):
+        response = await client.post(f"{PREFIX}/evaluate/batch", json=batch)
+        response.raise_for_status()
+        alarms_batch += response.json()["count"]
+    batch_rate = n / (time.perf_counter() - start)
+
+    ndjson = _payloads(n, fleet, 2 * fleet + 1)
+    start = time.perf_counter()
+    alarms_ndjson = 0
+    for batch in batches(ndjson):
+        body = "\n".join(json.dumps(item) for item in batch) + "\n"
+        response = await client.post(
+            f"{PREFIX}/evaluate/batch", content=body, headers={"Content-Type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+        alarms_ndjson += response.json()["count"]
+    ndjson_rate = n / (time.perf_counter() - start)
+
+    print(f"{n} readings from {fleet} assets, batch size {args.batch_size}")
+    print(f"single: {single_rate:10,.0f} readings/s  ({alarms_single} alarms)")
+    print(f"batch:  {batch_rate:10,.0f} readings/s  ({alarms_batch} alarms)  {batch_rate / single_rate:5.1f}x")
+    print(f"ndjson: {ndjson_rate:10,.0f} readings/s  ({alarms_ndjson} alarms)  {ndjson_rate / single_rate:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test composite alarm evaluation endpoints")
+    parser.add_argument("--readings", type=int, default=5000)
+    parser.add_argument("--assets", type=int, default=500, help="Assets per pass")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process app)")
+    args = parser.parse_args()
+
+    random.seed(19)
+    if args.url:
+        async def remote():
+            async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+                await run(client, args)
+        asyncio.run(remote())
+        return
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp.name, "loadtest.db")
+
+    from fastapi import FastAPI
+    from database import Database
+    from db.client import get_database
+    from routers import composite_alarms
+    from seed_rules import RULES
+
+    db = Database(os.environ["DATABASE_PATH"])
+    db.init_schema()
+    for rule in RULES:
+        db.insert_rule(rule)
+    # Alarms reference assets; one fleet per pass.
+    conn = get_database()
+    site_id = conn.execute(
+        "INSERT INTO sites (external_id, name, region, state) VALUES (1, 'Load Test', 'Lagos', 'Lagos')"
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO assets (id, name, type, site_id) VALUES (?, ?, 'FUEL_LEVEL', ?)",
+        [(i, f"Asset {i}", site_id) for i in range(1, 3 * args.assets + 1)],
+    )
+    conn.commit()
+
+    app = FastAPI()
+    app.include_router(composite_alarms.router, prefix=PREFIX)
+
+    async def local():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            await run(client, args)
+
+    asyncio.run(local())
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Local mock of the IHS IoT API for benchmarks.
+
+Serves `/sites` (paginated, with nested assets) and `/assets/{id}/readings`
+with a configurable per-request latency so client-side concurrency can be
+measured without touching the real API.
+
+Run standalone:
+    python3 scripts/mock_ihs_api.py --sites 1250 --assets-per-site 4 --latency-ms 20
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+ASSET_KINDS = [
+    ("Grid AC Meter", [{"name": "voltage_l1", "type": "voltage"}]),
+    ("Generator", [{"name": "engine_speed", "type": "generator"}]),
+    ("DC Meter", [
+        {"name": "Battery", "type": "battery", "index": 1},
+        {"name": "Solar", "type": "solar", "index": 2},
+        {"name": "MTN", "type": "tenant", "index": 3},
+    ]),
+    ("Diesel Tank", [{"name": "diesel_level", "type": "fuel"}]),
+]
+
+
+def build_sites(site_count: int, assets_per_site: int) -> List[Dict]:
+    sites = []
+    asset_id = 1
+    for site_id in range(1, site_count + 1):
+        assets = []
+        for i in range(assets_per_site):
+            kind, channels = ASSET_KINDS[i % len(ASSET_KINDS)]
+            assets.append({
+                "id": asset_id,
+                "name": f"IHS_SITE_{site_id:05d} {kind}",
+                "config": {"channels": channels},
+            })
+            asset_id += 1
+        sites.append({
+            "id": site_id,
+            "name": f"IHS_SITE_{site_id:05d}",
+            "zone": {"id": site_id % 7 + 1, "name": f"Zone {site_id % 7 + 1}"},
+            "cluster": {
+                "name": f"CL{site_id % 40:02d}",
+                "state": {"name": f"State {site_id % 20}", "region": {"name": f"Region {site_id % 7}"}},
+            },
+            "assets": assets,
+        })
+    return sites
+
+
+def build_reading(asset_id: int) -> Dict:
+    return {
+        "id": asset_id,
+        "date": datetime.now().strftime("%m/%d/%Y %H:%M:%S"),
+        "voltage_1": round(random.uniform(210, 240), 1),
+        "voltage_2": round(random.uniform(210, 240), 1),
+        "voltage_3": round(random.uniform(210, 240), 1),
+        "frequency": 50.0,
+        "total_active_power": round(random.uniform(0, 15), 2),
+        "Power1": round(random.uniform(-2000, 2000), 1),
+        "Power2": round(random.uniform(0, 3000), 1),
+        "Voltage": round(random.uniform(46, 54), 2),
+        "diesel_deep_cm": round(random.uniform(10, 150), 1),
+    }
+
+
+def make_handler(sites: List[Dict], latency_s: float, counter: Dict[str, int]):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload: Dict, status: int = 200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with lock:
+                counter["requests"] = counter.get("requests", 0) + 1
+            if latency_s > 0:
+                time.sleep(latency_s)
+
+            parsed = urlparse(self.path)
+            query = parse_qs(parsed.query)
+            parts = [p for p in parsed.path.split("/") if p]
+
+            if parts == ["sites"]:
+                page = int(query.get("page", ["1"])[0])
+                per_page = int(query.get("per_page", ["100"])[0])
+                start = (page - 1) * per_page
+                self._send_json({
+                    "data": sites[start:start + per_page],
+                    "total": len(sites),
+                    "page": page,
+                    "per_page": per_page,
+                    "pages": max(1, math.ceil(len(sites) / per_page)),
+                })
+                return
+
+            if len(parts) == 3 and parts[0] == "assets" and parts[2] == "readings":
+                try:
+                    asset_id = int(parts[1])
+                except ValueError:
+                    self._send_json({"error": "bad asset id"}, status=400)
+                    return
+                self._send_json({"data": [build_reading(asset_id)], "total": 1})
+                return
+
+            self._send_json({"error": "not found"}, status=404)
+
+    return Handler
+
+
+def start_mock_server(
+    site_count: int = 1250,
+    assets_per_site: int = 4,
+    latency_ms: float = 20.0,
+    port: int = 0,
+) -> Tuple[ThreadingHTTPServer, str, List[Dict], Dict[str, int]]:
+    """Start the mock API on a background thread. Returns (server, base_url, sites, counter)."""
+    sites = build_sites(site_count, assets_per_site)
+    counter: Dict[str, int] = {"requests": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(sites, latency_ms / 1000.0, counter))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return server, base_url, sites, counter
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the IHS IoT API")
+    parser.add_argument("--sites", type=int, default=1250)
+    parser.add_argument("--assets-per-site", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    server, base_url, _sites, _counter = start_mock_server(
+        args.sites, args.assets_per_site, args.latency_ms, args.port
+    )
+    print(f"Mock IHS API listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
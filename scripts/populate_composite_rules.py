@@ -8,7 +8,7 @@ import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from db.client import get_database, close_database
+from db.client import bump_rules_version, close_database, get_database
 
 SEVERITY_MAP = {
     'Fuel Low': 'critical',
@@ -293,6 +293,7 @@ def populate_composite_rules():
         print(f"  {multi_cond} {rule_id:35s} | {rule_data['parameter']:30s} | {severity:8s}")
 
     conn.commit()
+    bump_rules_version()
     close_database()
 
     print(f"\n{'='*80}")
@@ -8,7 +8,7 @@ import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from db.client import get_database, close_database
+from db.client import bump_rules_version, close_database, get_database
 
 def sync_rules_to_thresholds():
     print(f"🔄 Syncing composite_rules → thresholds...")
@@ -122,6 +122,7 @@ def sync_rules_to_thresholds():
         print(f"  ✓ {rule_id:30s} | {rule['name']:40s} | triggers: {trigger_count}")
 
     conn.commit()
+    bump_rules_version()
     close_database()
 
     print(f"\n{'='*70}")
@@ -462,29 +462,27 @@ RULES = [
 # Rate Change: 2
 # Historical: 2
 
-async def seed_database():
+def seed_database():
     """Seed the database with all 33 rules"""
     from database import Database
     from config import config
 
     db = Database(config.DATABASE_PATH)
-    await db.init_schema()
+    db.init_schema()
 
     print(f"Seeding {len(RULES)} rules into database...")
 
     for rule in RULES:
-        await db.insert_rule(rule)
+        db.insert_rule(rule)
         print(f"  ✓ {rule['id']}: {rule['name']}")
 
     print(f"\n✅ Successfully seeded {len(RULES)} rules!")
 
     # Verify
-    count = await db.count_rules()
+    count = db.count_rules()
     print(f"✅ Database now contains {count} rules")
 
 if __name__ == "__main__":
-    import asyncio
-
     print(f"Total rules defined: {len(RULES)}")
     print("\nBreakdown:")
     print(f"  Simple: {len([r for r in RULES if r['rule_type'] == 'simple'])}")
@@ -494,4 +492,4 @@ if __name__ == "__main__":
     print()
 
     # Seed database
-    asyncio.run(seed_database())
+    seed_database()
@@ -1,18 +1,40 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime
 import json
+import os
 import secrets
 import re
+import threading
+import time
+from db.client import count_statements, get_database
 from db.repositories.threshold_repository import ThresholdRepository
-from db.repositories.alarm_repository import AlarmRepository
+from db.repositories.alarm_repository import AlarmRepository, get_open_alarm_index
 from db.repositories.asset_repository import AssetRepository
-from db.repositories.reading_repository import ReadingRepository
+from db.repositories.reading_repository import ReadingRepository, add_ingest_listener, remove_ingest_listener
 from db.repositories.site_repository import SiteRepository
+from services.rule_engine import WINDOWED_RULE_TYPES, get_rule_engine
+from services.threshold_engine import (
+    CATEGORY_ASSET_TYPES,
+    ThresholdEngine,
+    threshold_signature,
+)
+
+
+# 'event': evaluate assets as their readings are ingested; the scheduled job only
+# re-evaluates everything when thresholds, rules or alarms changed, or the last
+# full pass is older than ALARM_FULL_PASS_SECONDS. 'interval': the scheduled job
+# evaluates every asset each run.
+EVALUATION_MODE = os.getenv('ALARM_EVALUATION_MODE', 'event').strip().lower()
+# Wait this long after an ingest notification so a burst is evaluated as one batch.
+EVENT_DEBOUNCE_SECONDS = float(os.getenv('ALARM_EVENT_DEBOUNCE_SECONDS', '1.0'))
+# Longest time between full passes in event mode; also bounds how long a rule
+# edited by another process goes unevaluated.
+FULL_PASS_SECONDS = float(os.getenv('ALARM_FULL_PASS_SECONDS', '3600'))
 
 
 class AlarmMonitor:
     """
-    Background service that periodically evaluates asset readings against thresholds
+    Background service that evaluates asset readings against thresholds
     and generates alarms when violations are detected.
     """
 
@@ -23,10 +45,84 @@ class AlarmMonitor:
         self.reading_repo = ReadingRepository()
         self.site_repo = SiteRepository()
 
+        self.rule_engine = get_rule_engine()
+        self.last_cycle_stats: Dict[str, Any] = {}
+
+        self._engine: Optional[ThresholdEngine] = None
+        # Threshold set of the cycle being run, and (threshold set, rules version) of
+        # the last full pass (None until one has run).
+        self._cycle_signature = None
+        self._full_pass_signature = None
+        self._full_pass_at = 0.0
+        # 'alarms' generation as of the last cycle, counting the alarms cycles created
+        # themselves; it moving otherwise means alarms were resolved, deleted or imported.
+        self._alarms_generation: Optional[int] = None
+        self._evaluation_lock = threading.Lock()
+
+        self._pending_assets: Set[int] = set()
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._consumer: Optional[threading.Thread] = None
+
+    @property
+    def event_driven(self) -> bool:
+        return self._consumer is not None and self._consumer.is_alive()
+
+    def start_event_consumer(self):
+        """Evaluate assets as soon as new readings for them are committed."""
+        if self.event_driven:
+            return
+        self._stop.clear()
+        self._consumer = threading.Thread(target=self._consume_events, name='alarm-event-consumer', daemon=True)
+        self._consumer.start()
+        add_ingest_listener(self.enqueue_assets)
+        print(f"[AlarmMonitor] Event-driven evaluation started (debounce {EVENT_DEBOUNCE_SECONDS}s)")
+
+    def stop_event_consumer(self):
+        remove_ingest_listener(self.enqueue_assets)
+        self._stop.set()
+        self._wake.set()
+        if self._consumer is not None:
+            self._consumer.join(timeout=5)
+        self._consumer = None
+
+    def enqueue_assets(self, asset_ids: List[int]):
+        """Ingest hook: queue assets whose latest reading changed."""
+        with self._pending_lock:
+            self._pending_assets.update(asset_ids)
+        self._wake.set()
+
+    def _consume_events(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                break
+            self._stop.wait(EVENT_DEBOUNCE_SECONDS)
+            # Cleared before draining, so anything queued from here on wakes the next round.
+            self._wake.clear()
+            try:
+                self.evaluate_pending_assets()
+            except Exception as e:
+                print(f"[AlarmMonitor] Event evaluation failed: {e}")
+
+    def evaluate_pending_assets(self) -> int:
+        """Evaluate the queued assets only. Returns the number of alarms created."""
+        with self._pending_lock:
+            asset_ids, self._pending_assets = self._pending_assets, set()
+        if not asset_ids:
+            return 0
+        return self._run_cycle(sorted(asset_ids))
+
     def evaluate_all_assets(self):
         """
-        Main evaluation loop. Checks all assets against enabled thresholds
-        and creates alarms for violations.
+        Scheduled entry point. Syncs the latest readings, then checks all assets
+        against enabled thresholds and creates alarms for violations.
+
+        In event-driven mode the readings sync queues changed assets for the
+        consumer, so a full pass only runs when thresholds or composite rules
+        changed, alarms were changed by anything but evaluation (e.g. resolved
+        while the asset is still in violation), or `FULL_PASS_SECONDS` passed.
         """
         try:
             print(f"[AlarmMonitor] Starting evaluation at {datetime.now().isoformat()}")
@@ -39,305 +135,223 @@ class AlarmMonitor:
             except Exception as e:
                 print(f"[AlarmMonitor] Readings sync failed, evaluating stale data: {e}")
 
-            # Get enabled thresholds
-            thresholds = self.threshold_repo.get_enabled()
-            if not thresholds:
-                print("[AlarmMonitor] No enabled thresholds found")
+            if self.event_driven and not self._full_pass_due():
+                print("[AlarmMonitor] Thresholds, rules and alarms unchanged; changed assets are evaluated on ingest")
                 return
 
-            print(f"[AlarmMonitor] Evaluating {len(thresholds)} thresholds")
-
-            # Get all assets
-            assets = self.asset_repo.get_all()
-            print(f"[AlarmMonitor] Checking {len(assets)} assets")
-
-            alarms_created = 0
-
-            for asset in assets:
-                # Get latest reading for this asset
-                reading = self.reading_repo.get_latest_by_asset_id(asset['id'])
-                if not reading:
-                    continue
-
-                # Parse reading data
-                try:
-                    reading_data = json.loads(reading['data'])
-                except json.JSONDecodeError:
-                    print(f"[AlarmMonitor] Failed to parse reading data for asset {asset['id']}")
-                    continue
-
-                # Get site info
-                site = self.site_repo.get_by_id(asset['site_id'])
-                if not site:
-                    continue
-
-                # Evaluate each threshold
-                for threshold in thresholds:
-                    if self._should_evaluate_threshold(threshold, asset):
-                        violation = self._evaluate_threshold(threshold, reading_data)
-
-                        if violation:
-                            # Check if we should create a new alarm (deduplication)
-                            if not self._is_duplicate_alarm(asset['id'], threshold['id'], threshold['severity']):
-                                alarm_id = self._create_alarm(
-                                    threshold,
-                                    asset,
-                                    site,
-                                    reading,
-                                    reading_data,
-                                    violation
-                                )
-
-                                if alarm_id:
-                                    self.threshold_repo.increment_trigger_count(threshold['id'])
-                                    alarms_created += 1
-                                    print(f"[AlarmMonitor] Created alarm {alarm_id} for asset {asset['name']}")
-
-            print(f"[AlarmMonitor] Evaluation complete. Created {alarms_created} new alarms")
+            self._run_cycle()
 
         except Exception as e:
             print(f"[AlarmMonitor] Error during evaluation: {str(e)}")
             import traceback
             traceback.print_exc()
 
-    def _should_evaluate_threshold(self, threshold: Dict, asset: Dict) -> bool:
-        """
-        Check if a threshold should be evaluated for a given asset type.
-        Maps threshold categories to relevant asset types.
-        """
-        category = (threshold.get("category") or "").strip()
-        asset_type = (asset.get("type") or "").strip()
-
-        category_to_asset_types = {
-            # Legacy categories
-            "Fuel": {"FUEL_LEVEL"},
-            "Battery": {"DC_METER", "RECTIFIER"},
-            "Grid": {"AC_METER"},
-            "Temperature": {"RECTIFIER", "GENERATOR"},
-            "Generator": {"GENERATOR", "RECTIFIER"},
-            "Solar": {"DC_METER"},
-            # Composite-rule derived categories (current defaults)
-            "Fuel Sensor": {"FUEL_LEVEL"},
-            "Grid ACEM": {"AC_METER"},
-            "Gen ACEM": {"GENERATOR"},
-            "Temperature Sensor": {"RECTIFIER", "GENERATOR"},
+    def _run_cycle(self, asset_ids: Optional[List[int]] = None) -> int:
+        # The scheduler and the event consumer run on different threads; never overlap,
+        # or both could create the same alarm.
+        with self._evaluation_lock:
+            alarms_before = self._alarms_generation_now()
+            rules_version = self.rule_engine.db.get_rule_set().version
+            with count_statements() as statements:
+                alarms_created = self._evaluate_cycle(asset_ids)
+            if asset_ids is None:
+                self._full_pass_signature = (self._cycle_signature, rules_version)
+                self._full_pass_at = time.monotonic()
+            # A partial cycle does not cover alarm changes from before it; leave those to the next full pass.
+            if asset_ids is None or self._alarms_generation == alarms_before:
+                self._alarms_generation = alarms_before + alarms_created
+
+        scope = 'all' if asset_ids is None else len(asset_ids)
+        self.last_cycle_stats = {
+            'assets': scope,
+            'alarms_created': alarms_created,
+            'sql_statements': statements.count,
         }
+        print(
+            f"[AlarmMonitor] Evaluation complete ({scope} assets). Created {alarms_created} new alarms "
+            f"({statements.count} SQL statements)"
+        )
+        return alarms_created
 
-        valid_types = category_to_asset_types.get(category)
-        if not valid_types:
-            return False
-        return asset_type in valid_types
-
-    def _evaluate_threshold(self, threshold: Dict, reading_data: Dict) -> Optional[Dict]:
-        """
-        Evaluate if a reading violates a threshold.
-        Returns violation details if violated, None otherwise.
-        """
-        # Multi-condition thresholds (synced from composite_rules) live in `thresholds.conditions`.
-        raw_conditions = threshold.get("conditions")
-        if raw_conditions:
-            try:
-                conditions = json.loads(raw_conditions) if isinstance(raw_conditions, str) else raw_conditions
-            except Exception:
-                conditions = None
-
-            if isinstance(conditions, list) and conditions:
-                logic = (threshold.get("logic_operator") or "AND").upper()
-                results = []
-                last_value = None
-                last_condition = None
-                last_threshold_value = None
-
-                last_unit = None
-                last_parameter = None
-                for cond in conditions:
-                    if not isinstance(cond, dict):
-                        continue
-                    param = cond.get("parameter") or threshold.get("parameter") or ""
-                    value = self._extract_value(param, reading_data)
-                    if value is None:
-                        results.append(False)
-                        continue
-
-                    op = cond.get("condition") or cond.get("operator")
-                    threshold_value = cond.get("value")
-                    if op is None or threshold_value is None:
-                        results.append(False)
-                        continue
-
-                    last_value = value
-                    last_condition = op
-                    last_threshold_value = threshold_value
-                    last_unit = cond.get("unit")
-                    last_parameter = param
-                    results.append(self._compare(value, op, threshold_value))
-
-                triggered = all(results) if logic == "AND" else any(results)
-                if triggered and last_value is not None:
-                    return {
-                        "current_value": last_value,
-                        "threshold_value": last_threshold_value,
-                        "condition": last_condition,
-                        "unit": last_unit,
-                        "parameter": last_parameter,
-                    }
-                return None
-
-        # Single-condition threshold
-        parameter = threshold.get("parameter") or ""
-        value = self._extract_value(parameter, reading_data)
-        if value is None:
-            return None
+    def _full_pass_due(self) -> bool:
+        signature = (
+            threshold_signature(self.threshold_repo.get_enabled()),
+            self.rule_engine.db.get_rule_set().version,
+        )
+        return (
+            signature != self._full_pass_signature
+            or self._alarms_generation_now() != self._alarms_generation
+            or time.monotonic() - self._full_pass_at >= FULL_PASS_SECONDS
+        )
 
-        condition = threshold.get("condition")
-        threshold_value = threshold.get("value")
-        if condition is None or threshold_value is None:
-            return None
+    def _alarms_generation_now(self) -> int:
+        return self.rule_engine.db.get_data_generation('alarms')
 
-        if self._compare(value, condition, threshold_value):
-            return {"current_value": value, "threshold_value": threshold_value, "condition": condition, "unit": threshold.get("unit"), "parameter": parameter}
-        return None
+    def _engine_for(self, thresholds: List[Dict]) -> ThresholdEngine:
+        """Reuse the compiled engine until a threshold is added, removed or edited."""
+        if self._engine is None or self._engine.signature != threshold_signature(thresholds):
+            self._engine = ThresholdEngine(thresholds)
+        return self._engine
 
-    def _compare(self, value: float, condition: str, threshold_value: float) -> bool:
-        if condition == "<=":
-            return value <= threshold_value
-        if condition == "<":
-            return value < threshold_value
-        if condition == ">=":
-            return value >= threshold_value
-        if condition == ">":
-            return value > threshold_value
-        if condition == "==":
-            return value == threshold_value
-        if condition == "!=":
-            return value != threshold_value
-        return False
-
-    def _extract_value(self, parameter: str, reading_data: Dict) -> Optional[float]:
+    def _evaluate_cycle(self, asset_ids: Optional[List[int]] = None) -> int:
         """
-        Extract parameter value from reading data.
-        Handles multiple possible field names for the same parameter.
+        One evaluation pass over all assets (or just `asset_ids`) in bulk phases,
+        so the statement count does not grow with the number of assets: load
+        everything with one query per kind, evaluate in memory, then write all
+        new alarms in one transaction.
         """
-        if not parameter:
-            return None
-
-        def first_number(*keys: str) -> Optional[float]:
-            for key in keys:
-                if key in reading_data:
-                    try:
-                        return float(reading_data[key])
-                    except (ValueError, TypeError):
-                        continue
-            return None
-
-        def avg_numbers(*keys: str) -> Optional[float]:
-            vals = []
-            for key in keys:
-                if key in reading_data:
-                    try:
-                        v = float(reading_data[key])
-                    except (ValueError, TypeError):
-                        continue
-                    vals.append(v)
-            return (sum(vals) / len(vals)) if vals else None
-
-        def sum_numbers(*keys: str) -> Optional[float]:
-            vals = []
-            for key in keys:
-                if key in reading_data:
-                    try:
-                        v = float(reading_data[key])
-                    except (ValueError, TypeError):
-                        continue
-                    vals.append(v)
-            return sum(vals) if vals else None
-
-        if parameter in {"voltage", "grid_voltage", "gen_voltage"}:
-            return (
-                avg_numbers("voltage_1", "voltage_2", "voltage_3")
-                or avg_numbers("v_l1_n", "v_l2_n", "v_l3_n")
-                or avg_numbers("Phase_L1_V", "Phase_L2_V", "Phase_L3_V")
-                or avg_numbers("line_1_voltage", "line_2_voltage", "line_3_voltage")
-                or first_number("voltage", "Voltage", "grid_voltage", "gen_voltage")
-            )
-
-        if parameter in {"current_sum", "load_current"}:
-            return (
-                sum_numbers("current_1", "current_2", "current_3")
-                or sum_numbers("i_l1", "i_l2", "i_l3")
-                or sum_numbers("Phase_L1_Current", "Phase_L2_Current", "Phase_L3_Current")
-                or sum_numbers("I_L1 (Amps)", "I_L2 (Amps)", "I_L3 (Amps)")
-                or first_number("current_sum", "load_current")
-            )
-
-        if parameter in {"frequency", "grid_frequency", "gen_frequency"}:
-            raw = first_number("frequency", "AC_Frequency", "grid_frequency", "gen_frequency")
-            if raw is not None and raw > 100:
-                return raw / 10
-            return raw
-
-        if parameter in {"fuel_depth_cm", "diesel_deep_with_offset_cm", "diesel_deep_cm"}:
-            return first_number("diesel_deep_with_offset_cm", "diesel_deep_cm", "Diesel Deep With Offset (CM)", "Diesel Deep (CM)")
-
-        if parameter in {"battery_voltage"}:
-            return first_number("Voltage", "Battery_V", "System_DC_Voltage", "engine_battery_voltage", "battery_voltage", "Battery (vdc)")
-
-        if parameter in {"battery_current"}:
-            return first_number("Current1", "Total_DC_Load_Current", "irms1_batt", "battery_current")
-
-        if parameter in {"solar_current"}:
-            return first_number("Current4", "irms2_solar_y2", "solar_current")
-
-        if parameter in {"equipment_temp"}:
-            return first_number("Equipment_Area_Temperature", "equipment_temp", "temperature", "Temperature")
-
-        # Parameter mapping with fallback field names
-        param_field_map = {
-            'fuel_level': ['Fuel Level (L)', 'Diesel Deep (CM)', 'Diesel Deep With Offset (CM)', 'fuel_level'],
-            'battery_voltage': ['Battery (vdc)', 'battery_voltage', 'dc_voltage', 'System_DC_Voltage'],
-            'coolant_temp': ['Coolant_Temperature', 'coolant_temp'],
-            'oil_pressure': ['Oil_Pressure', 'oil_pressure'],
-            'engine_speed': ['Engine_Speed', 'engine_speed'],
-            'voltage': ['V_L1_N (VAC)', 'V_L2_N (VAC)', 'V_L3_N (VAC)', 'voltage', 'Voltage', 'voltage_l1', 'grid_voltage'],
-            'temperature': ['Temperature', 'temperature'],
-            'load_current': ['I_L1 (Amps)', 'I_L2 (Amps)', 'I_L3 (Amps)', 'load_current'],
-            'equipment_temp': ['equipment_temp', 'temperature'],
+        # Get enabled thresholds
+        thresholds = self.threshold_repo.get_enabled()
+        self._cycle_signature = threshold_signature(thresholds)
+
+        # Thresholds synced from historical/rate-change rules need reading history, so they
+        # go through the rule engine; the rest are judged on the latest reading alone.
+        windowed = self._windowed_rules(thresholds)
+        engine = self._engine_for([t for t in thresholds if t['id'] not in windowed])
+        if not thresholds:
+            print("[AlarmMonitor] No enabled thresholds found")
+            return 0
+
+        print(f"[AlarmMonitor] Evaluating {len(thresholds)} thresholds")
+
+        # Get all assets, or just the ones with new readings
+        assets = self.asset_repo.get_all() if asset_ids is None else self.asset_repo.get_by_ids(asset_ids)
+        print(f"[AlarmMonitor] Checking {len(assets)} assets")
+
+        # Latest reading for every asset in one pass over `latest_readings`
+        latest_by_asset = {
+            reading['asset_id']: reading
+            for reading in self.reading_repo.get_latest_by_asset_ids([a['id'] for a in assets])
         }
 
-        field_names = param_field_map.get(parameter, [parameter])
+        windowed_types = set().union(*(
+            CATEGORY_ASSET_TYPES.get((threshold.get('category') or '').strip(), set())
+            for threshold, _ in windowed.values()
+        ))
+
+        # Parse each asset's reading once; only assets some threshold applies to are looked at
+        data_by_asset = {}
+        for asset in assets:
+            reading = latest_by_asset.get(asset['id'])
+            asset_type = (asset.get('type') or '').strip()
+            if not reading or not (engine.thresholds_for(asset_type) or asset_type in windowed_types):
+                continue
+            try:
+                reading_data = json.loads(reading['data'])
+            except (json.JSONDecodeError, TypeError):
+                print(f"[AlarmMonitor] Failed to parse reading data for asset {asset['id']}")
+                continue
+            if isinstance(reading_data, dict):
+                data_by_asset[asset['id']] = reading_data
+
+        violations = engine.evaluate(assets, data_by_asset)
+        violations.extend(self._evaluate_windowed(windowed, assets, data_by_asset, latest_by_asset))
+        if not violations:
+            return 0
+
+        sites_by_id = self.site_repo.get_by_ids(sorted({asset['site_id'] for asset, _, _ in violations}))
+
+        new_alarms = []
+        trigger_counts: Dict[str, int] = {}
+        for asset, threshold, violation in violations:
+            site = sites_by_id.get(asset['site_id'])
+            if not site:
+                continue
+
+            # Skip if an active/acknowledged alarm already exists for this fingerprint
+            if self.alarm_repo.has_open_alarm(asset['id'], threshold['id'], threshold['severity']):
+                continue
+
+            alarm = self._build_alarm(threshold, asset, site, latest_by_asset[asset['id']], violation)
+            if not alarm:
+                continue
+            new_alarms.append((alarm, asset['name']))
+            trigger_counts[threshold['id']] = trigger_counts.get(threshold['id'], 0) + 1
+
+        if not new_alarms:
+            return 0
 
-        for field_name in field_names:
-            if field_name in reading_data:
+        db = get_database()
+        try:
+            self.alarm_repo.create_many([alarm for alarm, _ in new_alarms], commit=False)
+            self.threshold_repo.increment_trigger_counts(trigger_counts, commit=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            get_open_alarm_index().invalidate()
+            raise
+
+        for alarm, asset_name in new_alarms:
+            print(f"[AlarmMonitor] Created alarm {alarm['id']} for asset {asset_name}")
+        return len(new_alarms)
+
+    def _windowed_rules(self, thresholds: List[Dict]) -> Dict[str, tuple]:
+        """
+        `{threshold id: (threshold, rule)}` for thresholds backed by a historical or
+        rate-change composite rule. The rule carries the threshold's current
+        condition, so edits made on the thresholds page still apply.
+        """
+        windowed = {}
+        for threshold in thresholds:
+            rule = self.rule_engine.get_rule(threshold['id'])
+            if rule is None or rule.rule_type not in WINDOWED_RULE_TYPES or not rule.conditions:
+                continue
+            condition = rule.conditions[0].model_copy(update={
+                'parameter': threshold.get('parameter') or rule.conditions[0].parameter,
+                'operator': threshold.get('condition') or rule.conditions[0].operator,
+                'value': threshold['value'] if threshold.get('value') is not None else rule.conditions[0].value,
+                'unit': threshold.get('unit') or rule.conditions[0].unit,
+            })
+            windowed[threshold['id']] = (threshold, rule.model_copy(update={'conditions': [condition]}))
+        return windowed
+
+    def _evaluate_windowed(
+        self,
+        windowed: Dict[str, tuple],
+        assets: List[Dict],
+        data_by_asset: Dict[int, Dict],
+        latest_by_asset: Dict[int, Dict]
+    ):
+        """`(asset, threshold, violation)` for windowed thresholds, via the rule engine's dispatch."""
+        violations = []
+        for asset in assets:
+            reading_data = data_by_asset.get(asset['id'])
+            if reading_data is None:
+                continue
+            for threshold, rule in windowed.values():
+                if not self._should_evaluate_threshold(threshold, asset):
+                    continue
                 try:
-                    return float(reading_data[field_name])
-                except (ValueError, TypeError):
+                    result = self.rule_engine.evaluate_rule(
+                        rule, asset['id'], reading_data, latest_by_asset[asset['id']]['id']
+                    )
+                except Exception as e:
+                    print(f"[AlarmMonitor] Error evaluating rule {rule.id}: {e}")
                     continue
+                if not result.triggered or result.value is None:
+                    continue
+                condition = rule.conditions[0]
+                violations.append((asset, threshold, {
+                    "current_value": result.value,
+                    "threshold_value": condition.value,
+                    "condition": condition.operator,
+                    "unit": condition.unit,
+                    "parameter": condition.parameter,
+                }))
+        return violations
 
-        return None
-
-    def _is_duplicate_alarm(self, asset_id: int, threshold_id: str, severity: str) -> bool:
+    def _should_evaluate_threshold(self, threshold: Dict, asset: Dict) -> bool:
         """
-        Check if a similar alarm already exists.
-        Prevents creating multiple active/acknowledged alarms for the same issue.
+        Check if a threshold should be evaluated for a given asset type.
+        Maps threshold categories to relevant asset types.
         """
-        from db.client import get_database
-
-        # Query for existing active/acknowledged alarms matching this fingerprint
-        db = get_database()
-        cursor = db.execute(
-            """
-            SELECT id FROM alarms
-            WHERE asset_id = ?
-              AND threshold_id = ?
-              AND severity = ?
-              AND status IN ('active', 'acknowledged')
-            LIMIT 1
-            """,
-            (asset_id, threshold_id, severity)
-        )
+        category = (threshold.get("category") or "").strip()
+        asset_type = (asset.get("type") or "").strip()
 
-        result = cursor.fetchone()
-        return result is not None
+        valid_types = CATEGORY_ASSET_TYPES.get(category)
+        if not valid_types:
+            return False
+        return asset_type in valid_types
 
     def _identify_tenant(self, name: str):
         if not name:
@@ -359,15 +373,14 @@ class AlarmMonitor:
 
         return None
 
-    def _create_alarm(
+    def _build_alarm(
         self,
         threshold: Dict,
         asset: Dict,
         site: Dict,
         reading: Dict,
-        reading_data: Dict,
         violation: Dict
-    ) -> Optional[str]:
+    ) -> Optional[Dict]:
         try:
             alarm_id = f"alarm_{secrets.token_hex(4)}"
             current_value = violation['current_value']
@@ -395,8 +408,7 @@ class AlarmMonitor:
             if tenant:
                 details['tenant'] = tenant
 
-            # Create alarm
-            self.alarm_repo.create({
+            return {
                 'id': alarm_id,
                 'timestamp': datetime.now().isoformat(),
                 'site': site['name'],
@@ -410,12 +422,10 @@ class AlarmMonitor:
                 'asset_id': asset['id'],
                 'reading_id': reading['id'],
                 'source': 'api'
-            })
-
-            return alarm_id
+            }
 
         except Exception as e:
-            print(f"[AlarmMonitor] Failed to create alarm: {str(e)}")
+            print(f"[AlarmMonitor] Failed to build alarm: {str(e)}")
             return None
 
     def _generate_alarm_message(self, threshold: Dict, asset_name: str, value: float, unit: str) -> str:
@@ -0,0 +1,382 @@
+"""
+Hourly energy-mix buckets kept current as readings are ingested.
+
+Per hour, every asset contributes the kW of its latest reading stamped in that
+hour (the highest reading id wins), split by source as in
+`services.energy_mix_buckets.power_by_source`. The aggregator keeps those per-asset
+contributions for the last `ENERGY_MIX_AGGREGATOR_HOURS` hours. It folds new
+readings in from an ingest listener and writes the hours that changed to
+`energy_mix_history` in one transaction, together with the same hours per
+region, state, region+state and site in `energy_mix_history_scoped` (see
+`energy_mix_scope_key`). It also tracks each asset's latest reading overall,
+which gives the live value of the current hour.
+
+`/api/energy-mix` and the energy-mix scheduler jobs read these buckets
+instead of re-parsing recent readings. State is rebuilt from the database on
+`load()`, e.g. after a restart. The watermark is the highest reading id
+folded, so readings written by another process are picked up by `catch_up()`.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Container, Dict, Iterable, List, Optional, Set, Tuple
+
+from db.client import get_database
+from db.repositories.reading_repository import add_ingest_listener, remove_ingest_listener
+from services.energy_mix_buckets import Bucket, parse_datetime, power_by_source
+from services.energy_mix_persistence import (
+    energy_mix_scope_key, initialize_energy_mix_table, store_energy_mix_snapshots
+)
+
+logger = logging.getLogger(__name__)
+
+# Hours kept in memory; readings stamped earlier than this are not folded.
+ENERGY_MIX_AGGREGATOR_HOURS = int(os.getenv('ENERGY_MIX_AGGREGATOR_HOURS', '48'))
+# Rows fetched per page when scanning readings.
+PAGE_SIZE = 5000
+
+HOUR_FORMAT = "%Y-%m-%d %H:00"
+
+# (reading id, kW by source) of the reading an asset is counted with.
+Contribution = Tuple[int, Bucket]
+
+
+@lru_cache(maxsize=16384)
+def _hour_key_of(timestamp: str) -> Optional[str]:
+    dt = parse_datetime(timestamp)
+    return dt.strftime(HOUR_FORMAT) if dt else None
+
+
+def _hour_key(value: Any) -> Optional[str]:
+    # Sync batches share timestamps across assets, so string parsing is cached.
+    if isinstance(value, str):
+        return _hour_key_of(value)
+    dt = parse_datetime(value)
+    return dt.strftime(HOUR_FORMAT) if dt else None
+
+
+def _load_json(raw: Any) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(raw) if isinstance(raw, str) else (raw or {})
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def fold_readings(
+    rows: Iterable[Tuple],
+    hours: Optional[Dict[str, Dict[int, Contribution]]],
+    first_hour: str,
+    last_hour: str,
+    asset_ids: Optional[Container[int]] = None,
+    latest: Optional[Dict[int, Contribution]] = None,
+    hour_keys: Optional[Container[str]] = None,
+) -> Set[str]:
+    """
+    Fold `(id, asset_id, reading_type, timestamp, data)` rows, in any order,
+    into `hours`: per-hour, per-asset contributions for hours in
+    [first_hour, last_hour] (and in `hour_keys`, when given), keeping the
+    highest reading id per (hour, asset). `latest`, when given, tracks each
+    asset's newest reading whatever its stamp. `data` is only parsed for
+    readings that win. Rows of assets outside `asset_ids` (when given) are
+    skipped. Returns the hour keys that changed.
+    """
+    changed: Set[str] = set()
+    for reading_id, asset_id, reading_type, timestamp, raw in rows:
+        if asset_ids is not None and asset_id not in asset_ids:
+            continue
+        data = None
+        hour_key = None
+        if hours is not None:
+            hour_key = _hour_key(timestamp)
+            if hour_key is None:
+                # Fall back to the payload's own date.
+                data = _load_json(raw)
+                if data is not None:
+                    hour_key = _hour_key(data.get("date"))
+
+        in_range = hour_key is not None and first_hour <= hour_key <= last_hour
+        if in_range and hour_keys is not None:
+            in_range = hour_key in hour_keys
+        counted = hours.get(hour_key, {}).get(asset_id) if in_range else None
+        wins_hour = in_range and (counted is None or reading_id > counted[0])
+        newest = latest.get(asset_id) if latest is not None else None
+        wins_latest = latest is not None and (newest is None or reading_id > newest[0])
+        if not (wins_hour or wins_latest):
+            continue
+
+        if data is None:
+            data = _load_json(raw)
+        contribution = power_by_source(reading_type, data) if data is not None else None
+        if wins_latest:
+            latest[asset_id] = (reading_id, contribution or Bucket())
+        if wins_hour and contribution is not None:
+            hours.setdefault(hour_key, {})[asset_id] = (reading_id, contribution)
+            changed.add(hour_key)
+    return changed
+
+
+def sum_contributions(contributions: Iterable[Contribution]) -> Bucket:
+    total = Bucket()
+    for _, contribution in contributions:
+        total.add(contribution)
+    return total
+
+
+def site_scope_keys(name: Optional[str], region: Optional[str], zone: Optional[str], state: Optional[str]) -> Tuple[str, ...]:
+    """Every scoped series a site counts towards."""
+    keys = {energy_mix_scope_key(site=name)} if name else set()
+    if state:
+        keys.add(energy_mix_scope_key(state=state))
+    for area in {region, zone} - {None, ""}:
+        keys.add(energy_mix_scope_key(region=area))
+        if state:
+            keys.add(energy_mix_scope_key(region=area, state=state))
+    return tuple(sorted(keys))
+
+
+def scope_totals(
+    contributions: Dict[int, Contribution],
+    site_by_asset: Dict[int, int],
+    scopes_by_site: Dict[int, Tuple[str, ...]],
+) -> Dict[str, Tuple[Bucket, Set[int]]]:
+    """Per scope key: summed contributions and the sites they came from."""
+    totals: Dict[str, Tuple[Bucket, Set[int]]] = {}
+    for asset_id, (_, contribution) in contributions.items():
+        site_id = site_by_asset.get(asset_id)
+        for key in scopes_by_site.get(site_id, ()):
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = (Bucket(), set())
+            entry[0].add(contribution)
+            entry[1].add(site_id)
+    return totals
+
+
+def load_site_scopes() -> Tuple[Dict[int, int], Dict[int, Tuple[str, ...]]]:
+    """`({asset id: site id}, {site id: scope keys})` for every asset of a known site."""
+    rows = get_database().execute(
+        "SELECT a.id, a.site_id, s.name, s.region, s.zone, s.state FROM assets a JOIN sites s ON a.site_id = s.id"
+    ).fetchall()
+    site_by_asset = {int(row[0]): int(row[1]) for row in rows}
+    scopes_by_site = {int(row[1]): site_scope_keys(*row[2:]) for row in rows}
+    return site_by_asset, scopes_by_site
+
+
+def hour_snapshots(
+    hours: Dict[str, Dict[int, Contribution]],
+    hour_keys: Iterable[str],
+    site_by_asset: Dict[int, int],
+    scopes_by_site: Dict[int, Tuple[str, ...]],
+) -> Tuple[List[Tuple[str, Dict[str, float], int]], List[Tuple[str, str, Dict[str, float], int]]]:
+    """
+    The global and scoped rows of `hour_keys`, as `store_energy_mix_snapshots`
+    takes them. Hours without contributions give an all-zero global row.
+    """
+    snapshots = []
+    scoped_snapshots = []
+    for hour_key in hour_keys:
+        contributions = hours.get(hour_key, {})
+        sites = {site_by_asset.get(asset_id) for asset_id in contributions}
+        sites.discard(None)
+        snapshots.append((hour_key, sum_contributions(contributions.values()).as_dict(), len(sites)))
+        for scope_key, (total, scope_sites) in scope_totals(contributions, site_by_asset, scopes_by_site).items():
+            scoped_snapshots.append((scope_key, hour_key, total.as_dict(), len(scope_sites)))
+    return snapshots, scoped_snapshots
+
+
+class EnergyMixAggregator:
+    """Per-hour energy-mix buckets over all assets of known sites, updated on ingest."""
+
+    def __init__(self, retain_hours: int = ENERGY_MIX_AGGREGATOR_HOURS):
+        self.retain_hours = max(1, int(retain_hours))
+        self.last_id = 0
+        # Watermark of the last completed fold; moves only once its buckets are in place.
+        self.generation = 0
+        self._hours: Dict[str, Dict[int, Contribution]] = {}
+        self._latest: Dict[int, Contribution] = {}
+        self._live: Dict[Optional[str], Bucket] = {}
+        self._site_by_asset: Dict[int, int] = {}
+        self._scopes_by_site: Dict[int, Tuple[str, ...]] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+        self.stats = {"readings_folded": 0, "hours_written": 0, "scoped_rows_written": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _window(self) -> Tuple[str, str]:
+        now = datetime.now()
+        first = now - timedelta(hours=self.retain_hours - 1)
+        return first.strftime(HOUR_FORMAT), now.strftime(HOUR_FORMAT)
+
+    def _load_sites(self):
+        self._site_by_asset, self._scopes_by_site = load_site_scopes()
+        self._live = {}
+
+    def refresh_sites(self):
+        """Re-read asset/site membership, e.g. after a sync changed site regions."""
+        with self._lock:
+            self._load_sites()
+
+    def has_scope(self, scope_key: str) -> bool:
+        """Whether any asset counts towards `scope_key`."""
+        if not self._loaded:
+            self.load()
+        with self._lock:
+            return any(scope_key in keys for keys in self._scopes_by_site.values())
+
+    def load(self):
+        """Build state from the database: latest reading per asset and the retained hours."""
+        initialize_energy_mix_table()
+        with self._lock:
+            db = get_database()
+            self._load_sites()
+            high = db.execute("SELECT COALESCE(MAX(id), 0) FROM readings").fetchone()[0]
+            first_hour, last_hour = self._window()
+
+            self._latest = {}
+            latest_rows = db.execute(
+                "SELECT reading_id, asset_id, reading_type, timestamp, data FROM latest_readings WHERE reading_id <= ?",
+                (high,),
+            ).fetchall()
+            fold_readings(latest_rows, None, first_hour, last_hour, self._site_by_asset, self._latest)
+
+            # created_at grows with id, so walk back from the newest reading and
+            # stop at the window (an hour of slack for late stamps).
+            created_cutoff = (datetime.now() - timedelta(hours=self.retain_hours + 1)).strftime("%Y-%m-%d %H:%M:%S")
+            self._hours = {}
+            cursor = db.execute(
+                """
+                SELECT id, asset_id, reading_type, timestamp, data, created_at
+                FROM readings WHERE id <= ? ORDER BY id DESC
+                """,
+                (high,),
+            )
+            while True:
+                page = cursor.fetchmany(PAGE_SIZE)
+                if not page:
+                    break
+                in_window = [row[:5] for row in page if not row[5] or row[5] >= created_cutoff]
+                fold_readings(in_window, self._hours, first_hour, last_hour, self._site_by_asset)
+                if len(in_window) < len(page):
+                    break
+
+            self.last_id = high
+            self._live = {}
+            self._loaded = True
+            self._write(list(self._hours))
+            self.generation = self.last_id
+        logger.info(f"Energy mix aggregator loaded {len(self._hours)} hours up to reading {self.last_id}")
+
+    def start(self):
+        """Load (unless a reader already did), then follow ingest."""
+        if not self._loaded:
+            self.load()
+        add_ingest_listener(self.on_ingest)
+        self.catch_up()
+
+    def stop(self):
+        remove_ingest_listener(self.on_ingest)
+
+    def on_ingest(self, asset_ids: List[int]):
+        """Ingest hook: fold the newly committed readings."""
+        if self._loaded:
+            self.catch_up()
+
+    def catch_up(self) -> int:
+        """Fold readings past the watermark and persist the hours they changed."""
+        if not self._loaded:
+            self.load()
+            return 0
+        with self._lock:
+            db = get_database()
+            first_hour, last_hour = self._window()
+            changed: Set[str] = set()
+            folded = 0
+            while True:
+                rows = db.execute(
+                    """
+                    SELECT id, asset_id, reading_type, timestamp, data FROM readings
+                    WHERE id > ? ORDER BY id LIMIT ?
+                    """,
+                    (self.last_id, PAGE_SIZE),
+                ).fetchall()
+                if not rows:
+                    break
+                if any(row[1] not in self._site_by_asset for row in rows):
+                    # Assets are synced before their readings; pick up new ones.
+                    self._load_sites()
+                changed |= fold_readings(rows, self._hours, first_hour, last_hour, self._site_by_asset, self._latest)
+                self.last_id = rows[-1][0]
+                folded += len(rows)
+
+            for hour_key in [key for key in self._hours if key < first_hour]:
+                del self._hours[hour_key]
+                changed.discard(hour_key)
+            if folded:
+                self._live = {}
+                self.stats["readings_folded"] += folded
+            self._write(sorted(changed))
+            self.generation = self.last_id
+            return folded
+
+    def _write(self, hour_keys: List[str]):
+        if not hour_keys:
+            return
+        snapshots, scoped_snapshots = hour_snapshots(
+            self._hours, hour_keys, self._site_by_asset, self._scopes_by_site
+        )
+        store_energy_mix_snapshots(snapshots, scoped_snapshots)
+        self.stats["hours_written"] += len(snapshots)
+        self.stats["scoped_rows_written"] += len(scoped_snapshots)
+
+    def persist(self, hour_key: str):
+        """Write one retained hour, e.g. to close it out on schedule."""
+        with self._lock:
+            if hour_key in self._hours:
+                self._write([hour_key])
+
+    def hour_bucket(self, hour_key: str) -> Optional[Bucket]:
+        """Totals of a retained hour; None for hours outside the window."""
+        if not self._loaded:
+            self.load()
+        first_hour, last_hour = self._window()
+        if not first_hour <= hour_key <= last_hour:
+            return None
+        with self._lock:
+            return sum_contributions(self._hours.get(hour_key, {}).values())
+
+    def live_bucket(self, scope_key: Optional[str] = None) -> Bucket:
+        """Sum of every asset's latest reading (in `scope_key`, if given): the real-time mix."""
+        if not self._loaded:
+            self.load()
+        with self._lock:
+            if scope_key in self._live:
+                return self._live[scope_key]
+            if scope_key is None:
+                live = self._live[None] = sum_contributions(self._latest.values())
+                return live
+            # One pass fills every scope; all are dropped together on the next fold.
+            for key, (total, _) in scope_totals(self._latest, self._site_by_asset, self._scopes_by_site).items():
+                self._live[key] = total
+            return self._live.setdefault(scope_key, Bucket())
+
+    def site_count(self) -> int:
+        return len(set(self._site_by_asset.values()))
+
+
+_aggregator: Optional[EnergyMixAggregator] = None
+_aggregator_lock = threading.Lock()
+
+
+def get_energy_mix_aggregator() -> EnergyMixAggregator:
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            _aggregator = EnergyMixAggregator()
+        return _aggregator
@@ -0,0 +1,181 @@
+"""
+Per-reading energy-mix extraction shared by the energy-mix aggregator and jobs.
+
+`power_by_source` turns one reading into its kW contribution to each source
+(grid, generator, solar, battery) as a `Bucket`; sentinel and out-of-range
+values count as zero. Each payload is read once for two short alias lists at
+most, so aliases are probed directly rather than through the extractor
+registry, whose per-payload fingerprint costs more than it saves here. `chunks` keeps SQL `IN` lists under SQLite's variable limit.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from db.client import get_database
+
+MAX_SQL_VARS = 900  # keep under SQLite's default 999 variable limit
+_SENTINEL_MAX_U32 = 4294967295.0
+_SENTINEL_MAX_U32_KW = 4294967.295
+
+
+def chunks(items: List[int], size: int) -> Iterable[List[int]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _to_float(value: Any, default: float = 0.0) -> float:
+    try:
+        if value is None:
+            return default
+        if isinstance(value, bool):
+            return default
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# Power aliases per reading type, in order of preference.
+AC_POWER_KEYS = (
+    "total_active_power", "total_power_kw",
+    "Total_Active_Power (kW)", "Total Active Power (kW)",
+    "Total_Active_Power (kw)",
+)
+GEN_POWER_KEYS = (
+    "power_kw", "total_active_power", "total_power_kw",
+    "Gen_Total_Power (KW)", "Gen_Total_Power",
+)
+BATTERY_POWER_KEYS = ("Power1", "Power1 (Watt)", "battery_power", "Battery_Power", "p1_batt", "p1")
+SOLAR_POWER_KEYS = ("Power2", "Power2 (Watt)", "solar_power", "Solar_Power", "p2_solar_y2", "p2")
+
+
+def pick(data: Dict[str, Any], keys: Sequence[str]) -> Optional[float]:
+    for key in keys:
+        if key in data and data[key] is not None:
+            try:
+                return float(data[key])
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+
+    raw = value.strip()
+    if not raw:
+        return None
+
+    for fmt in (
+        "%m/%d/%Y %H:%M:%S",
+        "%m/%d/%Y %H:%M",
+        "%Y-%m-%d %H:%M:%S",
+        "%Y-%m-%dT%H:%M:%S",
+        "%Y-%m-%dT%H:%M:%S.%f",
+    ):
+        try:
+            return datetime.strptime(raw, fmt)
+        except ValueError:
+            continue
+
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        return None
+
+
+def _is_sentinel(value: float) -> bool:
+    if not isinstance(value, (int, float)) or not float(value) == value:
+        return True
+    v = float(value)
+    if abs(v) >= _SENTINEL_MAX_U32 - 0.5:
+        return True
+    if abs(v - _SENTINEL_MAX_U32_KW) <= 0.01:
+        return True
+    # Discard obviously invalid magnitudes (prevents chart scale blow-ups).
+    if abs(v) >= 1_000_000:
+        return True
+    return False
+
+
+def _sanitize_power_kw(value: Optional[float], *, max_kw: float) -> float:
+    if value is None:
+        return 0.0
+    v = _to_float(value, 0.0)
+    if not (v == v) or not isinstance(v, (int, float)):
+        return 0.0
+    if _is_sentinel(v):
+        return 0.0
+    # Heuristic: treat large values as watts, convert to kW.
+    if abs(v) >= 10_000:
+        v = v / 1000.0
+    if not (v == v):
+        return 0.0
+    if abs(v) > max_kw:
+        return 0.0
+    return v
+
+
+@dataclass
+class Bucket:
+    grid: float = 0.0
+    generator: float = 0.0
+    solar: float = 0.0
+    battery: float = 0.0
+
+    def add(self, other: "Bucket"):
+        self.grid += other.grid
+        self.generator += other.generator
+        self.solar += other.solar
+        self.battery += other.battery
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "grid": round(self.grid, 2),
+            "generator": round(self.generator, 2),
+            "solar": round(self.solar, 2),
+            "battery": round(self.battery, 2),
+        }
+
+
+def power_by_source(reading_type: Any, data: Dict[str, Any]) -> Bucket:
+    """One reading's kW contribution to each source; empty for other reading types."""
+    reading_type = str(reading_type or "").upper()
+    if reading_type == "AC_METER":
+        p_kw = pick(data, AC_POWER_KEYS)
+        return Bucket(grid=max(0.0, _sanitize_power_kw(p_kw, max_kw=5_000.0)))
+
+    if reading_type == "GENERATOR":
+        p_kw = pick(data, GEN_POWER_KEYS)
+        return Bucket(generator=max(0.0, _sanitize_power_kw(p_kw, max_kw=2_000.0)))
+
+    if reading_type == "DC_METER":
+        # DC meters commonly report watts for these fields; convert explicitly.
+        batt_w = _to_float(pick(data, BATTERY_POWER_KEYS), 0.0)
+        solar_w = _to_float(pick(data, SOLAR_POWER_KEYS), 0.0)
+        batt_kw = _sanitize_power_kw(batt_w / 1000.0, max_kw=5_000.0)
+        solar_kw = _sanitize_power_kw(solar_w / 1000.0, max_kw=5_000.0)
+        # For mix distribution, treat negative (charging) as 0 contribution.
+        return Bucket(battery=max(0.0, batt_kw), solar=max(0.0, solar_kw))
+
+    return Bucket()
+
+
+
+def asset_ids_for_sites(site_ids: List[int]) -> List[int]:
+    db = get_database()
+    asset_ids: List[int] = []
+    for chunk in chunks(site_ids, MAX_SQL_VARS):
+        placeholders = ",".join(["?"] * len(chunk))
+        cursor = db.execute(
+            f"SELECT id FROM assets WHERE site_id IN ({placeholders})",
+            tuple(chunk),
+        )
+        asset_ids.extend([int(r[0]) for r in cursor.fetchall()])
+    return asset_ids
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 import json
 from db.client import get_database
 import logging
@@ -28,10 +28,45 @@ def initialize_energy_mix_table():
     db.execute("""
         CREATE INDEX IF NOT EXISTS idx_energy_mix_hour ON energy_mix_history (hour_key)
     """)
+
+    # Same buckets per region, state, region+state and site (see energy_mix_scope_key)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS energy_mix_history_scoped (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope_key TEXT NOT NULL,
+            hour_key TEXT NOT NULL,
+            grid REAL DEFAULT 0,
+            generator REAL DEFAULT 0,
+            solar REAL DEFAULT 0,
+            battery REAL DEFAULT 0,
+            total_sites INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_energy_mix_scoped_scope_hour
+        ON energy_mix_history_scoped (scope_key, hour_key)
+    """)
     
     db.commit()
 
 
+def energy_mix_scope_key(region: Optional[str] = None, state: Optional[str] = None, site: Optional[str] = None) -> Optional[str]:
+    """
+    Key of a scoped energy-mix series; None for the global one. Mirrors
+    `/api/energy-mix` filtering: a site wins over region/state, site names
+    match case-insensitively, and a region matches a site's region or zone.
+    """
+    if site:
+        return f"site={site.lower()}"
+    parts = []
+    if region:
+        parts.append(f"region={region}")
+    if state:
+        parts.append(f"state={state}")
+    return "&".join(parts) or None
+
+
 def store_energy_mix_snapshot(hour_key: str, energy_mix: Dict[str, float], total_sites: int = 0):
     """Store an energy mix snapshot in the persistent table."""
     db = get_database()
@@ -56,8 +91,84 @@ def store_energy_mix_snapshot(hour_key: str, energy_mix: Dict[str, float], total
         db.rollback()
 
 
-def get_historical_energy_mix(hours_back: int = 24) -> List[Dict]:
-    """Retrieve historical energy mix data for the specified number of hours."""
+def store_energy_mix_snapshots(
+    snapshots: List[Tuple[str, Dict[str, float], int]],
+    scoped_snapshots: List[Tuple[str, str, Dict[str, float], int]] = ()
+):
+    """
+    Store several `(hour_key, energy_mix, total_sites)` global snapshots and
+    `(scope_key, hour_key, energy_mix, total_sites)` scoped ones in one transaction.
+    """
+    if not snapshots and not scoped_snapshots:
+        return
+    db = get_database()
+
+    try:
+        db.executemany("""
+            INSERT OR REPLACE INTO energy_mix_history
+            (hour_key, grid, generator, solar, battery, total_sites, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, [
+            (
+                hour_key,
+                energy_mix.get('grid', 0),
+                energy_mix.get('generator', 0),
+                energy_mix.get('solar', 0),
+                energy_mix.get('battery', 0),
+                total_sites
+            )
+            for hour_key, energy_mix, total_sites in snapshots
+        ])
+        db.executemany("""
+            INSERT OR REPLACE INTO energy_mix_history_scoped
+            (scope_key, hour_key, grid, generator, solar, battery, total_sites, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, [
+            (
+                scope_key,
+                hour_key,
+                energy_mix.get('grid', 0),
+                energy_mix.get('generator', 0),
+                energy_mix.get('solar', 0),
+                energy_mix.get('battery', 0),
+                total_sites
+            )
+            for scope_key, hour_key, energy_mix, total_sites in scoped_snapshots
+        ])
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to store energy mix snapshots: {e}")
+        db.rollback()
+
+
+def get_stored_energy_mix_hours(first_hour: str, last_hour: str) -> Tuple[Dict[str, int], Set[str]]:
+    """
+    Hours in [first_hour, last_hour] that are already stored: `{hour_key: total_sites}`
+    of the global series, and the hour keys with at least one scoped row.
+    """
+    db = get_database()
+    global_hours = {
+        row['hour_key']: row['total_sites'] or 0
+        for row in db.execute(
+            "SELECT hour_key, total_sites FROM energy_mix_history WHERE hour_key BETWEEN ? AND ?",
+            (first_hour, last_hour),
+        )
+    }
+    scoped_hours = {
+        row['hour_key']
+        for row in db.execute(
+            "SELECT DISTINCT hour_key FROM energy_mix_history_scoped WHERE hour_key BETWEEN ? AND ?",
+            (first_hour, last_hour),
+        )
+    }
+    return global_hours, scoped_hours
+
+
+def get_historical_energy_mix(hours_back: int = 24, scope_key: Optional[str] = None) -> List[Dict]:
+    """Retrieve historical energy mix data for the specified number of hours.
+
+    `scope_key` (see `energy_mix_scope_key`) selects a scoped series instead of the global one.
+    """
     db = get_database()
     
     # Generate the expected hour keys for the past N hours
@@ -72,14 +183,24 @@ def get_historical_energy_mix(hours_back: int = 24) -> List[Dict]:
     
     # Query for existing data
     placeholders = ','.join(['?' for _ in expected_hours])
-    query = f"""
-        SELECT hour_key, grid, generator, solar, battery, created_at
-        FROM energy_mix_history 
-        WHERE hour_key IN ({placeholders})
-        ORDER BY hour_key
-    """
+    if scope_key is None:
+        query = f"""
+            SELECT hour_key, grid, generator, solar, battery, created_at
+            FROM energy_mix_history 
+            WHERE hour_key IN ({placeholders})
+            ORDER BY hour_key
+        """
+        params = expected_hours
+    else:
+        query = f"""
+            SELECT hour_key, grid, generator, solar, battery, created_at
+            FROM energy_mix_history_scoped
+            WHERE scope_key = ? AND hour_key IN ({placeholders})
+            ORDER BY hour_key
+        """
+        params = [scope_key, *expected_hours]
     
-    cursor = db.execute(query, expected_hours)
+    cursor = db.execute(query, params)
     results = cursor.fetchall()
     
     # Convert to list of dicts
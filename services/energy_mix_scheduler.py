@@ -2,121 +2,33 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 import logging
 from db.client import get_database
-from services.energy_mix_persistence import store_energy_mix_snapshot, get_historical_energy_mix
-from routers.energy_mix import _resolve_site_ids, _asset_ids_for_sites, _chunks, _reading_time, _pick, _sanitize_power_kw, _to_float, Bucket
+from services.energy_mix_aggregator import (
+    HOUR_FORMAT, PAGE_SIZE, Contribution, fold_readings, get_energy_mix_aggregator, hour_snapshots, load_site_scopes
+)
+from services.energy_mix_persistence import (
+    get_stored_energy_mix_hours, initialize_energy_mix_table, store_energy_mix_snapshots
+)
+from services.energy_mix_buckets import MAX_SQL_VARS, Bucket, asset_ids_for_sites, chunks, power_by_source
+from services.site_scope import resolve_site_ids
 import json
-from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 def calculate_current_energy_mix() -> Dict[str, float]:
-    """Calculate the current energy mix across all sites."""
-    db = get_database()
-    
-    # Get all sites (no filtering for this aggregate calculation)
-    site_ids, _scope = _resolve_site_ids(region=None, state=None, site=None, sample_size=2000)
-    asset_ids = _asset_ids_for_sites(site_ids)
-
-    if not asset_ids:
-        return {'grid': 0, 'generator': 0, 'solar': 0, 'battery': 0}
-
-    # Get recent readings for all assets
-    readings = []
-    limit_per_asset = 10  # Just get the most recent reading per asset
-    # Use a wider time window to ensure we get recent data
-    created_at_cutoff = (datetime.now() - timedelta(hours=24)).strftime("%Y-%m-%d %H:%M:%S")
-
-    # Process in chunks to avoid SQL variable limits
-    from routers.energy_mix import _MAX_SQL_VARS
-    for chunk in _chunks(asset_ids, _MAX_SQL_VARS - 2):
-        placeholders = ",".join(["?"] * len(chunk))
-        cursor = db.execute(
-            f"""
-            SELECT id, asset_id, reading_type, timestamp, data, created_at
-            FROM (
-              SELECT
-                r.*,
-                ROW_NUMBER() OVER (PARTITION BY asset_id ORDER BY id DESC) as rn
-              FROM readings r
-              WHERE asset_id IN ({placeholders})
-                AND created_at >= ?
-            )
-            WHERE rn <= ?
-            ORDER BY asset_id, id DESC
-            """,
-            (*chunk, created_at_cutoff, limit_per_asset),
-        )
-        readings.extend([dict(row) for row in cursor.fetchall()])
-
-    # Calculate energy mix
-    energy_mix = {'grid': 0, 'generator': 0, 'solar': 0, 'battery': 0}
-
-    for r in readings:
-        raw = r.get("data")
-        try:
-            data = json.loads(raw) if isinstance(raw, str) else (raw or {})
-        except Exception:
-            continue
-        if not isinstance(data, dict):
-            continue
-
-        reading_type = str(r.get("reading_type") or "").upper()
-
-        if reading_type == "AC_METER":
-            p_kw = _pick(
-                data,
-                [
-                    "total_active_power",
-                    "total_power_kw",
-                    "Total_Active_Power (kW)",
-                    "Total Active Power (kW)",
-                    "Total_Active_Power (kw)",
-                ],
-            )
-            energy_mix['grid'] += max(0.0, _sanitize_power_kw(p_kw, max_kw=5_000.0))
-
-        elif reading_type == "GENERATOR":
-            p_kw = _pick(
-                data,
-                [
-                    "power_kw",
-                    "total_active_power",
-                    "total_power_kw",
-                    "Gen_Total_Power (KW)",
-                    "Gen_Total_Power",
-                ],
-            )
-            energy_mix['generator'] += max(0.0, _sanitize_power_kw(p_kw, max_kw=2_000.0))
-
-        elif reading_type == "DC_METER":
-            batt_raw = _pick(data, ["Power1", "Power1 (Watt)", "battery_power", "Battery_Power", "p1_batt", "p1"])
-            solar_raw = _pick(data, ["Power2", "Power2 (Watt)", "solar_power", "Solar_Power", "p2_solar_y2", "p2"])
-
-            # DC meters commonly report watts for these fields; convert explicitly.
-            batt_w = _to_float(batt_raw, 0.0)
-            solar_w = _to_float(solar_raw, 0.0)
-            batt_kw = _sanitize_power_kw(batt_w / 1000.0, max_kw=5_000.0)
-            solar_kw = _sanitize_power_kw(solar_w / 1000.0, max_kw=5_000.0)
-
-            # For mix distribution, treat negative (charging) as 0 contribution.
-            energy_mix['battery'] += max(0.0, batt_kw)
-            energy_mix['solar'] += max(0.0, solar_kw)
-
-    return energy_mix
+    """Calculate the current energy mix across all sites (latest reading per asset)."""
+    return get_energy_mix_aggregator().live_bucket().as_dict()
 
 
 def update_energy_mix_history():
-    """Update the energy mix history with current data."""
+    """Fold readings not yet aggregated and store the current hour's buckets, global and scoped."""
     try:
-        current_mix = calculate_current_energy_mix()
+        aggregator = get_energy_mix_aggregator()
+        # Sites may have moved region/state since the last run.
+        aggregator.refresh_sites()
+        aggregator.catch_up()
         hour_key = datetime.now().strftime("%Y-%m-%d %H:00")
-
-        # Get the total number of sites to store with the data
-        from routers.energy_mix import _resolve_site_ids
-        site_ids, _ = _resolve_site_ids(region=None, state=None, site=None, sample_size=2000)
-
-        store_energy_mix_snapshot(hour_key, current_mix, len(site_ids))
-        logger.info(f"Updated energy mix history for {hour_key}: {current_mix}")
+        aggregator.persist(hour_key)
+        logger.info(f"Updated energy mix history for {hour_key}: {aggregator.hour_bucket(hour_key)}")
     except Exception as e:
         logger.error(f"Failed to update energy mix history: {e}")
         logger.exception(e)  # Log the full exception trace
@@ -125,41 +37,35 @@ def update_energy_mix_history():
 def update_energy_mix_history_hourly():
     """Update the energy mix history for the previous hour with more complete data.
     
-    This function runs hourly to capture a full hour of data rather than just
-    the current moment's snapshot.
+    This function runs hourly to close out the previous hour once its late
+    readings have been ingested.
     """
     try:
-        # Calculate the data for the previous hour
-        from datetime import timedelta
-        prev_hour = datetime.now() - timedelta(hours=1)
-        hour_key = prev_hour.strftime("%Y-%m-%d %H:00")
-
-        # Calculate energy mix for the previous hour specifically
-        current_mix = calculate_energy_mix_for_hour(prev_hour)
-
-        # Get the total number of sites to store with the data
-        from routers.energy_mix import _resolve_site_ids
-        site_ids, _ = _resolve_site_ids(region=None, state=None, site=None, sample_size=2000)
-
-        store_energy_mix_snapshot(hour_key, current_mix, len(site_ids))
-        logger.info(f"Updated energy mix history for previous hour {hour_key}: {current_mix}")
+        aggregator = get_energy_mix_aggregator()
+        aggregator.catch_up()
+        hour_key = (datetime.now() - timedelta(hours=1)).strftime("%Y-%m-%d %H:00")
+        aggregator.persist(hour_key)
+        logger.info(f"Updated energy mix history for previous hour {hour_key}: {aggregator.hour_bucket(hour_key)}")
     except Exception as e:
         logger.error(f"Failed to update energy mix history for previous hour: {e}")
         logger.exception(e)  # Log the full exception trace
 
 
 def calculate_energy_mix_for_hour(target_hour: datetime) -> Dict[str, float]:
-    """Calculate energy mix for a specific hour using all readings from that hour."""
-    from db.client import get_database
-    from routers.energy_mix import _resolve_site_ids, _asset_ids_for_sites, _chunks, _reading_time, _pick, _sanitize_power_kw, _to_float
-    import json
-    from datetime import datetime, timedelta
-    
+    """Calculate energy mix for a specific hour: the latest reading per asset in that hour.
+
+    Hours the aggregator still holds are read from it; older ones are scanned.
+    """
+    hour_key = target_hour.strftime("%Y-%m-%d %H:00")
+    bucket = get_energy_mix_aggregator().hour_bucket(hour_key)
+    if bucket is not None:
+        return bucket.as_dict()
+
     db = get_database()
     
     # Get all sites (no filtering for this aggregate calculation)
-    site_ids, _scope = _resolve_site_ids(region=None, state=None, site=None, sample_size=2000)
-    asset_ids = _asset_ids_for_sites(site_ids)
+    site_ids = resolve_site_ids(sample_size=2000)
+    asset_ids = asset_ids_for_sites(site_ids)
 
     if not asset_ids:
         return {'grid': 0, 'generator': 0, 'solar': 0, 'battery': 0}
@@ -175,8 +81,7 @@ def calculate_energy_mix_for_hour(target_hour: datetime) -> Dict[str, float]:
     readings = []
     
     # Process in chunks to avoid SQL variable limits
-    from routers.energy_mix import _MAX_SQL_VARS
-    for chunk in _chunks(asset_ids, _MAX_SQL_VARS - 2):
+    for chunk in chunks(asset_ids, MAX_SQL_VARS - 2):
         placeholders = ",".join(["?"] * len(chunk))
         cursor = db.execute(
             f"""
@@ -191,9 +96,6 @@ def calculate_energy_mix_for_hour(target_hour: datetime) -> Dict[str, float]:
         )
         readings.extend([dict(row) for row in cursor.fetchall()])
 
-    # Calculate energy mix - average over the hour if multiple readings exist
-    # or take the latest reading for each asset
-    energy_mix = {'grid': 0, 'generator': 0, 'solar': 0, 'battery': 0}
     asset_last_readings = {}  # Track last reading per asset to avoid double counting
 
     for r in readings:
@@ -211,6 +113,7 @@ def calculate_energy_mix_for_hour(target_hour: datetime) -> Dict[str, float]:
                 asset_last_readings[asset_id] = r
 
     # Process the latest reading for each asset
+    energy_mix = Bucket()
     for r in asset_last_readings.values():
         raw = r.get("data")
         try:
@@ -219,93 +122,86 @@ def calculate_energy_mix_for_hour(target_hour: datetime) -> Dict[str, float]:
             continue
         if not isinstance(data, dict):
             continue
+        energy_mix.add(power_by_source(r.get("reading_type"), data))
 
-        reading_type = str(r.get("reading_type") or "").upper()
-
-        if reading_type == "AC_METER":
-            p_kw = _pick(
-                data,
-                [
-                    "total_active_power",
-                    "total_power_kw",
-                    "Total_Active_Power (kW)",
-                    "Total Active Power (kW)",
-                    "Total_Active_Power (kw)",
-                ],
-            )
-            energy_mix['grid'] += max(0.0, _sanitize_power_kw(p_kw, max_kw=5_000.0))
-
-        elif reading_type == "GENERATOR":
-            p_kw = _pick(
-                data,
-                [
-                    "power_kw",
-                    "total_active_power",
-                    "total_power_kw",
-                    "Gen_Total_Power (KW)",
-                    "Gen_Total_Power",
-                ],
-            )
-            energy_mix['generator'] += max(0.0, _sanitize_power_kw(p_kw, max_kw=2_000.0))
+    return energy_mix.as_dict()
 
-        elif reading_type == "DC_METER":
-            batt_raw = _pick(data, ["Power1", "Power1 (Watt)", "battery_power", "Battery_Power", "p1_batt", "p1"])
-            solar_raw = _pick(data, ["Power2", "Power2 (Watt)", "solar_power", "Solar_Power", "p2_solar_y2", "p2"])
 
-            # DC meters commonly report watts for these fields; convert explicitly.
-            batt_w = _to_float(batt_raw, 0.0)
-            solar_w = _to_float(solar_raw, 0.0)
-            batt_kw = _sanitize_power_kw(batt_w / 1000.0, max_kw=5_000.0)
-            solar_kw = _sanitize_power_kw(solar_w / 1000.0, max_kw=5_000.0)
+def backfill_missing_energy_mix_data(days_to_backfill: int = 7) -> int:
+    """Backfill missing energy mix hours for the specified number of days.
 
-            # For mix distribution, treat negative (charging) as 0 contribution.
-            energy_mix['battery'] += max(0.0, batt_kw)
-            energy_mix['solar'] += max(0.0, solar_kw)
-
-    return energy_mix
-
-
-def backfill_missing_energy_mix_data(days_to_backfill: int = 7):
-    """Backfill missing energy mix data for the specified number of days."""
-    from datetime import datetime, timedelta
-    
+    Hours without a stored row get one, all zeros if no asset reported in
+    them; stored hours with sites but no scoped rows get their scoped rows.
+    The readings behind them are read in one pass, newest first, down to the
+    earliest such hour, and everything is written in one transaction.
+    Returns the number of global hours written.
+    """
     logger.info(f"Starting backfill for {days_to_backfill} days")
-    
-    # Get current historical data to identify gaps
-    historical_data = get_historical_energy_mix(days_to_backfill * 24)  # Convert to hours
-    
-    # Identify which hours are missing data (all zeros)
-    now = datetime.now()
-    for i in range(days_to_backfill * 24):  # For each hour in the range
-        target_hour = now - timedelta(hours=i)
-        hour_key = target_hour.strftime("%Y-%m-%d %H:00")
-        display_time = target_hour.strftime("%H:00")
 
-        # Find if this hour exists in historical data
-        hour_exists = any(item['time'] == display_time for item in historical_data)
-
-        if not hour_exists:
-            logger.info(f"Backfilling data for {hour_key}")
-            try:
-                # Calculate energy mix for this specific hour
-                mix = calculate_energy_mix_for_hour(target_hour)
-
-                # Get the total number of sites to store with the data
-                from routers.energy_mix import _resolve_site_ids
-                site_ids, _ = _resolve_site_ids(region=None, state=None, site=None, sample_size=2000)
-
-                store_energy_mix_snapshot(hour_key, mix, len(site_ids))
-                logger.info(f"Backfilled data for {hour_key}: {mix}")
-            except Exception as e:
-                logger.error(f"Failed to backfill data for {hour_key}: {e}")
-    
-    logger.info("Backfill completed")
+    now = datetime.now()
+    expected = [
+        (now - timedelta(hours=i)).strftime(HOUR_FORMAT)
+        for i in range(days_to_backfill * 24 - 1, -1, -1)
+    ]
+    if not expected:
+        return 0
+    initialize_energy_mix_table()
+    global_hours, scoped_hours = get_stored_energy_mix_hours(expected[0], expected[-1])
+    missing = {hour_key for hour_key in expected if hour_key not in global_hours}
+    missing_scoped = {
+        hour_key for hour_key in expected
+        if hour_key not in scoped_hours and (hour_key in missing or global_hours[hour_key] > 0)
+    }
+    to_fold = missing | missing_scoped
+    if not to_fold:
+        logger.info("Backfill completed: no missing hours")
+        return 0
+
+    site_by_asset, scopes_by_site = load_site_scopes()
+    first_hour = min(to_fold)
+    # created_at grows with id; an hour of slack for readings stamped before they were stored.
+    created_cutoff = (
+        datetime.strptime(first_hour, HOUR_FORMAT) - timedelta(hours=1)
+    ).strftime("%Y-%m-%d %H:%M:%S")
+
+    hours: Dict[str, Dict[int, Contribution]] = {}
+    cursor = get_database().execute(
+        """
+        SELECT id, asset_id, reading_type, timestamp, data, created_at
+        FROM readings ORDER BY id DESC
+        """
+    )
+    while True:
+        page = cursor.fetchmany(PAGE_SIZE)
+        if not page:
+            break
+        in_window = [row[:5] for row in page if not row[5] or row[5] >= created_cutoff]
+        fold_readings(in_window, hours, first_hour, expected[-1], site_by_asset, hour_keys=to_fold)
+        if len(in_window) < len(page):
+            break
+
+    snapshots, scoped_snapshots = hour_snapshots(hours, sorted(to_fold), site_by_asset, scopes_by_site)
+    snapshots = [snapshot for snapshot in snapshots if snapshot[0] in missing]
+    scoped_snapshots = [snapshot for snapshot in scoped_snapshots if snapshot[1] in missing_scoped]
+    store_energy_mix_snapshots(snapshots, scoped_snapshots)
+
+    logger.info(
+        f"Backfill completed: {len(snapshots)} hours, {len(scoped_snapshots)} scoped rows "
+        f"from {sum(len(assets) for assets in hours.values())} asset-hours"
+    )
+    return len(snapshots)
 
 
-# Run backfill on startup if needed
 def run_initial_backfill():
-    """Run an initial backfill of missing data on startup."""
+    """Backfill missing energy mix data on startup, then seed what is still missing."""
     try:
         backfill_missing_energy_mix_data(days_to_backfill=7)
     except Exception as e:
-        logger.error(f"Initial backfill failed: {e}")
\ No newline at end of file
+        logger.error(f"Initial backfill failed: {e}")
+
+    # Synthetic 24h coverage for hours the backfill could not fill.
+    try:
+        from scripts.seed_energy_mix_24h import seed_missing_energy_mix_data
+        seed_missing_energy_mix_data()
+    except Exception as e:
+        logger.error(f"Failed to seed energy mix data: {e}")
@@ -0,0 +1,133 @@
+"""
+Field-alias resolution shared by every reading extractor.
+
+IHS devices report the same quantity under many key spellings, so extractors
+carry alias lists (`reading_metrics`, the threshold engine's extraction plans,
+the composite-rule parameter map). Probing those lists
+key by key costs a dict lookup per alias for every parameter of every reading,
+yet a device always sends the same keys.
+
+A `ReadingSchema` is the key set of one payload shape. For each alias list it
+works out once which aliases the shape contains, in alias order, and caches
+that; whole field specs (`fields`) and extraction plans (`plan_steps`) are
+resolved the same way. Extractors then only look at those keys (usually
+exactly one). Schemas are cached by fingerprint, the payload's keys in order:
+one device type always serialises the same keys in the same order. The same
+keys in another order get their own, identical, schema.
+
+Fingerprinting a payload costs about as much as probing a few short alias
+lists, so look the schema up once per reading and pass it to every extractor
+that reads from it. Code that reads only a few short lists from a payload, such
+as the energy-mix, tenant and energy-source dashboard helpers, probes them
+directly instead.
+
+Resolution only decides which keys are present. Each extractor keeps its own
+value rules, such as skipping None or non-numeric values and falling through
+to the next present alias.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Distinct payload shapes kept; the cache is cleared when it outgrows this.
+EXTRACTOR_SCHEMA_CACHE_SIZE = int(os.getenv('EXTRACTOR_SCHEMA_CACHE_SIZE', '4096'))
+
+Aliases = Tuple[str, ...]
+
+
+class ReadingSchema:
+    """One payload key set and the aliases it resolves, per alias list."""
+
+    __slots__ = ('keys', '_present', '_fields', '_plans')
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = frozenset(keys)
+        self._present: Dict[Aliases, Aliases] = {}
+        self._fields: Dict[int, Tuple[Any, Tuple[Tuple[str, Aliases], ...]]] = {}
+        self._plans: Dict[Any, Tuple[Tuple[Tuple[str, Aliases], ...], bool]] = {}
+
+    def present(self, aliases: Sequence[str]) -> Aliases:
+        """The aliases this key set contains, in alias order."""
+        if type(aliases) is not tuple:
+            aliases = tuple(aliases)
+        found = self._present.get(aliases)
+        if found is None:
+            found = tuple(alias for alias in aliases if alias in self.keys)
+            self._present[aliases] = found
+        return found
+
+    def fields(self, spec: Tuple[Tuple[str, Aliases], ...]) -> Tuple[Tuple[str, Aliases], ...]:
+        """
+        A `((name, aliases), ...)` field spec with every alias list resolved, so an
+        extractor pulling many fields pays one lookup per reading. Cached by the
+        spec's identity: pass a module-level constant.
+        """
+        entry = self._fields.get(id(spec))
+        if entry is None or entry[0] is not spec:
+            entry = (spec, tuple((name, self.present(aliases)) for name, aliases in spec))
+            self._fields[id(spec)] = entry
+        return entry[1]
+
+    def plan_steps(self, plan) -> Tuple[Tuple[Tuple[str, Aliases], ...], bool]:
+        """
+        A `threshold_engine.ExtractionPlan` resolved for this key set: its steps
+        that have a key present (narrowed to those keys), and whether its last
+        step has none. The plan's result then falls back to None rather than
+        to an earlier step.
+        """
+        resolved = self._plans.get(plan)
+        if resolved is None:
+            steps = [(reducer, self.present(keys)) for reducer, keys in plan.steps]
+            resolved = (
+                tuple((reducer, keys) for reducer, keys in steps if keys),
+                bool(steps) and not steps[-1][1],
+            )
+            self._plans[plan] = resolved
+        return resolved
+
+
+_schemas: Dict[Tuple, ReadingSchema] = {}
+_lock = threading.Lock()
+_stats = {"schemas_built": 0, "cache_clears": 0}
+
+
+def schema_for(data: Dict[str, Any]) -> ReadingSchema:
+    """The cached schema of this payload's key set."""
+    fingerprint = tuple(data)
+    schema = _schemas.get(fingerprint)
+    if schema is None:
+        schema = ReadingSchema(fingerprint)
+        with _lock:
+            if len(_schemas) >= EXTRACTOR_SCHEMA_CACHE_SIZE:
+                _schemas.clear()
+                _stats["cache_clears"] += 1
+            schema = _schemas.setdefault(fingerprint, schema)
+            _stats["schemas_built"] += 1
+    return schema
+
+
+def to_float(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def pick_first(data: Dict[str, Any], aliases: Sequence[str], schema: Optional[ReadingSchema] = None) -> Optional[float]:
+    """First present alias with a numeric value, else None."""
+    for key in (schema or schema_for(data)).present(aliases):
+        value = to_float(data[key])
+        if value is not None:
+            return value
+    return None
+
+
+def stats() -> Dict[str, int]:
+    return {"schemas": len(_schemas), **_stats}
+
+
+def clear():
+    with _lock:
+        _schemas.clear()
@@ -1,5 +1,10 @@
 import requests
-from typing import List, Dict, Optional
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Iterator, List, Dict, Optional
+import itertools
+import os
 import time
 import math
 import logging
@@ -7,11 +12,42 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def resolve_total_pages(resp: dict, per_page: int) -> Optional[int]:
+    """Page count from a `/sites` response (`total`, else `total_pages`/`pages`)."""
+    total_raw = resp.get("total")
+    total_int: Optional[int] = None
+    try:
+        if total_raw is not None:
+            total_int = int(total_raw)
+    except (TypeError, ValueError):
+        total_int = None
+
+    if total_int is not None and per_page > 0:
+        total_pages = max(1, math.ceil(total_int / per_page))
+        logger.info(f"Total sites: {total_int}, pages: {total_pages}")
+        return total_pages
+
+    total_pages_raw = resp.get("total_pages") or resp.get("pages")
+    try:
+        return int(total_pages_raw) if total_pages_raw is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
 class IHSApiClient:
-    def __init__(self, base_url: str, token: str):
+    def __init__(self, base_url: str, token: str, pool_maxsize: int = 10, page_fan_out: Optional[int] = None):
         self.base_url = base_url.rstrip('/')
         self.token = token
+        # Optional limiter with `acquire()`, taken before every request attempt.
+        self.rate_limiter = None
+        if page_fan_out is None:
+            page_fan_out = int(os.getenv('IHS_SITES_PAGE_FAN_OUT', '4'))
+        self.page_fan_out = max(1, min(int(page_fan_out), int(pool_maxsize)))
         self.session = requests.Session()
+        # Size the connection pool so concurrent callers don't discard connections.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(pool_maxsize)))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def _make_request(self, endpoint: str, params: dict = None) -> dict:
         url = f"{self.base_url}/{endpoint}"
@@ -19,6 +55,8 @@ class IHSApiClient:
         params['X-Access-Token'] = self.token
 
         for attempt in range(3):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
             try:
                 response = self.session.get(url, params=params, timeout=30)
                 response.raise_for_status()
@@ -32,50 +70,64 @@ class IHSApiClient:
     def get_sites(self, page: int = 1, per_page: int = 100) -> dict:
         return self._make_request('sites', {'page': page, 'per_page': per_page})
 
-    def get_all_sites(self, per_page: int = 100) -> List[dict]:
+    @staticmethod
+    def _page_data(resp: dict) -> List[dict]:
+        data = resp.get("data", []) if isinstance(resp, dict) else []
+        return data if isinstance(data, list) else []
+
+    def iter_site_pages(self, per_page: int = 100, fan_out: Optional[int] = None) -> Iterator[List[dict]]:
+        """
+        Yield `/sites` pages in page order as soon as each one is available.
+
+        Page 1 is fetched first to learn the page count; the remaining pages are
+        then fetched concurrently (at most `fan_out` at a time) while earlier
+        pages are handed to the caller. Without a page count, pages are walked
+        one after another until a short page comes back.
+        """
+        fan_out = max(1, int(fan_out or self.page_fan_out))
+
+        first = self.get_sites(page=1, per_page=per_page)
+        data = self._page_data(first)
+        yield data
+
+        total_pages = resolve_total_pages(first, per_page)
+        if total_pages is None:
+            page = 1
+            while len(data) >= per_page:
+                page += 1
+                if page % 20 == 0:
+                    time.sleep(0.05)
+                data = self._page_data(self.get_sites(page=page, per_page=per_page))
+                yield data
+            return
+
+        if total_pages <= 1:
+            return
+
+        remaining = iter(range(2, total_pages + 1))
+        with ThreadPoolExecutor(max_workers=fan_out, thread_name_prefix="ihs-sites") as executor:
+            # Keep a bounded window of requests in flight; the deque preserves page order.
+            in_flight = deque(
+                executor.submit(self.get_sites, page=page, per_page=per_page)
+                for page in itertools.islice(remaining, fan_out * 2)
+            )
+            try:
+                while in_flight:
+                    resp = in_flight.popleft().result()
+                    next_page = next(remaining, None)
+                    if next_page is not None:
+                        in_flight.append(executor.submit(self.get_sites, page=next_page, per_page=per_page))
+                    yield self._page_data(resp)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+    def get_all_sites(self, per_page: int = 100, fan_out: Optional[int] = None) -> List[dict]:
         logger.info("Fetching all sites from IHS API...")
 
-        page = 1
         all_sites: List[dict] = []
-        total_pages: Optional[int] = None
-
-        while True:
-            resp = self.get_sites(page=page, per_page=per_page)
-            data = resp.get("data", [])
-            if not isinstance(data, list):
-                data = []
-
-            all_sites.extend(data)
-
-            if total_pages is None:
-                total_raw = resp.get("total")
-                total_int: Optional[int] = None
-                try:
-                    if total_raw is not None:
-                        total_int = int(total_raw)
-                except (TypeError, ValueError):
-                    total_int = None
-
-                if total_int is not None and per_page > 0:
-                    total_pages = max(1, math.ceil(total_int / per_page))
-                    logger.info(f"Total sites: {total_int}, pages: {total_pages}")
-                else:
-                    total_pages_raw = resp.get("total_pages") or resp.get("pages")
-                    try:
-                        total_pages = int(total_pages_raw) if total_pages_raw is not None else None
-                    except (TypeError, ValueError):
-                        total_pages = None
-
-            if total_pages is not None:
-                if page >= total_pages:
-                    break
-            else:
-                if len(data) < per_page:
-                    break
-
-            page += 1
-            if page % 20 == 0:
-                time.sleep(0.05)
+        for page_sites in self.iter_site_pages(per_page=per_page, fan_out=fan_out):
+            all_sites.extend(page_sites)
 
         logger.info(f"Fetched {len(all_sites)} sites")
         return all_sites
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+from typing import Dict, List, Optional
+
+import httpx
+
+from services.ihs_api_client import resolve_total_pages
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncIHSApiClient:
+    """
+    asyncio variant of `IHSApiClient` with the same surface.
+
+    - Connection pool and keep-alive are configurable (`max_connections`,
+      `max_keepalive_connections`, `keepalive_expiry`).
+    - Every call has a deadline covering all retry attempts, not just one socket read.
+    - Retries back off with full jitter via `asyncio.sleep`, so they never block a thread.
+    - Cancelling the awaiting task cancels the in-flight request.
+
+    An `httpx.AsyncClient` is bound to the event loop it was created on, so one
+    pool is kept per running loop (FastAPI's loop, or a loop started by a
+    background job).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        deadline: float = 60.0,
+        max_attempts: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 8.0,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.deadline = deadline
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            # Drop pools whose loop has gone away (e.g. a finished asyncio.run()).
+            for stale_loop in [l for l in self._clients if l.is_closed()]:
+                self._clients.pop(stale_loop, None)
+            client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits, timeout=self.timeout)
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the pool for the current event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    async def __aenter__(self) -> "AsyncIHSApiClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from concurrent callers instead of synchronising them.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _attempts(self, endpoint: str, params: dict) -> dict:
+        client = self._get_client()
+        for attempt in range(self.max_attempts):
+            try:
+                response = await client.get(f"/{endpoint}", params=params)
+                response.raise_for_status()
+                return response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                if attempt == self.max_attempts - 1:
+                    logger.error(f"Failed to fetch {endpoint} after {self.max_attempts} attempts: {e}")
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def _make_request(self, endpoint: str, params: dict = None, deadline: Optional[float] = None) -> dict:
+        params = dict(params or {})
+        params['X-Access-Token'] = self.token
+        budget = self.deadline if deadline is None else deadline
+        try:
+            return await asyncio.wait_for(self._attempts(endpoint, params), timeout=budget)
+        except asyncio.TimeoutError:
+            logger.error(f"Deadline of {budget}s exceeded for {endpoint}")
+            raise
+
+    async def get_sites(self, page: int = 1, per_page: int = 100, deadline: Optional[float] = None) -> dict:
+        return await self._make_request('sites', {'page': page, 'per_page': per_page}, deadline=deadline)
+
+    async def get_all_sites(self, per_page: int = 100) -> List[dict]:
+        logger.info("Fetching all sites from IHS API...")
+
+        page = 1
+        all_sites: List[dict] = []
+        total_pages: Optional[int] = None
+
+        while True:
+            resp = await self.get_sites(page=page, per_page=per_page)
+            data = resp.get("data", [])
+            if not isinstance(data, list):
+                data = []
+
+            all_sites.extend(data)
+
+            if total_pages is None:
+                total_pages = resolve_total_pages(resp, per_page)
+
+            if total_pages is not None:
+                if page >= total_pages:
+                    break
+            else:
+                if len(data) < per_page:
+                    break
+
+            page += 1
+
+        logger.info(f"Fetched {len(all_sites)} sites")
+        return all_sites
+
+    async def get_asset_readings(self, asset_id: int, params: dict = None, deadline: Optional[float] = None) -> dict:
+        return await self._make_request(f'assets/{asset_id}/readings', params, deadline=deadline)
+
+    async def get_latest_asset_reading(self, asset_id: int, deadline: Optional[float] = None) -> Optional[dict]:
+        try:
+            response = await self.get_asset_readings(asset_id, {'per_page': 1, 'page': 1}, deadline=deadline)
+            data = response.get('data', [])
+            return data[0] if data else None
+        except (httpx.HTTPError, ValueError, asyncio.TimeoutError) as e:
+            logger.warning(f"Failed to fetch reading for asset {asset_id}: {e}")
+            return None
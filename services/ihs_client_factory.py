@@ -1,21 +1,36 @@
 import os
-from typing import Optional
+from typing import Optional, Tuple
 
-from services.ihs_api_client import IHSApiClient
+from services.ihs_async_api_client import AsyncIHSApiClient
 
-_CLIENT: Optional[IHSApiClient] = None
+_ASYNC_CLIENT: Optional[AsyncIHSApiClient] = None
 
 
-def get_ihs_api_client() -> IHSApiClient:
-    global _CLIENT
-    if _CLIENT is not None:
-        return _CLIENT
-
+def _credentials() -> Tuple[str, str]:
     base_url = os.getenv("IHS_API_BASE_URL")
     token = os.getenv("IHS_API_TOKEN")
     if not base_url or not token:
         raise ValueError("IHS_API_BASE_URL and IHS_API_TOKEN must be set in .env")
+    return base_url, token
+
+
+def get_async_ihs_api_client() -> AsyncIHSApiClient:
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is not None:
+        return _ASYNC_CLIENT
+
+    base_url, token = _credentials()
+    _ASYNC_CLIENT = AsyncIHSApiClient(
+        base_url,
+        token,
+        max_connections=int(os.getenv("IHS_HTTP_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("IHS_HTTP_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("IHS_HTTP_KEEPALIVE_EXPIRY", "30")),
+        deadline=float(os.getenv("IHS_HTTP_DEADLINE", "60")),
+    )
+    return _ASYNC_CLIENT
 
-    _CLIENT = IHSApiClient(base_url, token)
-    return _CLIENT
 
+async def close_async_ihs_api_client():
+    if _ASYNC_CLIENT is not None:
+        await _ASYNC_CLIENT.aclose()
@@ -3,7 +3,7 @@ import json
 from datetime import datetime
 from io import StringIO
 from typing import Dict, List
-from services.ihs_api_client import IHSApiClient
+from services.ihs_async_api_client import AsyncIHSApiClient
 
 
 def flatten_dict(d, parent_key='', sep='_'):
@@ -20,10 +20,10 @@ def flatten_dict(d, parent_key='', sep='_'):
 
 
 class IHSCsvExportService:
-    def __init__(self, ihs_client: IHSApiClient):
+    def __init__(self, ihs_client: AsyncIHSApiClient):
         self.client = ihs_client
 
-    def generate_assets_csv(self) -> str:
+    async def generate_assets_csv(self) -> str:
         pull_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         asset_limit = 10000
         per_page = 100
@@ -31,7 +31,7 @@ class IHSCsvExportService:
         page = 1
 
         while len(all_assets) < asset_limit:
-            resp = self.client.get_sites(page=page, per_page=per_page)
+            resp = await self.client.get_sites(page=page, per_page=per_page)
             sites_data = resp.get("data", [])
 
             if not sites_data:
@@ -85,7 +85,7 @@ class IHSCsvExportService:
 
         return output.getvalue()
 
-    def generate_sites_csv(self) -> str:
+    async def generate_sites_csv(self) -> str:
         pull_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         limit = 10000
         per_page = 100
@@ -93,7 +93,7 @@ class IHSCsvExportService:
         page = 1
 
         while len(all_sites) < limit:
-            resp = self.client.get_sites(page=page, per_page=per_page)
+            resp = await self.client.get_sites(page=page, per_page=per_page)
             data = resp.get("data", [])
 
             if not data:
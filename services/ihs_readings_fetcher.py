@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from services.ihs_api_client import IHSApiClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv("IHS_READINGS_WORKERS", "16"))
+DEFAULT_RATE_LIMIT = float(os.getenv("IHS_RATE_LIMIT_PER_SEC", "50"))
+
+
+class RateLimiter:
+    """Thread-safe token bucket; `rate` tokens per second, bursting up to `burst`. 0 is unlimited."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def limit_to(self, rate: float):
+        """Lower the rate to `rate` if that is stricter; a limiter is never loosened."""
+        rate = float(rate)
+        with self._lock:
+            if rate <= 0 or 0 < self.rate <= rate:
+                return
+            self.rate = rate
+            self.burst = float(max(1, int(rate)))
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+_host_limiters: Dict[str, RateLimiter] = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_rate_limiter(base_url: str, rate: float) -> RateLimiter:
+    """
+    Return the shared limiter for the host of `base_url` (one bucket per host).
+
+    Callers asking for different rates share the bucket, limited to the lowest rate asked for.
+    """
+    host = urlparse(base_url).netloc or base_url
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None:
+            limiter = _host_limiters[host] = RateLimiter(rate)
+        else:
+            limiter.limit_to(rate)
+        return limiter
+
+
+class IHSReadingsFetcher:
+    """
+    Bounded-concurrency fetcher for latest asset readings.
+
+    HTTP calls run on a thread pool (at most `max_workers` in flight) and are
+    throttled by a per-host rate limiter, which the API client takes a token
+    from before every attempt, retries included. Results are yielded in completion
+    order so callers can persist them while the remaining requests are still
+    running. Only the HTTP work happens off-thread; callers keep doing DB
+    writes on their own thread (SQLite connections are thread-local).
+    """
+
+    def __init__(
+        self,
+        api_client: IHSApiClient,
+        max_workers: int = DEFAULT_WORKERS,
+        rate_limit_per_sec: float = DEFAULT_RATE_LIMIT,
+    ):
+        self.api_client = api_client
+        self.max_workers = max(1, int(max_workers))
+        self.rate_limiter = get_host_rate_limiter(api_client.base_url, rate_limit_per_sec)
+        api_client.rate_limiter = self.rate_limiter
+
+    def _fetch_one(self, external_id: int) -> Optional[dict]:
+        return self.api_client.get_latest_asset_reading(external_id)
+
+    def fetch_latest(self, assets: Iterable[Dict]) -> Iterator[Tuple[Dict, Optional[dict]]]:
+        """
+        Yield `(asset, latest_reading)` pairs as responses arrive.
+
+        `assets` are asset rows with an `external_id`; rows without one are skipped.
+        A failed fetch yields `None` for the reading rather than raising.
+        """
+        max_in_flight = self.max_workers * 4
+        pending: Set[Future] = set()
+        asset_by_future: Dict[Future, Dict] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ihs-readings") as executor:
+            try:
+                for asset in assets:
+                    external_id = asset.get('external_id')
+                    if not external_id:
+                        continue
+                    future = executor.submit(self._fetch_one, external_id)
+                    pending.add(future)
+                    asset_by_future[future] = asset
+
+                    if len(pending) >= max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for finished in done:
+                            yield self._result(asset_by_future.pop(finished), finished)
+
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        yield self._result(asset_by_future.pop(finished), finished)
+            finally:
+                # Caller stopped early: drop queued work instead of draining it.
+                for future in pending:
+                    future.cancel()
+
+    def _result(self, asset: Dict, future: Future) -> Tuple[Dict, Optional[dict]]:
+        try:
+            return asset, future.result()
+        except Exception as e:
+            logger.warning(f"Failed to fetch reading for asset {asset.get('external_id')}: {e}")
+            return asset, None
@@ -1,11 +1,17 @@
 import logging
-from typing import Dict
+from typing import Dict, List
 from datetime import datetime
 from services.ihs_api_client import IHSApiClient
+from services.ihs_readings_fetcher import IHSReadingsFetcher, DEFAULT_WORKERS
+from services.reading_metrics import extract_metrics
+from services.site_scope import get_site_scope_resolver
+from db.repositories.alarm_repository import get_open_alarm_index
 from db.repositories.site_repository import SiteRepository
 from db.repositories.asset_repository import AssetRepository
-from db.repositories.reading_repository import ReadingRepository
+from db.repositories.reading_repository import BufferedReadingWriter, ReadingRepository
 from db.repositories.sync_metadata_repository import SyncMetadataRepository
+from db.client import get_database
+import hashlib
 import json
 import os
 import threading
@@ -36,12 +42,18 @@ class IHSSyncService:
         if not base_url or not token:
             raise ValueError("IHS_API_BASE_URL and IHS_API_TOKEN must be set in .env")
 
-        self.api_client = IHSApiClient(base_url, token)
+        self.api_client = IHSApiClient(base_url, token, pool_maxsize=DEFAULT_WORKERS)
+        self.readings_fetcher = IHSReadingsFetcher(self.api_client, max_workers=DEFAULT_WORKERS)
+        self.reading_batch_size = int(os.getenv('IHS_READINGS_BATCH_SIZE', '200'))
+        self.reading_flush_interval = float(os.getenv('IHS_READINGS_FLUSH_INTERVAL_SECONDS', '5'))
         self.site_repo = SiteRepository()
         self.asset_repo = AssetRepository()
         self.reading_repo = ReadingRepository()
         self.metadata_repo = SyncMetadataRepository()
         self._sync_lock = threading.Lock()
+        # asset id -> source timestamp of the last reading stored; skips re-sending
+        # an unchanged latest reading to the database every cycle.
+        self._last_reading_timestamps: Dict[int, str] = {}
 
     def _infer_asset_type(self, asset: dict) -> str:
         # Check channels first
@@ -70,6 +82,14 @@ class IHSSyncService:
 
         return 'UNKNOWN'
 
+    def _reading_timestamp(self, reading: dict):
+        return (
+            reading.get('timestamp')
+            or reading.get('date')
+            or reading.get('created_at')
+            or reading.get('time')
+        )
+
     def _extract_site_fields(self, ihs_site: dict) -> Dict:
         zone = ihs_site.get('zone') if isinstance(ihs_site, dict) else None
         zone_name = zone.get('name', 'Unknown') if isinstance(zone, dict) else 'Unknown'
@@ -139,7 +159,6 @@ class IHSSyncService:
 
             asset_ids = self.asset_repo.get_ids_by_site_ids(site_ids)
             if asset_ids:
-                from db.client import get_database
                 db = get_database()
                 placeholders = ",".join("?" for _ in asset_ids)
                 cursor = db.execute(
@@ -147,12 +166,15 @@ class IHSSyncService:
                     tuple(asset_ids),
                 )
                 db.commit()
+                get_open_alarm_index().invalidate()
                 detached_alarms += cursor.rowcount
                 pruned_readings += self.reading_repo.delete_by_asset_ids(asset_ids)
 
             pruned_assets += self.asset_repo.delete_by_site_ids(site_ids)
             pruned_sites += self.site_repo.delete_by_ids(site_ids)
 
+        if pruned_sites:
+            get_site_scope_resolver().invalidate()
         return {
             'stale_sites': pruned_sites,
             'stale_assets': pruned_assets,
@@ -160,6 +182,175 @@ class IHSSyncService:
             'alarms_detached': detached_alarms,
         }
 
+    def _build_asset_row(self, ihs_asset: dict, site_id: int) -> Dict:
+        # Extract tenant channels from asset config
+        tenant_names = []
+        config = ihs_asset.get('config') or {}
+        channels = config.get('channels', []) if isinstance(config, dict) else []
+        for channel in channels:
+            if isinstance(channel, dict) and channel.get('type') == 'tenant':
+                tenant_name = channel.get('name')
+                if tenant_name:
+                    tenant_names.append(tenant_name)
+
+        return {
+            'external_id': int(ihs_asset['id']),
+            'name': ihs_asset['name'],
+            'type': self._infer_asset_type(ihs_asset),
+            'site_id': site_id,
+            'tenant_channels': json.dumps(tenant_names) if tenant_names else None,
+            'config': json.dumps(ihs_asset.get('config')) if ihs_asset.get('config') is not None else None,
+        }
+
+    @staticmethod
+    def _content_hash(row: Dict) -> str:
+        return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _site_ids_hash(external_ids: set[int]) -> str:
+        return hashlib.sha1(",".join(str(i) for i in sorted(external_ids)).encode()).hexdigest()
+
+    @staticmethod
+    def _new_stats() -> Dict:
+        stats = {'sites': 0, 'assets': 0, 'readings': 0, 'readings_duplicate': 0, 'readings_no_timestamp': 0}
+        for entity in ('sites', 'assets'):
+            for outcome in ('inserted', 'updated', 'unchanged'):
+                stats[f'{entity}_{outcome}'] = 0
+        return stats
+
+    def _classify_rows(self, entity: str, rows: List[Dict], existing_ids: Dict[int, int], stats: Dict):
+        """
+        Split rows into those that need writing and their new content hashes.
+
+        A row is unchanged when it already exists locally and its content hash
+        matches the one stored by the previous sync.
+        """
+        stored = self.metadata_repo.get_record_hashes(entity, [row['external_id'] for row in rows])
+        changed = []
+        hashes = {}
+        for row in rows:
+            external_id = row['external_id']
+            content_hash = self._content_hash(row)
+            if external_id not in existing_ids:
+                stats[f'{entity}s_inserted'] += 1
+            elif stored.get(external_id) != content_hash:
+                stats[f'{entity}s_updated'] += 1
+            else:
+                stats[f'{entity}s_unchanged'] += 1
+                continue
+            changed.append(row)
+            hashes[external_id] = content_hash
+        return changed, hashes
+
+    def _upsert_site_page(self, page_sites: List[dict], api_external_ids: set[int], stats: Dict) -> List[Dict]:
+        """
+        Upsert one page of sites and their assets in a single transaction.
+
+        Rows whose content hash matches the previous sync are not written.
+        Returns every asset row on the page with its local `id` filled in.
+        """
+        site_rows = []
+        for ihs_site in page_sites:
+            api_external_ids.add(int(ihs_site['id']))
+            site_rows.append({'external_id': int(ihs_site['id']), **self._extract_site_fields(ihs_site)})
+
+        site_ids = self.site_repo.get_id_map_by_external_ids([row['external_id'] for row in site_rows])
+        changed_sites, site_hashes = self._classify_rows('site', site_rows, site_ids, stats)
+        site_ids.update(self.site_repo.upsert_many_by_external_id(changed_sites, commit=False))
+        self.metadata_repo.save_record_hashes('site', site_hashes, commit=False)
+        stats['sites'] += len(site_rows)
+
+        asset_rows = []
+        for ihs_site in page_sites:
+            site_id = site_ids[int(ihs_site['id'])]
+            for ihs_asset in ihs_site.get('assets', []) or []:
+                asset_rows.append(self._build_asset_row(ihs_asset, site_id))
+
+        asset_ids = self.asset_repo.get_id_map_by_external_ids([row['external_id'] for row in asset_rows])
+        changed_assets, asset_hashes = self._classify_rows('asset', asset_rows, asset_ids, stats)
+        asset_ids.update(self.asset_repo.upsert_many_by_external_id(changed_assets, commit=False))
+        self.metadata_repo.save_record_hashes('asset', asset_hashes, commit=False)
+        get_database().commit()
+        if changed_sites:
+            get_site_scope_resolver().invalidate()
+        stats['assets'] += len(asset_rows)
+
+        for row in asset_rows:
+            row['id'] = asset_ids[row['external_id']]
+        return asset_rows
+
+    def _prune_if_site_set_changed(self, api_external_ids: set[int]) -> Dict[str, int]:
+        """Prune stale sites only when the external id set differs from the last successful sync."""
+        site_ids_hash = self._site_ids_hash(api_external_ids)
+        if api_external_ids and site_ids_hash == self.metadata_repo.get_site_ids_hash():
+            logger.info("Site id set unchanged since last sync; skipping prune")
+            return {'stale_sites': 0, 'stale_assets': 0, 'stale_readings': 0, 'alarms_detached': 0}
+
+        prune_stats = self._prune_stale_sites(api_external_ids)
+        if api_external_ids:
+            self.metadata_repo.delete_orphaned_record_hashes()
+            self.metadata_repo.record_site_ids_hash(site_ids_hash)
+        return prune_stats
+
+    def _store_latest_readings(self, assets: List[Dict]) -> Dict[str, int]:
+        """
+        Fetch the latest reading for each asset concurrently and persist them in batches.
+
+        A reading whose timestamp matches the last one seen for the asset is
+        counted as a duplicate and not written. One without any timestamp cannot
+        be stored, and is counted under `readings_no_timestamp`.
+        """
+        # Readings arrive in completion order; the writer commits every
+        # `reading_batch_size` rows or `reading_flush_interval` seconds so a
+        # slow tail of requests doesn't hold back everything already fetched.
+        writer = BufferedReadingWriter(
+            self.reading_repo,
+            flush_size=self.reading_batch_size,
+            flush_interval=self.reading_flush_interval,
+        )
+        seen_now: Dict[int, str] = {}
+        skipped = 0
+        no_timestamp = 0
+        with writer:
+            for asset, latest_reading in self.readings_fetcher.fetch_latest(assets):
+                if not latest_reading:
+                    writer.flush_if_due()
+                    continue
+                timestamp = self._reading_timestamp(latest_reading)
+                if timestamp is None:
+                    no_timestamp += 1
+                    writer.flush_if_due()
+                    continue
+                if self._last_reading_timestamps.get(asset['id']) == timestamp:
+                    skipped += 1
+                    writer.flush_if_due()
+                    continue
+                # The IoT API `/assets/{id}/readings` items are flat objects (not nested under `.data`).
+                # Store the full reading payload so the frontend can normalize fields like voltage/power/etc.
+                writer.add({
+                    'asset_id': asset['id'],
+                    'reading_type': asset.get('type') or 'UNKNOWN',
+                    'timestamp': timestamp,
+                    'data': json.dumps(latest_reading),
+                    'metrics': extract_metrics(latest_reading),
+                })
+                seen_now[asset['id']] = timestamp
+
+        # Only remember timestamps once they are safely stored (or already were).
+        self._last_reading_timestamps.update(seen_now)
+        if no_timestamp:
+            logger.warning(f"Skipped {no_timestamp} readings without a timestamp")
+        return {
+            'readings': writer.written,
+            'readings_duplicate': writer.duplicates + skipped,
+            'readings_no_timestamp': no_timestamp,
+        }
+
+    @staticmethod
+    def _dedup_ratio(stats: Dict) -> float:
+        seen = stats.get('readings', 0) + stats.get('readings_duplicate', 0)
+        return round(stats.get('readings_duplicate', 0) / seen, 4) if seen else 0.0
+
     def sync_sites_and_assets(self) -> Dict:
         if not self._sync_lock.acquire(blocking=False):
             logger.info("IHS sites/assets sync already running; skipping")
@@ -168,49 +359,19 @@ class IHSSyncService:
         logger.info("Starting IHS sites/assets sync...")
         self.metadata_repo.record_sync_start()
 
-        stats = {'sites': 0, 'assets': 0, 'readings': 0}
+        stats = self._new_stats()
 
         try:
+            # Pages stream in order while later pages are still being fetched,
+            # so upserts start as soon as page 1 arrives.
             logger.info("Fetching sites from IHS API...")
-            ihs_sites = self.api_client.get_all_sites()
-            logger.info(f"Fetched {len(ihs_sites)} sites from IHS")
-
             api_external_ids: set[int] = set()
-            for ihs_site in ihs_sites:
-                # Sync site
-                api_external_ids.add(int(ihs_site['id']))
-                site_data = self._extract_site_fields(ihs_site)
-
-                site_id = self.site_repo.upsert_by_external_id(ihs_site['id'], site_data)
-                stats['sites'] += 1
-
-                # Sync assets for this site
-                ihs_assets = ihs_site.get('assets', [])
-                for ihs_asset in ihs_assets:
-                    asset_type = self._infer_asset_type(ihs_asset)
-
-                    # Extract tenant channels from asset config
-                    tenant_names = []
-                    config = ihs_asset.get('config') or {}
-                    channels = config.get('channels', []) if isinstance(config, dict) else []
-                    for channel in channels:
-                        if isinstance(channel, dict) and channel.get('type') == 'tenant':
-                            tenant_name = channel.get('name')
-                            if tenant_name:
-                                tenant_names.append(tenant_name)
-
-                    asset_data = {
-                        'name': ihs_asset['name'],
-                        'type': asset_type,
-                        'site_id': site_id,
-                        'tenant_channels': json.dumps(tenant_names) if tenant_names else None,
-                        'config': json.dumps(ihs_asset.get('config')) if ihs_asset.get('config') is not None else None,
-                    }
-
-                    asset_id = self.asset_repo.upsert_by_external_id(ihs_asset['id'], asset_data)
-                    stats['assets'] += 1
-
-            prune_stats = self._prune_stale_sites(api_external_ids)
+            for page_sites in self.api_client.iter_site_pages():
+                self._upsert_site_page(page_sites, api_external_ids, stats)
+
+            logger.info(f"Fetched {len(api_external_ids)} sites from IHS")
+
+            prune_stats = self._prune_if_site_set_changed(api_external_ids)
             stats.update(prune_stats)
 
             logger.info(f"Sync complete: {stats}")
@@ -218,6 +379,7 @@ class IHSSyncService:
             return stats
 
         except Exception as e:
+            get_database().rollback()
             logger.error(f"Sync failed: {e}", exc_info=True)
             self.metadata_repo.record_sync_failure(str(e))
             raise
@@ -232,70 +394,27 @@ class IHSSyncService:
         logger.info("Starting IHS sync...")
         self.metadata_repo.record_sync_start()
 
-        stats = {'sites': 0, 'assets': 0, 'readings': 0}
+        stats = self._new_stats()
 
         try:
-            # Step 1: Sync sites + assets (also stores config)
+            # Step 1: Sync sites + assets (also stores config), one transaction per page.
+            # Pages stream in order while later pages are still being fetched.
             logger.info("Fetching sites from IHS API...")
-            ihs_sites = self.api_client.get_all_sites()
-            logger.info(f"Fetched {len(ihs_sites)} sites from IHS")
-
             api_external_ids: set[int] = set()
-            for ihs_site in ihs_sites:
-                api_external_ids.add(int(ihs_site['id']))
-                site_data = self._extract_site_fields(ihs_site)
-
-                site_id = self.site_repo.upsert_by_external_id(ihs_site['id'], site_data)
-                stats['sites'] += 1
-
-                ihs_assets = ihs_site.get('assets', [])
-                for ihs_asset in ihs_assets:
-                    asset_type = self._infer_asset_type(ihs_asset)
-
-                    tenant_names = []
-                    config = ihs_asset.get('config') or {}
-                    channels = config.get('channels', []) if isinstance(config, dict) else []
-                    for channel in channels:
-                        if isinstance(channel, dict) and channel.get('type') == 'tenant':
-                            tenant_name = channel.get('name')
-                            if tenant_name:
-                                tenant_names.append(tenant_name)
-
-                    asset_data = {
-                        'name': ihs_asset['name'],
-                        'type': asset_type,
-                        'site_id': site_id,
-                        'tenant_channels': json.dumps(tenant_names) if tenant_names else None,
-                        'config': json.dumps(ihs_asset.get('config')) if ihs_asset.get('config') is not None else None,
-                    }
-
-                    asset_id = self.asset_repo.upsert_by_external_id(ihs_asset['id'], asset_data)
-                    stats['assets'] += 1
-
-                    try:
-                        latest_reading = self.api_client.get_latest_asset_reading(ihs_asset['id'])
-                        if latest_reading:
-                            timestamp = (
-                                latest_reading.get('timestamp')
-                                or latest_reading.get('date')
-                                or latest_reading.get('created_at')
-                                or latest_reading.get('time')
-                            )
-                            # The IoT API `/assets/{id}/readings` items are flat objects (not nested under `.data`).
-                            # Store the full reading payload so the frontend can normalize fields like voltage/power/etc.
-                            payload = latest_reading
-                            reading_data = {
-                                'asset_id': asset_id,
-                                'reading_type': asset_type,
-                                'timestamp': timestamp,
-                                'data': json.dumps(payload)
-                            }
-                            self.reading_repo.create(reading_data)
-                            stats['readings'] += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch reading for asset {ihs_asset['id']}: {e}")
-
-            prune_stats = self._prune_stale_sites(api_external_ids)
+            for page_sites in self.api_client.iter_site_pages():
+                asset_rows = self._upsert_site_page(page_sites, api_external_ids, stats)
+
+                # Step 2: Latest reading for each asset on this page
+                reading_stats = self._store_latest_readings(asset_rows)
+                stats['readings'] += reading_stats['readings']
+                stats['readings_duplicate'] += reading_stats['readings_duplicate']
+                stats['readings_no_timestamp'] += reading_stats['readings_no_timestamp']
+
+            stats['dedup_ratio'] = self._dedup_ratio(stats)
+
+            logger.info(f"Fetched {len(api_external_ids)} sites from IHS")
+
+            prune_stats = self._prune_if_site_set_changed(api_external_ids)
             stats.update(prune_stats)
 
             logger.info(f"Sync complete: {stats}")
@@ -303,6 +422,7 @@ class IHSSyncService:
             return stats
 
         except Exception as e:
+            get_database().rollback()
             logger.error(f"Sync failed: {e}", exc_info=True)
             self.metadata_repo.record_sync_failure(str(e))
             raise
@@ -317,34 +437,14 @@ class IHSSyncService:
 
         try:
             assets = self.asset_repo.get_all()
-            synced = 0
+            stats = self._store_latest_readings(assets)
+            stats['dedup_ratio'] = self._dedup_ratio(stats)
 
-            for asset in assets:
-                external_id = asset.get('external_id')
-                if not external_id:
-                    continue
-                try:
-                    latest_reading = self.api_client.get_latest_asset_reading(external_id)
-                    if not latest_reading:
-                        continue
-                    timestamp = (
-                        latest_reading.get('timestamp')
-                        or latest_reading.get('date')
-                        or latest_reading.get('created_at')
-                        or latest_reading.get('time')
-                    )
-                    self.reading_repo.create({
-                        'asset_id': asset['id'],
-                        'reading_type': asset.get('type', 'UNKNOWN'),
-                        'timestamp': timestamp,
-                        'data': json.dumps(latest_reading),
-                    })
-                    synced += 1
-                except Exception as e:
-                    logger.warning(f"Failed to fetch reading for asset {external_id}: {e}")
-
-            logger.info(f"Readings-only sync complete: {synced}/{len(assets)} assets")
-            return {'readings': synced}
+            logger.info(
+                f"Readings-only sync complete: {stats['readings']}/{len(assets)} assets, "
+                f"{stats['readings_duplicate']} duplicates (dedup ratio {stats['dedup_ratio']:.2%})"
+            )
+            return stats
         finally:
             self._sync_lock.release()
 
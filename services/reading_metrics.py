@@ -0,0 +1,141 @@
+"""
+Decode the frequently used metrics out of a raw IHS reading payload.
+
+IHS devices report the same quantity under many different key spellings.
+The alias lists below resolve those once, at ingest, through
+`services.extractor_registry`, which matches aliases once per payload shape.
+The results are stored in typed columns on `readings` (see
+`ReadingRepository.METRIC_COLUMNS`), so readers no longer have to
+`json.loads` the blob and probe keys on every request. Raw units are kept
+(e.g. power may be W or kW); normalisation stays with the consumer.
+
+Bump `METRICS_VERSION` whenever an alias list changes. Rows decoded by an
+older version are then treated as not decoded.
+"""
+import json
+from typing import Any, Dict, Optional
+
+from services.extractor_registry import pick_first, schema_for, to_float as _to_float
+
+METRICS_VERSION = 1
+
+# Highest `Power{n}` / `Current{n}` DC channel index that gets its own column.
+MAX_CHANNEL_INDEX = 4
+
+AC_VOLTAGE_L1_KEYS = ("voltage_1", "voltage_l1", "Voltage_1 (VAC)", "V_L1_N", "V_L1_N (VAC)")
+AC_VOLTAGE_L2_KEYS = ("voltage_2", "voltage_l2", "Voltage_2 (VAC)", "V_L2_N", "V_L2_N (VAC)")
+AC_VOLTAGE_L3_KEYS = ("voltage_3", "voltage_l3", "Voltage_3 (VAC)", "V_L3_N", "V_L3_N (VAC)")
+FREQUENCY_KEYS = ("frequency", "Frequency (Hz)", "AC_Frequency")
+AC_POWER_KEYS = (
+    "total_active_power",
+    "total_power_kw",
+    "total_power",
+    "Total_Active_Power (kW)",
+    "Total Active Power (kW)",
+    "Total_Active_Power (kw)",
+    "active_power_1",
+    "active_power_2",
+    "active_power_3",
+)
+GEN_POWER_KEYS = (
+    "power_kw",
+    "gen_total_watt",
+    "Gen_Total_Power",
+    "total_power_kw",
+    "total_active_power",
+    "Total Power (KW)",
+    "Total_Active_Power (kW)",
+    "Total_Active_Power (kw)",
+    "P_SUM",
+    "p1",
+    "p2",
+    "p3",
+    "P1",
+    "P2",
+    "P3",
+)
+DC_SYSTEM_VOLTAGE_KEYS = ("Voltage", "System_DC_Voltage", "dc_voltage")
+BATTERY_POWER_KEYS = ("p1_batt", "battery_power", "Battery_Power", "Power1")
+SOLAR_POWER_KEYS = ("p2_solar_y2", "solar_power", "Solar_Power", "Power2")
+BATTERY_VOLTAGE_KEYS = ("vrms1_batt", "battery_voltage", "Battery_V", "Battery")
+SOLAR_VOLTAGE_KEYS = ("vrms2_solar_y2", "vrms1_batt")
+BATTERY_CURRENT_KEYS = ("irms1_batt", "battery_current", "Current1")
+SOLAR_CURRENT_KEYS = ("irms2_solar_y2", "Current2")
+BATTERY_SOC_KEYS = ("battery_soc", "state_of_charge")
+RECTIFIER_DC_VOLTAGE_KEYS = ("System_DC_Voltage", "dc_voltage", "DC_Output_V", "Battery_V")
+RECTIFIER_DC_CURRENT_KEYS = ("Total_DC_Load_Current", "Total_DC_Load_Current (A)", "Total_DC_Load_Amp")
+FUEL_LEVEL_KEYS = ("fuel_level", "Fuel Level", "Fuel Level (L)", "fuel_level_liters")
+FUEL_DEPTH_KEYS = ("diesel_deep_with_offset_cm", "diesel_deep_cm", "Diesel Deep With Offset (CM)", "Diesel Deep (CM)")
+TEMPERATURE_KEYS = ("Equipment_Area_Temperature", "equipment_temp", "temperature", "Temperature")
+RUNTIME_HOURS_KEYS = ("runtime_hours", "run_hours", "Run_Hours", "Running_Hours", "engine_hours", "Engine_Hours")
+
+_SIMPLE_METRICS = {
+    "voltage_l1": AC_VOLTAGE_L1_KEYS,
+    "voltage_l2": AC_VOLTAGE_L2_KEYS,
+    "voltage_l3": AC_VOLTAGE_L3_KEYS,
+    "frequency": FREQUENCY_KEYS,
+    "ac_power": AC_POWER_KEYS,
+    "dc_voltage": DC_SYSTEM_VOLTAGE_KEYS,
+    "battery_power": BATTERY_POWER_KEYS,
+    "solar_power": SOLAR_POWER_KEYS,
+    "battery_voltage": BATTERY_VOLTAGE_KEYS,
+    "solar_voltage": SOLAR_VOLTAGE_KEYS,
+    "battery_current": BATTERY_CURRENT_KEYS,
+    "solar_current": SOLAR_CURRENT_KEYS,
+    "battery_soc": BATTERY_SOC_KEYS,
+    "rectifier_dc_voltage": RECTIFIER_DC_VOLTAGE_KEYS,
+    "rectifier_dc_current": RECTIFIER_DC_CURRENT_KEYS,
+    "fuel_level": FUEL_LEVEL_KEYS,
+    "fuel_depth_cm": FUEL_DEPTH_KEYS,
+    "temperature": TEMPERATURE_KEYS,
+    "runtime_hours": RUNTIME_HOURS_KEYS,
+}
+
+
+# Resolved per payload shape in one go by `ReadingSchema.fields`.
+_SIMPLE_METRIC_FIELDS = tuple(_SIMPLE_METRICS.items())
+_GEN_POWER_FIELDS = (("gen_power", GEN_POWER_KEYS),) + tuple((f"p{n}", (f"p{n}", f"P{n}")) for n in (1, 2, 3))
+_CHANNEL_KEYS = tuple((n, f"Power{n}", f"Current{n}") for n in range(1, MAX_CHANNEL_INDEX + 1))
+
+
+def _first_numbers(data: Dict[str, Any], fields) -> list:
+    """The first numeric value of each resolved field, or None."""
+    values = []
+    for _, keys in fields:
+        value = None
+        for key in keys:
+            value = _to_float(data[key])
+            if value is not None:
+                break
+        values.append(value)
+    return values
+
+
+def extract_metrics(data: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    schema = schema_for(data)
+    metrics = dict(zip(_SIMPLE_METRICS, _first_numbers(data, schema.fields(_SIMPLE_METRIC_FIELDS))))
+
+    # Generator meters without a total report per-phase power.
+    gen_power, *phases = _first_numbers(data, schema.fields(_GEN_POWER_FIELDS))
+    gen_power = gen_power or 0.0
+    if gen_power == 0.0:
+        gen_power = sum(value or 0.0 for value in phases)
+    metrics["gen_power"] = gen_power
+
+    for n, power_key, current_key in _CHANNEL_KEYS:
+        metrics[f"channel_power_{n}"] = _to_float(data.get(power_key))
+        metrics[f"channel_current_{n}"] = _to_float(data.get(current_key))
+
+    metrics["metrics_version"] = METRICS_VERSION
+    return metrics
+
+
+def extract_metrics_from_json(raw: Any) -> Optional[Dict[str, Optional[float]]]:
+    """`extract_metrics` for a stored `readings.data` value; None if it isn't a JSON object."""
+    try:
+        data = json.loads(raw) if isinstance(raw, str) else raw
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    return extract_metrics(data)
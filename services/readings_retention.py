@@ -0,0 +1,212 @@
+"""
+Retention for the raw `readings` table.
+
+Raw readings are kept for `READINGS_RAW_RETENTION_DAYS`. Older rows are folded
+into per-asset hourly and daily rollups (min/max/avg/sum/last/count per
+numeric field) and then deleted, in small batches so each write transaction
+stays short and API writers are never blocked for long. Hourly rollups are
+kept for `READINGS_HOURLY_RETENTION_DAYS`; daily rollups are kept indefinitely.
+
+Each batch is rolled up and deleted in one transaction, so an interrupted run
+never double-counts: the next run simply continues with whatever raw rows are
+left. The latest reading of every asset is never rolled away, because the
+dashboards and alarm evaluation read it through `latest_readings`. Rows whose
+data or time cannot be parsed are not rolled up, so they are kept and counted
+as `kept_unparsable` rather than deleted.
+"""
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from db.client import get_database
+from db.repositories.reading_repository import ReadingRepository
+from db.repositories.reading_rollup_repository import ReadingRollupRepository
+
+logger = logging.getLogger(__name__)
+
+RAW_RETENTION_DAYS = int(os.getenv('READINGS_RAW_RETENTION_DAYS', '14'))
+HOURLY_RETENTION_DAYS = int(os.getenv('READINGS_HOURLY_RETENTION_DAYS', '180'))
+BATCH_SIZE = int(os.getenv('READINGS_ROLLUP_BATCH_SIZE', '500'))
+MAX_BATCHES_PER_RUN = int(os.getenv('READINGS_ROLLUP_MAX_BATCHES', '200'))
+BATCH_PAUSE_SECONDS = float(os.getenv('READINGS_ROLLUP_BATCH_PAUSE_SECONDS', '0.05'))
+
+BUCKET_FORMAT = '%Y-%m-%d %H:%M:%S'
+_READING_TIME_FORMATS = ('%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S')
+_SKIP_FIELDS = {'id', 'asset_id', 'site_id'}
+
+
+def parse_reading_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    text = str(value).strip().replace('Z', '')
+    for fmt in _READING_TIME_FORMATS:
+        try:
+            return datetime.strptime(text[:19], fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def numeric_fields(data: dict) -> Dict[str, float]:
+    values = {}
+    for key, raw in data.items():
+        if key in _SKIP_FIELDS or isinstance(raw, bool):
+            continue
+        try:
+            value = float(raw)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(value):
+            values[key] = value
+    return values
+
+
+class ReadingsRetentionEngine:
+    def __init__(
+        self,
+        raw_retention_days: int = RAW_RETENTION_DAYS,
+        hourly_retention_days: int = HOURLY_RETENTION_DAYS,
+        batch_size: int = BATCH_SIZE,
+        max_batches: int = MAX_BATCHES_PER_RUN,
+        batch_pause: float = BATCH_PAUSE_SECONDS,
+    ):
+        self.raw_retention_days = raw_retention_days
+        self.hourly_retention_days = hourly_retention_days
+        # Deletes are issued as one IN (...) list; stay under SQLite's variable limit.
+        self.batch_size = max(1, min(int(batch_size), 900))
+        self.max_batches = max(1, int(max_batches))
+        self.batch_pause = batch_pause
+        self.reading_repo = ReadingRepository()
+        self.rollup_repo = ReadingRollupRepository()
+
+    def raw_cutoff(self) -> datetime:
+        return datetime.now() - timedelta(days=self.raw_retention_days)
+
+    def hourly_cutoff(self) -> datetime:
+        """Hourly rollups are kept from this day (midnight-aligned) onwards."""
+        day = (datetime.now() - timedelta(days=self.hourly_retention_days)).date()
+        return datetime(day.year, day.month, day.day)
+
+    def run(self) -> Dict[str, int]:
+        stats = {'rolled_up': 0, 'kept_latest': 0, 'kept_unparsable': 0, 'batches': 0, 'hourly_pruned': 0}
+        # `created_at` is written by SQLite's CURRENT_TIMESTAMP (UTC).
+        cutoff = (datetime.utcnow() - timedelta(days=self.raw_retention_days)).strftime(BUCKET_FORMAT)
+
+        after_id = 0
+        for _ in range(self.max_batches):
+            rows = self.reading_repo.get_oldest_after_id(after_id, self.batch_size)
+            # Ids follow ingest order, so the first row inside the window ends the scan.
+            eligible = []
+            for row in rows:
+                if not row.get('created_at') or row['created_at'] >= cutoff:
+                    break
+                eligible.append(row)
+            if not eligible:
+                break
+            after_id = eligible[-1]['id']
+
+            latest_ids = set(self.reading_repo.get_latest_ids_by_asset_ids(
+                sorted({row['asset_id'] for row in eligible})
+            ))
+            batch = [row for row in eligible if row['id'] not in latest_ids]
+            stats['kept_latest'] += len(eligible) - len(batch)
+
+            rolled_up = self._rollup_and_delete(batch)
+            stats['rolled_up'] += rolled_up
+            stats['kept_unparsable'] += len(batch) - rolled_up
+            stats['batches'] += 1
+
+            if len(eligible) < len(rows) or len(rows) < self.batch_size:
+                break
+            time.sleep(self.batch_pause)
+
+        hourly_cutoff = self.hourly_cutoff().strftime(BUCKET_FORMAT)
+        while True:
+            deleted = self.rollup_repo.delete_before('hourly', hourly_cutoff, limit=self.batch_size * 10)
+            stats['hourly_pruned'] += deleted
+            if deleted < self.batch_size * 10:
+                break
+            time.sleep(self.batch_pause)
+
+        logger.info(f"Readings retention complete: {stats}")
+        return stats
+
+    def _rollup_and_delete(self, rows: List[Dict]) -> int:
+        """Roll up and delete `rows`; unparsable ones are kept. Returns the number deleted."""
+        if not rows:
+            return 0
+        hourly: Dict = {}
+        daily: Dict = {}
+        rolled_ids: List[int] = []
+        for row in rows:
+            try:
+                data = json.loads(row['data']) if isinstance(row['data'], str) else row['data']
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(data, dict):
+                continue
+            when = parse_reading_time(row.get('timestamp')) or parse_reading_time(row.get('created_at'))
+            if when is None:
+                continue
+            hour = when.replace(minute=0, second=0, microsecond=0).strftime(BUCKET_FORMAT)
+            day = when.replace(hour=0, minute=0, second=0, microsecond=0).strftime(BUCKET_FORMAT)
+            rolled_ids.append(row['id'])
+            for field, value in numeric_fields(data).items():
+                for rollups, bucket in ((hourly, hour), (daily, day)):
+                    key = (row['asset_id'], bucket, field)
+                    agg = rollups.get(key)
+                    if agg is None:
+                        rollups[key] = {
+                            'min': value, 'max': value, 'sum': value, 'count': 1,
+                            'last': value, 'last_reading_id': row['id'],
+                        }
+                        continue
+                    agg['min'] = min(agg['min'], value)
+                    agg['max'] = max(agg['max'], value)
+                    agg['sum'] += value
+                    agg['count'] += 1
+                    # Rows arrive in id order, so the current one is the most recent.
+                    agg['last'] = value
+                    agg['last_reading_id'] = row['id']
+
+        if len(rolled_ids) < len(rows):
+            logger.warning(
+                f"Keeping {len(rows) - len(rolled_ids)} readings with unparsable data or time "
+                f"(ids {rows[0]['id']}-{rows[-1]['id']})"
+            )
+        if not rolled_ids:
+            return 0
+
+        db = get_database()
+        try:
+            self.rollup_repo.merge('hourly', hourly, commit=False)
+            self.rollup_repo.merge('daily', daily, commit=False)
+            self.reading_repo.delete_by_ids(rolled_ids, commit=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(rolled_ids)
+
+
+_retention_engine = None
+
+
+def get_readings_retention_engine() -> ReadingsRetentionEngine:
+    global _retention_engine
+    if _retention_engine is None:
+        _retention_engine = ReadingsRetentionEngine()
+    return _retention_engine
+
+
+def run_readings_retention() -> Dict[str, int]:
+    """Scheduler entry point."""
+    try:
+        return get_readings_retention_engine().run()
+    except Exception as e:
+        logger.error(f"Readings retention failed: {e}", exc_info=True)
+        return {}
@@ -5,6 +5,8 @@ from db.repositories.asset_repository import AssetRepository
 from db.repositories.reading_repository import ReadingRepository
 from db.repositories.alarm_repository import AlarmRepository
 from db.repositories.report_repository import ReportRepository
+from db.repositories.reading_rollup_repository import ReadingRollupRepository
+from services.readings_retention import get_readings_retention_engine
 import json
 from collections import defaultdict
 
@@ -12,11 +14,42 @@ def to_db_timestamp(dt: datetime) -> str:
     """Convert datetime to ISO format for SQLite datetime()"""
     return dt.strftime('%Y-%m-%d %H:%M:%S')
 
+def get_rollups_in_range(rollup_repo: ReadingRollupRepository, asset_ids: List[int],
+                         start: str, end: str) -> List[Dict]:
+    """
+    Rollup rows for the part of [start, end] that has aged out of raw retention.
+
+    Raw readings are deleted as they are rolled up, so rollups and `readings`
+    never overlap and callers combine both. Periods inside the raw window skip
+    the query; days older than the hourly retention come from the daily tier.
+    """
+    engine = get_readings_retention_engine()
+    if not asset_ids or start >= to_db_timestamp(engine.raw_cutoff()):
+        return []
+
+    boundary = to_db_timestamp(engine.hourly_cutoff())
+    rows = []
+    if start < boundary:
+        day_start = start[:10] + ' 00:00:00'
+        rows.extend(dict(r, tier='daily') for r in rollup_repo.get_in_range('daily', asset_ids, day_start, min(end, boundary)))
+    if end > boundary:
+        hour_start = max(start[:13] + ':00:00', boundary)
+        rows.extend(dict(r, tier='hourly') for r in rollup_repo.get_in_range('hourly', asset_ids, hour_start, end))
+    return rows
+
+def group_rollups(rows: List[Dict]) -> Dict[tuple, Dict[str, Dict]]:
+    """Group rollup rows by (asset_id, bucket_start, tier) -> {field: row}."""
+    groups: Dict[tuple, Dict[str, Dict]] = defaultdict(dict)
+    for row in rows:
+        groups[(row['asset_id'], row['bucket_start'], row['tier'])][row['field']] = row
+    return groups
+
 class SiteUptimeCalculator:
     def __init__(self):
         self.site_repo = SiteRepository()
         self.asset_repo = AssetRepository()
         self.reading_repo = ReadingRepository()
+        self.rollup_repo = ReadingRollupRepository()
 
     def generate(self, period_days: int, filters: dict, uptime_threshold: float = 95.0) -> dict:
         end_date = datetime.now()
@@ -63,11 +96,13 @@ class SiteUptimeCalculator:
 
         asset_ids = [a['id'] for a in energy_assets]
         readings = self.reading_repo.get_readings_in_range(asset_ids, start, end)
+        # Uptime is hourly by nature; the daily tier can't tell which hours were online.
+        rollups = [r for r in get_rollups_in_range(self.rollup_repo, asset_ids, start, end) if r['tier'] == 'hourly']
 
-        if not readings:
+        if not readings and not rollups:
             return None
 
-        hourly_status = self._calculate_hourly_status(readings)
+        hourly_status = self._calculate_hourly_status(readings, rollups)
 
         if not hourly_status:
             return None
@@ -89,9 +124,14 @@ class SiteUptimeCalculator:
             'downtime_periods': downtime_periods
         }
 
-    def _calculate_hourly_status(self, readings: List[Dict]) -> Dict[str, bool]:
+    def _calculate_hourly_status(self, readings: List[Dict], rollups: List[Dict] = None) -> Dict[str, bool]:
         hourly_power = defaultdict(float)
 
+        # Summing per-field sums gives the same hourly total as summing each raw reading.
+        for (_, bucket_start, _), fields in group_rollups(rollups or []).items():
+            hour_key = bucket_start[:13] + ':00'
+            hourly_power[hour_key] += self._extract_power({f: r['sum_value'] for f, r in fields.items()})
+
         for reading in readings:
             try:
                 # Parse MM/DD/YYYY HH:MM:SS format
@@ -366,6 +406,7 @@ class EnergyConsumptionAnalyzer:
         self.site_repo = SiteRepository()
         self.asset_repo = AssetRepository()
         self.reading_repo = ReadingRepository()
+        self.rollup_repo = ReadingRollupRepository()
 
     def generate(self, period_days: int, filters: dict, granularity: str = 'daily',
                  include_cost_analysis: bool = False) -> dict:
@@ -447,6 +488,14 @@ class EnergyConsumptionAnalyzer:
                 except Exception:
                     continue
 
+            # Older part of the period, from the rollup tiers
+            for fields in group_rollups(get_rollups_in_range(self.rollup_repo, [asset['id']], start, end)).values():
+                power_kw_sum = self._extract_power({f: r['sum_value'] for f, r in fields.items()})
+                if power_kw_sum > 0:
+                    consumption[source_key]['kwh'] += power_kw_sum * (5 / 60)
+                peak_kw = self._extract_power({f: r['max_value'] for f, r in fields.items()})
+                consumption[source_key]['peak_kw'] = max(consumption[source_key]['peak_kw'], peak_kw)
+
         return consumption
 
     def _extract_power(self, data: dict) -> float:
@@ -528,6 +577,7 @@ class DieselUtilizationAnalyzer:
         self.site_repo = SiteRepository()
         self.asset_repo = AssetRepository()
         self.reading_repo = ReadingRepository()
+        self.rollup_repo = ReadingRollupRepository()
 
     def generate(self, period_days: int, filters: dict, refuel_threshold_liters: float = 100.0,
                  diesel_price_per_liter: float = None) -> dict:
@@ -576,6 +626,7 @@ class DieselUtilizationAnalyzer:
 
             for fuel_asset in fuel_assets:
                 readings = self.reading_repo.get_by_asset_id_in_range(fuel_asset['id'], start, end)
+                readings = self._rollup_fuel_readings(fuel_asset['id'], start, end) + readings
                 usage = self._analyze_fuel_readings(readings, refuel_threshold)
 
                 if usage:
@@ -587,6 +638,18 @@ class DieselUtilizationAnalyzer:
 
         return results
 
+    def _rollup_fuel_readings(self, asset_id: int, start: str, end: str) -> List[Dict]:
+        """One pseudo-reading per rollup bucket, carrying the bucket's last level and sample count."""
+        pseudo = []
+        for (_, bucket_start, _), fields in group_rollups(get_rollups_in_range(self.rollup_repo, [asset_id], start, end)).items():
+            bucket = datetime.strptime(bucket_start, '%Y-%m-%d %H:%M:%S')
+            pseudo.append({
+                'timestamp': bucket.strftime('%m/%d/%Y %H:%M:%S'),
+                'data': {f: r['last_value'] for f, r in fields.items()},
+                'sample_count': max(r['sample_count'] for r in fields.values()),
+            })
+        return pseudo
+
     def _analyze_fuel_readings(self, readings: List[Dict], refuel_threshold: float) -> Optional[Dict]:
         if not readings:
             return None
@@ -618,7 +681,7 @@ class DieselUtilizationAnalyzer:
             except Exception:
                 continue
 
-        runtime_hours = len(readings) * (5 / 60)
+        runtime_hours = sum(r.get('sample_count', 1) for r in readings) * (5 / 60)
         efficiency = total_consumed / runtime_hours if runtime_hours else 0
 
         return {
@@ -0,0 +1,343 @@
+"""
+Response cache for the polled dashboard endpoints.
+
+Dashboard responses only change when their inputs do, so `cached_endpoint`
+keeps each rendered response: the JSON body FastAPI would send, plus its ETag.
+The key is the endpoint name and its validated arguments, with defaults
+applied, so `?sample_size=250` and no parameter share an entry. An entry also
+records the generation of every input it was built from:
+
+  - readings:   `MAX(id)` of `readings`, which moves on every ingest;
+  - sites:      sites/assets change counter (`data_generations`, migration 019);
+  - alarms:     alarms change counter (same table);
+  - energy_mix: the energy-mix aggregator's watermark, which moves once new
+                readings have been folded;
+  - hour:       the current hour, for responses laid out by clock hour.
+
+The readings, sites and alarms generations live in the database, so every
+worker sees the same ones. An entry whose generations still match and which is
+younger than its `max_age` is served as is. Once an input moved (or `max_age`
+passed, for changes no counter sees), the entry is stale. It is still served
+for up to `RESPONSE_CACHE_STALE_SECONDS` more, while a background thread
+rebuilds it, one rebuild per key at a time. Older entries are rebuilt inline.
+
+Entries are kept in an in-process LRU. With `RESPONSE_CACHE_DB` set they are
+also shared through that SQLite file, so uvicorn workers reuse each other's
+renders. Responses carry their ETag, and a matching `If-None-Match` gets a 304.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import typing
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from db.client import get_database
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
+RESPONSE_CACHE_MAX_AGE_SECONDS = float(os.getenv('RESPONSE_CACHE_MAX_AGE_SECONDS', '60'))
+RESPONSE_CACHE_STALE_SECONDS = float(os.getenv('RESPONSE_CACHE_STALE_SECONDS', '30'))
+# Optional SQLite file shared by worker processes, e.g. data/response_cache.db.
+RESPONSE_CACHE_DB = os.getenv('RESPONSE_CACHE_DB')
+
+# Shared-store rows older than this are pruned; nothing serves them any more.
+_STORE_RETENTION_SECONDS = 3600
+
+
+def _readings_generation() -> int:
+    return get_database().execute("SELECT COALESCE(MAX(id), 0) FROM readings").fetchone()[0]
+
+
+def _table_generation(domain: str) -> Callable[[], int]:
+    def generation() -> int:
+        row = get_database().execute(
+            "SELECT generation FROM data_generations WHERE domain = ?", (domain,)
+        ).fetchone()
+        return row[0] if row else 0
+    return generation
+
+
+def _energy_mix_generation() -> int:
+    from services.energy_mix_aggregator import get_energy_mix_aggregator
+    return get_energy_mix_aggregator().generation
+
+
+def _hour_generation() -> str:
+    return time.strftime("%Y-%m-%d %H")
+
+
+GENERATION_SOURCES: Dict[str, Callable[[], Any]] = {
+    'readings': _readings_generation,
+    'sites': _table_generation('sites'),
+    'alarms': _table_generation('alarms'),
+    'energy_mix': _energy_mix_generation,
+    'hour': _hour_generation,
+}
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    generations: Tuple
+    created_at: float  # wall clock, comparable across workers
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def to_response(self, request: Request, status: str) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "X-Cache": status}
+        if _etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as for GET: W/"x" matches "x".
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def render(result: Any, generations: Tuple) -> CachedResponse:
+    """The body FastAPI would send for `result`, with its ETag."""
+    body = JSONResponse(jsonable_encoder(result)).body
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    return CachedResponse(body, etag, generations, time.time())
+
+
+class SqliteResponseStore:
+    """Cached responses shared across processes through one SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._puts = 0
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT NOT NULL,
+                generations TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        row = self._connection().execute(
+            "SELECT body, etag, generations, created_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(row[0], row[1], tuple(json.loads(row[2])), row[3])
+
+    def put(self, key: str, entry: CachedResponse):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO response_cache (key, body, etag, generations, created_at) VALUES (?, ?, ?, ?, ?)",
+            (key, entry.body, entry.etag, json.dumps(entry.generations), entry.created_at),
+        )
+        self._puts += 1
+        if self._puts % 100 == 0:
+            connection.execute(
+                "DELETE FROM response_cache WHERE created_at < ?", (time.time() - _STORE_RETENTION_SECONDS,)
+            )
+
+
+class ResponseCache:
+    """LRU of rendered responses with generation checks and stale-while-revalidate."""
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        stale_seconds: float = RESPONSE_CACHE_STALE_SECONDS,
+        store: Optional[SqliteResponseStore] = None,
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.stale_seconds = stale_seconds
+        self.store = store
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._refreshing = set()
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    @staticmethod
+    def generations(depends: Sequence[str]) -> Tuple:
+        return tuple(GENERATION_SOURCES[domain]() for domain in depends)
+
+    def get(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        depends: Sequence[str],
+        max_age: float = RESPONSE_CACHE_MAX_AGE_SECONDS,
+    ) -> Tuple[CachedResponse, str]:
+        """The response for `key` and how it was served: 'hit', 'stale' or 'miss'."""
+        generations = self.generations(depends)
+        entry = self._lookup(key, generations, max_age)
+        if entry is not None and self._fresh(entry, generations, max_age):
+            self.stats["hits"] += 1
+            return entry, "hit"
+        if entry is not None and entry.age() <= max_age + self.stale_seconds:
+            self.stats["stale"] += 1
+            self._refresh_in_background(key, compute, depends)
+            return entry, "stale"
+
+        with self._key_lock(key):
+            # Another request may have rebuilt it while this one waited.
+            generations = self.generations(depends)
+            entry = self._lookup(key, generations, max_age)
+            if entry is not None and self._fresh(entry, generations, max_age):
+                self.stats["hits"] += 1
+                return entry, "hit"
+            self.stats["misses"] += 1
+            return self._rebuild(key, compute, generations), "miss"
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _fresh(entry: CachedResponse, generations: Tuple, max_age: float) -> bool:
+        return entry.generations == generations and entry.age() <= max_age
+
+    def _lookup(self, key: str, generations: Tuple, max_age: float) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if self.store is None or (entry is not None and self._fresh(entry, generations, max_age)):
+            return entry
+        try:
+            shared = self.store.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache store read failed: {e}")
+            return entry
+        if shared is not None and (entry is None or shared.created_at > entry.created_at):
+            self._remember(key, shared)
+            return shared
+        return entry
+
+    def _remember(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+
+    def _rebuild(self, key: str, compute: Callable[[], Any], generations: Tuple) -> CachedResponse:
+        # Generations are read before computing, so a change made meanwhile leaves the entry stale.
+        entry = render(compute(), generations)
+        self._remember(key, entry)
+        if self.store is not None:
+            try:
+                self.store.put(key, entry)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache store write failed: {e}")
+        return entry
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _refresh_in_background(self, key: str, compute: Callable[[], Any], depends: Sequence[str]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._rebuild(key, compute, self.generations(depends))
+                self.stats["refreshes"] += 1
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"Response cache refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='response-cache-refresh', daemon=True).start()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            store = SqliteResponseStore(RESPONSE_CACHE_DB) if RESPONSE_CACHE_DB else None
+            _cache = ResponseCache(store=store)
+        return _cache
+
+
+def _normalize(value: Any) -> Any:
+    # Empty filters behave like absent ones in every dashboard endpoint.
+    return None if value == "" else value
+
+
+def cached_endpoint(name: str, depends: Sequence[str], max_age: float = RESPONSE_CACHE_MAX_AGE_SECONDS):
+    """
+    Serve a GET endpoint through the response cache. `depends` names the
+    `GENERATION_SOURCES` its output is built from. Direct calls (without a
+    request) run the endpoint as before.
+    """
+    def decorator(func):
+        if not RESPONSE_CACHE_ENABLED:
+            return func
+
+        signature = inspect.signature(func)
+        hints = typing.get_type_hints(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, request: Optional[Request] = None, **kwargs):
+            if request is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {key: _normalize(value) for key, value in bound.arguments.items()}
+            key = name + "?" + json.dumps(arguments, sort_keys=True, default=str)
+            entry, status = get_response_cache().get(key, lambda: func(**arguments), depends, max_age)
+            return entry.to_response(request, status)
+
+        # FastAPI reads parameters from the signature; resolve annotations here, since
+        # string annotations would otherwise be evaluated in this module's namespace.
+        parameters = [
+            parameter.replace(annotation=hints.get(parameter.name, parameter.annotation))
+            for parameter in signature.parameters.values()
+        ]
+        parameters.append(inspect.Parameter('request', inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+        wrapper.__signature__ = signature.replace(parameters=parameters, return_annotation=inspect.Signature.empty)
+        return wrapper
+
+    return decorator
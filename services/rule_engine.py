@@ -0,0 +1,241 @@
+"""
+One evaluation core for composite rules of every `rule_type`.
+
+`/api/alarms/composite/evaluate` (through the async `alarm_monitor.AlarmMonitor`
+facade) and the scheduled `services.alarm_monitor.AlarmMonitor` both evaluate
+through `RuleEngine`. Each rule is dispatched on its `rule_type` to the
+simple, composite, historical or rate-change evaluator. Enabled rules come
+from `Database`'s versioned rule cache, and every query runs on the shared
+application connection.
+"""
+import operator
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import config
+from database import Database
+from db.repositories.reading_repository import add_ingest_listener
+from models import CompositeRule, EvaluationResult
+from rules.composite_rules import CompositeRuleEvaluator
+from rules.historical_rules import HistoricalRuleEvaluator
+from rules.parameter_mapper import compile_extractor
+from rules.rate_change_rules import RateChangeEvaluator
+from rules.simple_rules import SimpleRuleEvaluator
+from services.extractor_registry import schema_for
+from services.threshold_engine import extract_value as extract_plan_value
+
+# Rule types that need reading history, not just the latest reading.
+WINDOWED_RULE_TYPES = frozenset({'historical', 'rate_change'})
+
+
+class RuleEngine:
+    """Evaluates readings against the cached set of enabled composite rules."""
+
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database(config.DATABASE_PATH)
+        self.simple_evaluator = SimpleRuleEvaluator()
+        self.composite_evaluator = CompositeRuleEvaluator()
+        self.historical_evaluator = HistoricalRuleEvaluator(self.db)
+        self.rate_change_evaluator = RateChangeEvaluator(self.db)
+        self._evaluators: Dict[str, Callable[[CompositeRule, int, dict, Any], EvaluationResult]] = {
+            'simple': lambda rule, asset_id, reading, key: self.simple_evaluator.evaluate(rule, reading),
+            'composite': lambda rule, asset_id, reading, key: self.composite_evaluator.evaluate(rule, reading),
+            'historical': lambda rule, asset_id, reading, key: self.historical_evaluator.evaluate(rule, asset_id),
+            'rate_change': lambda rule, asset_id, reading, key: self.rate_change_evaluator.evaluate(
+                rule, asset_id, reading, key
+            ),
+        }
+        # Historical windows follow ingest instead of re-reading history per evaluation.
+        add_ingest_listener(self.historical_evaluator.windows.on_ingest)
+
+    def rules(self) -> List[CompositeRule]:
+        """All enabled rules, from the rule cache."""
+        return self.db.get_rule_set().rules
+
+    def get_rule(self, rule_id: str) -> Optional[CompositeRule]:
+        return self.db.get_rule_set().by_id.get(rule_id)
+
+    def invalidate_rules(self):
+        """Drop the cached rules, e.g. after a rule was written outside `Database`."""
+        self.db.invalidate_rules()
+
+    def stats(self) -> Dict[str, Any]:
+        rule_set = self.db.get_rule_set()
+        return {
+            "rules_version": rule_set.version,
+            "rules": len(rule_set.rules),
+            "rate_change_cache": self.rate_change_evaluator.cache.stats(),
+            "historical_windows": self.historical_evaluator.windows.stats(),
+        }
+
+    def evaluate_rule(
+        self,
+        rule: CompositeRule,
+        asset_id: int,
+        reading: dict,
+        reading_key: Any = None
+    ) -> EvaluationResult:
+        """
+        Route to appropriate evaluator based on rule type. `reading_key` identifies a
+        stored reading (its id) that may be evaluated more than once.
+        """
+        evaluator = self._evaluators.get(rule.rule_type)
+        if evaluator is None:
+            return EvaluationResult(
+                triggered=False,
+                message=f"Unknown rule type: {rule.rule_type}",
+                reason="Unknown rule type"
+            )
+        return evaluator(rule, asset_id, reading, reading_key)
+
+    def evaluate_reading(
+        self,
+        asset_id: int,
+        reading: dict,
+        rules: Optional[List[CompositeRule]] = None,
+        reading_key: Any = None
+    ) -> List[Tuple[CompositeRule, EvaluationResult]]:
+        """Triggered `(rule, result)` pairs for one reading, in rule order."""
+        if reading_key is None:
+            # Every rule sees this reading as the same one, so two rate-change rules on
+            # one parameter both compare it against the value before it.
+            reading_key = object()
+        triggered = []
+        for rule in self.rules() if rules is None else rules:
+            try:
+                result = self.evaluate_rule(rule, asset_id, reading, reading_key)
+            except Exception as e:
+                print(f"Error evaluating rule {rule.id}: {str(e)}")
+                continue
+            if result.triggered:
+                triggered.append((rule, result))
+        return triggered
+
+    def evaluate_readings(
+        self,
+        readings: Iterable[Tuple[int, dict]],
+        rules: Optional[List[CompositeRule]] = None,
+        exclude: Optional[Set[Tuple[int, str]]] = None
+    ) -> List[List[Tuple[CompositeRule, EvaluationResult]]]:
+        """
+        Batch form of `evaluate_reading` over `(asset_id, reading)` pairs; returns the
+        triggered pairs per reading, in input order. `(asset_id, rule_id)` pairs in
+        `exclude` (e.g. alarms that are already open) are left out of the results;
+        windowed rules are still evaluated for them so their state stays current.
+
+        Simple and composite rules only look at the reading itself, so they are
+        evaluated for the whole batch at once: each parameter is extracted once
+        per reading into a NumPy column and each condition is one vectorised
+        comparison. Historical and rate-change rules go through their evaluators
+        reading by reading, in input order.
+        """
+        readings = list(readings)
+        rules = self.rules() if rules is None else rules
+        triggered: List[list] = [[] for _ in readings]
+
+        instant = self._evaluate_instant_rules(rules, [reading for _, reading in readings])
+        for position, (hits, details) in instant.items():
+            rule = rules[position]
+            for index in np.flatnonzero(hits).tolist():
+                if exclude and (readings[index][0], rule.id) in exclude:
+                    continue
+                triggered[index].append((position, rule, self._instant_result(rule, details[index])))
+
+        windowed = [(position, rule) for position, rule in enumerate(rules) if position not in instant]
+        if windowed:
+            # Reading-major, so each asset's readings reach the windows and the
+            # previous-value cache in order.
+            for index, (asset_id, reading) in enumerate(readings):
+                reading_key = object()
+                for position, rule in windowed:
+                    try:
+                        result = self.evaluate_rule(rule, asset_id, reading, reading_key)
+                    except Exception as e:
+                        print(f"Error evaluating rule {rule.id}: {str(e)}")
+                        continue
+                    if result.triggered and not (exclude and (asset_id, rule.id) in exclude):
+                        triggered[index].append((position, rule, result))
+            if instant:
+                for hits in triggered:
+                    hits.sort(key=lambda hit: hit[0])
+
+        return [[(rule, result) for _, rule, result in hits] for hits in triggered]
+
+    def _evaluate_instant_rules(self, rules: List[CompositeRule], readings: List[dict]) -> Dict[int, Tuple[np.ndarray, list]]:
+        """
+        `{rule position: (triggered mask, detail per reading)}` for the simple and
+        composite rules in `rules`. The detail is the value for simple rules and the
+        number of conditions met for composite ones.
+        """
+        columns: Dict[str, np.ndarray] = {}
+        schemas = [schema_for(reading) for reading in readings]
+
+        def column(parameter: str) -> np.ndarray:
+            if parameter not in columns:
+                plan = compile_extractor(parameter)
+                values = [extract_plan_value(plan, reading, schema) for reading, schema in zip(readings, schemas)]
+                columns[parameter] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            return columns[parameter]
+
+        instant = {}
+        for position, rule in enumerate(rules):
+            if rule.rule_type not in ('simple', 'composite') or not rule.conditions:
+                continue
+            if rule.rule_type == 'simple':
+                values = column(rule.conditions[0].parameter)
+                instant[position] = (_condition_hits(rule.conditions[0], values), values.tolist())
+                continue
+            hits = np.vstack([_condition_hits(condition, column(condition.parameter)) for condition in rule.conditions])
+            triggered = hits.any(axis=0) if rule.logical_operator == 'OR' else hits.all(axis=0)
+            instant[position] = (triggered, hits.sum(axis=0).tolist())
+        return instant
+
+    @staticmethod
+    def _instant_result(rule: CompositeRule, detail) -> EvaluationResult:
+        """The triggered result `SimpleRuleEvaluator`/`CompositeRuleEvaluator` would return."""
+        if rule.rule_type == 'simple':
+            condition = rule.conditions[0]
+            return EvaluationResult(
+                triggered=True,
+                value=detail,
+                threshold=condition.value,
+                message=f"{condition.parameter} is {detail} {condition.unit}"
+            )
+        total_conditions = len(rule.conditions)
+        return EvaluationResult(
+            triggered=True,
+            conditions_met=detail,
+            total_conditions=total_conditions,
+            message=f"{rule.name}: {detail}/{total_conditions} conditions met"
+        )
+
+
+# Same semantics as `SimpleRuleEvaluator.compare`, over NumPy columns.
+_BATCH_OPERATORS: Dict[str, Callable[[np.ndarray, float], np.ndarray]] = {
+    '<=': operator.le,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '>': operator.gt,
+    '==': lambda values, threshold: np.abs(values - threshold) < 0.01,
+    '!=': lambda values, threshold: np.abs(values - threshold) >= 0.01,
+}
+
+
+def _condition_hits(condition, values: np.ndarray) -> np.ndarray:
+    compare = _BATCH_OPERATORS.get(condition.operator)
+    if compare is None:
+        return np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        return ~np.isnan(values) & compare(values, condition.value)
+
+
+# Singleton instance
+_rule_engine_instance = None
+
+def get_rule_engine() -> RuleEngine:
+    """Get or create the global RuleEngine instance"""
+    global _rule_engine_instance
+    if _rule_engine_instance is None:
+        _rule_engine_instance = RuleEngine()
+    return _rule_engine_instance
@@ -0,0 +1,173 @@
+"""
+Site-scope resolution shared by the dashboard endpoints and the energy-mix jobs.
+
+A scope is a site name, or a region (matched against a site's region or zone)
+and/or a state. Site scopes resolve to that one site. Other scopes resolve to up
+to `sample_size` of their sites, most recently reporting first, so a sample
+of a large region is not all silent sites. Sites with no readings yet fill
+the sample when nothing in scope has reported.
+
+Recency comes from `site_last_reading` (migration 018), which triggers keep at
+each site's newest reading id. Ranking is therefore a walk down that table's
+index, not a GROUP BY over readings. Resolved scopes are cached for
+`SITE_SCOPE_CACHE_SECONDS`, keyed by (region, state, site, sample_size). Within
+that window a sample may miss a site that has only just started reporting.
+The cache is dropped when the 'sites' generation (migration 019) moves, checked
+at most every `SITE_SCOPE_GENERATION_CHECK_SECONDS`, so added, renamed or
+deleted sites are seen by every process.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from db.client import get_database
+
+SITE_SCOPE_CACHE_SECONDS = float(os.getenv('SITE_SCOPE_CACHE_SECONDS', '60'))
+# Distinct scopes kept; the cache is cleared when it outgrows this.
+SITE_SCOPE_CACHE_SIZE = int(os.getenv('SITE_SCOPE_CACHE_SIZE', '1024'))
+# How often lookups compare the cache against the 'sites' generation.
+SITE_SCOPE_GENERATION_CHECK_SECONDS = float(os.getenv('SITE_SCOPE_GENERATION_CHECK_SECONDS', '1'))
+
+
+@dataclass(frozen=True)
+class SiteScope:
+    """Resolved sites of a scope; `site` is the matched site's stored name."""
+    site_ids: Tuple[int, ...]
+    region: Optional[str]
+    state: Optional[str]
+    site: Optional[str]
+    resolved_at: float
+
+
+class SiteScopeResolver:
+    """Resolves (region, state, site) scopes to site ids, with a TTL cache."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = SITE_SCOPE_CACHE_SECONDS,
+        max_entries: int = SITE_SCOPE_CACHE_SIZE,
+        check_seconds: float = SITE_SCOPE_GENERATION_CHECK_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.check_seconds = check_seconds
+        self._cache: Dict[Tuple, SiteScope] = {}
+        self._sites_generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def resolve(
+        self,
+        region: Optional[str] = None,
+        state: Optional[str] = None,
+        site: Optional[str] = None,
+        sample_size: int = 250,
+    ) -> SiteScope:
+        """
+        The scope's sites. Raises a 404 `HTTPException` for an unknown site or a
+        scope without sites; those are not cached.
+        """
+        sample_size = max(1, int(sample_size))
+        key = (site.lower(), None, None, 1) if site else (None, region or None, state or None, sample_size)
+        self._check_sites()
+        with self._lock:
+            scope = self._cache.get(key)
+            if scope is not None and time.monotonic() - scope.resolved_at <= self.ttl_seconds:
+                self.stats["hits"] += 1
+                return scope
+            self.stats["misses"] += 1
+
+        scope = self._site_scope(site) if site else self._area_scope(region or None, state or None, sample_size)
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._cache.clear()
+            self._cache[key] = scope
+        return scope
+
+    def invalidate(self):
+        """Drop cached scopes, e.g. after sites were re-synced."""
+        with self._lock:
+            self._cache.clear()
+
+    def _check_sites(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = time.monotonic()
+        row = get_database().execute(
+            "SELECT generation FROM data_generations WHERE domain = 'sites'"
+        ).fetchone()
+        generation = row[0] if row else 0
+        with self._lock:
+            moved = self._sites_generation is not None and generation != self._sites_generation
+            self._sites_generation = generation
+        if moved:
+            self.invalidate()
+
+    @staticmethod
+    def _site_scope(site: str) -> SiteScope:
+        row = get_database().execute(
+            "SELECT id, name, region, state FROM sites WHERE name = ? COLLATE NOCASE LIMIT 1",
+            (site,),
+        ).fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail=f"Site '{site}' not found")
+        return SiteScope((int(row["id"]),), row["region"], row["state"], row["name"], time.monotonic())
+
+    @staticmethod
+    def _area_scope(region: Optional[str], state: Optional[str], sample_size: int) -> SiteScope:
+        db = get_database()
+        where: List[str] = []
+        params: List[Any] = []
+        if region:
+            where.append("(s.region = ? OR s.zone = ?)")
+            params.extend([region, region])
+        if state:
+            where.append("s.state = ?")
+            params.append(state)
+        where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+        # Prefer sites that have readings, most recent first.
+        rows = db.execute(
+            f"""
+            SELECT s.id FROM site_last_reading l
+            JOIN sites s ON s.id = l.site_id
+            {where_sql}
+            ORDER BY l.reading_id DESC
+            LIMIT ?
+            """,
+            (*params, sample_size),
+        ).fetchall()
+        if not rows:
+            # No readings in scope yet; fall back to the sites themselves.
+            rows = db.execute(f"SELECT s.id FROM sites s {where_sql} LIMIT ?", (*params, sample_size)).fetchall()
+        if not rows:
+            raise HTTPException(status_code=404, detail="No sites matched the requested scope")
+        return SiteScope(tuple(int(row[0]) for row in rows), region, state, None, time.monotonic())
+
+
+_resolver: Optional[SiteScopeResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_site_scope_resolver() -> SiteScopeResolver:
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = SiteScopeResolver()
+        return _resolver
+
+
+def resolve_site_ids(
+    region: Optional[str] = None,
+    state: Optional[str] = None,
+    site: Optional[str] = None,
+    sample_size: int = 250,
+) -> List[int]:
+    """Site ids of a scope; see `SiteScopeResolver.resolve`."""
+    return list(get_site_scope_resolver().resolve(region, state, site, sample_size).site_ids)
@@ -0,0 +1,341 @@
+"""
+Compiled threshold evaluation for `AlarmMonitor`.
+
+Each enabled threshold is compiled once per cycle: its category becomes an
+asset-type filter, its parameter a field-alias extraction plan, and its
+conditions a list of (plan, comparison, value) tuples. Assets are then grouped
+by type. Every parameter a type needs is extracted once per asset into a
+NumPy column (NaN where missing), and each condition is a single vectorised
+comparison over that column. Plain Python used to evaluate every
+(asset, threshold) pair.
+
+Semantics match `AlarmMonitor._evaluate_threshold`: a missing value never
+matches, and multi-condition thresholds report the last condition that had a
+value.
+"""
+import json
+import operator
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.extractor_registry import ReadingSchema, schema_for
+
+CATEGORY_ASSET_TYPES: Dict[str, set] = {
+    # Legacy categories
+    "Fuel": {"FUEL_LEVEL"},
+    "Battery": {"DC_METER", "RECTIFIER"},
+    "Grid": {"AC_METER"},
+    "Temperature": {"RECTIFIER", "GENERATOR"},
+    "Generator": {"GENERATOR", "RECTIFIER"},
+    "Solar": {"DC_METER"},
+    # Composite-rule derived categories (current defaults)
+    "Fuel Sensor": {"FUEL_LEVEL"},
+    "Grid ACEM": {"AC_METER"},
+    "Gen ACEM": {"GENERATOR"},
+    "Temperature Sensor": {"RECTIFIER", "GENERATOR"},
+}
+
+OPERATORS: Dict[str, Callable] = {
+    "<=": operator.le,
+    "<": operator.lt,
+    ">=": operator.ge,
+    ">": operator.gt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Fallback field names for parameters without a dedicated plan below.
+PARAMETER_FIELD_MAP: Dict[str, List[str]] = {
+    'fuel_level': ['Fuel Level (L)', 'Diesel Deep (CM)', 'Diesel Deep With Offset (CM)', 'fuel_level'],
+    'coolant_temp': ['Coolant_Temperature', 'coolant_temp'],
+    'oil_pressure': ['Oil_Pressure', 'oil_pressure'],
+    'engine_speed': ['Engine_Speed', 'engine_speed'],
+    'temperature': ['Temperature', 'temperature'],
+    'load_current': ['I_L1 (Amps)', 'I_L2 (Amps)', 'I_L3 (Amps)', 'load_current'],
+}
+
+# An extraction plan is a chain of (reducer, keys) steps joined like `a or b or c`:
+# the first truthy result wins, otherwise the last step's result is returned.
+Step = Tuple[str, Tuple[str, ...]]
+
+_VOLTAGE_PLAN: Tuple[Step, ...] = (
+    ("avg", ("voltage_1", "voltage_2", "voltage_3")),
+    ("avg", ("v_l1_n", "v_l2_n", "v_l3_n")),
+    ("avg", ("Phase_L1_V", "Phase_L2_V", "Phase_L3_V")),
+    ("avg", ("line_1_voltage", "line_2_voltage", "line_3_voltage")),
+    ("first", ("voltage", "Voltage", "grid_voltage", "gen_voltage")),
+)
+_CURRENT_SUM_PLAN: Tuple[Step, ...] = (
+    ("sum", ("current_1", "current_2", "current_3")),
+    ("sum", ("i_l1", "i_l2", "i_l3")),
+    ("sum", ("Phase_L1_Current", "Phase_L2_Current", "Phase_L3_Current")),
+    ("sum", ("I_L1 (Amps)", "I_L2 (Amps)", "I_L3 (Amps)")),
+    ("first", ("current_sum", "load_current")),
+)
+_FREQUENCY_PLAN: Tuple[Step, ...] = (
+    ("first", ("frequency", "AC_Frequency", "grid_frequency", "gen_frequency")),
+)
+
+_PLANS: Dict[str, Tuple[Step, ...]] = {
+    **{p: _VOLTAGE_PLAN for p in ("voltage", "grid_voltage", "gen_voltage")},
+    **{p: _CURRENT_SUM_PLAN for p in ("current_sum", "load_current")},
+    **{p: _FREQUENCY_PLAN for p in ("frequency", "grid_frequency", "gen_frequency")},
+    **{
+        p: (("first", ("diesel_deep_with_offset_cm", "diesel_deep_cm",
+                       "Diesel Deep With Offset (CM)", "Diesel Deep (CM)")),)
+        for p in ("fuel_depth_cm", "diesel_deep_with_offset_cm", "diesel_deep_cm")
+    },
+    "battery_voltage": (("first", ("Voltage", "Battery_V", "System_DC_Voltage", "engine_battery_voltage",
+                                   "battery_voltage", "Battery (vdc)")),),
+    "battery_current": (("first", ("Current1", "Total_DC_Load_Current", "irms1_batt", "battery_current")),),
+    "solar_current": (("first", ("Current4", "irms2_solar_y2", "solar_current")),),
+    "equipment_temp": (("first", ("Equipment_Area_Temperature", "equipment_temp", "temperature", "Temperature")),),
+}
+
+
+@dataclass(frozen=True, eq=False)
+class ExtractionPlan:
+    # Compared and hashed by identity: plans are compiled once (`compile_extractor`)
+    # and keyed by object in each reading schema's resolved-plan cache.
+    steps: Tuple[Step, ...]
+    # Frequency meters that report decihertz (e.g. 500 for 50.0 Hz) are scaled down.
+    decihertz: bool = False
+
+
+@lru_cache(maxsize=None)
+def compile_extractor(parameter: str) -> Optional[ExtractionPlan]:
+    if not parameter:
+        return None
+    if parameter in _PLANS:
+        return ExtractionPlan(_PLANS[parameter], decihertz=_PLANS[parameter] is _FREQUENCY_PLAN)
+    return ExtractionPlan((("first", tuple(PARAMETER_FIELD_MAP.get(parameter, [parameter]))),))
+
+
+def _numbers(reading_data: Dict, keys: Tuple[str, ...]) -> List[float]:
+    # `keys` are already narrowed to those present in `reading_data`.
+    values = []
+    for key in keys:
+        try:
+            values.append(float(reading_data[key]))
+        except (ValueError, TypeError):
+            continue
+    return values
+
+
+def extract_value(
+    plan: Optional[ExtractionPlan],
+    reading_data: Dict,
+    schema: Optional[ReadingSchema] = None
+) -> Optional[float]:
+    """
+    Run `plan` over one reading. Pass the reading's `schema` when extracting
+    several parameters from it, so its key set is fingerprinted once.
+    """
+    if plan is None:
+        return None
+    steps, last_step_missing = (schema or schema_for(reading_data)).plan_steps(plan)
+    value = None
+    for reducer, keys in steps:
+        if reducer == "first":
+            value = None
+            for key in keys:
+                try:
+                    value = float(reading_data[key])
+                    break
+                except (ValueError, TypeError):
+                    continue
+        else:
+            values = _numbers(reading_data, keys)
+            if reducer == "avg":
+                value = sum(values) / len(values) if values else None
+            else:
+                value = sum(values) if values else None
+        if value:
+            break
+    else:
+        # No step gave a truthy value: the plan yields its last step's result.
+        if last_step_missing:
+            value = None
+    if plan.decihertz and value is not None and value > 100:
+        return value / 10
+    return value
+
+
+@dataclass
+class CompiledCondition:
+    parameter: str
+    plan: Optional[ExtractionPlan]
+    compare: Optional[Callable]
+    value: Optional[float]
+    # As configured, for alarm details/messages.
+    raw_value: Any
+    condition: Any
+    unit: Any
+
+    @property
+    def valid(self) -> bool:
+        return self.plan is not None and self.compare is not None and self.value is not None
+
+
+@dataclass
+class CompiledThreshold:
+    threshold: Dict
+    asset_types: set
+    conditions: List[CompiledCondition]
+    any_of: bool
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compile_condition(parameter: str, condition: Any, value: Any, unit: Any) -> CompiledCondition:
+    return CompiledCondition(
+        parameter=parameter,
+        plan=compile_extractor(parameter),
+        compare=OPERATORS.get(condition) if isinstance(condition, str) else None,
+        value=_to_float(value),
+        raw_value=value,
+        condition=condition,
+        unit=unit,
+    )
+
+
+def compile_threshold(threshold: Dict) -> CompiledThreshold:
+    category = (threshold.get("category") or "").strip()
+    asset_types = CATEGORY_ASSET_TYPES.get(category) or set()
+
+    conditions = None
+    raw_conditions = threshold.get("conditions")
+    if raw_conditions:
+        try:
+            conditions = json.loads(raw_conditions) if isinstance(raw_conditions, str) else raw_conditions
+        except Exception:
+            conditions = None
+
+    if isinstance(conditions, list) and conditions:
+        compiled = [
+            _compile_condition(
+                cond.get("parameter") or threshold.get("parameter") or "",
+                cond.get("condition") or cond.get("operator"),
+                cond.get("value"),
+                cond.get("unit"),
+            )
+            for cond in conditions
+            if isinstance(cond, dict)
+        ]
+        return CompiledThreshold(
+            threshold=threshold,
+            asset_types=asset_types,
+            conditions=compiled,
+            any_of=(threshold.get("logic_operator") or "AND").upper() != "AND",
+        )
+
+    single = _compile_condition(
+        threshold.get("parameter") or "",
+        threshold.get("condition"),
+        threshold.get("value"),
+        threshold.get("unit"),
+    )
+    return CompiledThreshold(threshold=threshold, asset_types=asset_types, conditions=[single], any_of=False)
+
+
+# Threshold columns that affect evaluation (trigger counters deliberately excluded).
+_SIGNATURE_FIELDS = ("id", "category", "parameter", "condition", "value", "unit", "severity",
+                     "conditions", "logic_operator", "description")
+
+
+def threshold_signature(thresholds: List[Dict]) -> Tuple:
+    """Changes whenever a threshold is added, removed or edited, so a compiled engine can be reused."""
+    return tuple(tuple(t.get(field) for field in _SIGNATURE_FIELDS) for t in thresholds)
+
+
+class ThresholdEngine:
+    """Evaluates a set of thresholds against the latest reading of many assets at once."""
+
+    def __init__(self, thresholds: List[Dict]):
+        self.signature = threshold_signature(thresholds)
+        self.compiled = [compile_threshold(t) for t in thresholds]
+        self._by_asset_type: Dict[str, List[int]] = {}
+        for index, compiled in enumerate(self.compiled):
+            for asset_type in compiled.asset_types:
+                self._by_asset_type.setdefault(asset_type, []).append(index)
+
+    def thresholds_for(self, asset_type: str) -> List[CompiledThreshold]:
+        return [self.compiled[i] for i in self._by_asset_type.get(asset_type, [])]
+
+    def evaluate(self, assets: List[Dict], data_by_asset: Dict[int, Dict]) -> List[Tuple[Dict, Dict, Dict]]:
+        """
+        Return `(asset, threshold, violation)` for every violated pair, ordered by
+        asset then threshold like the pairwise loop. `data_by_asset` maps asset id
+        to its parsed latest reading; assets without one are skipped.
+        """
+        groups: Dict[str, List[int]] = {}
+        for position, asset in enumerate(assets):
+            if asset['id'] not in data_by_asset:
+                continue
+            asset_type = (asset.get("type") or "").strip()
+            if asset_type in self._by_asset_type:
+                groups.setdefault(asset_type, []).append(position)
+
+        hits: List[Tuple[int, int, Dict]] = []
+        for asset_type, positions in groups.items():
+            rows = [data_by_asset[assets[p]['id']] for p in positions]
+            schemas = [schema_for(data) for data in rows]
+            columns: Dict[str, np.ndarray] = {}
+
+            def column(cond: CompiledCondition) -> np.ndarray:
+                if cond.parameter not in columns:
+                    values = [extract_value(cond.plan, data, schema) for data, schema in zip(rows, schemas)]
+                    columns[cond.parameter] = np.array(
+                        [np.nan if v is None else v for v in values], dtype=np.float64
+                    )
+                return columns[cond.parameter]
+
+            for index in self._by_asset_type[asset_type]:
+                for row, violation in self._evaluate_group(self.compiled[index], column, len(rows)):
+                    hits.append((positions[row], index, violation))
+
+        hits.sort(key=lambda hit: (hit[0], hit[1]))
+        return [(assets[p], self.compiled[i].threshold, violation) for p, i, violation in hits]
+
+    @staticmethod
+    def _evaluate_group(compiled: CompiledThreshold, column, size: int):
+        results = []
+        # Index (into `compiled.conditions`) of the last condition with a value, per asset.
+        last = np.full(size, -1, dtype=np.int64)
+        for position, cond in enumerate(compiled.conditions):
+            if not cond.valid:
+                results.append(np.zeros(size, dtype=bool))
+                continue
+            values = column(cond)
+            present = ~np.isnan(values)
+            with np.errstate(invalid='ignore'):
+                results.append(present & cond.compare(values, cond.value))
+            last[present] = position
+
+        if not results:
+            return
+        stacked = np.vstack(results)
+        triggered = stacked.any(axis=0) if compiled.any_of else stacked.all(axis=0)
+        triggered &= last >= 0
+
+        rows = np.flatnonzero(triggered)
+        for row, position in zip(rows.tolist(), last[rows].tolist()):
+            cond = compiled.conditions[position]
+            violation = {
+                "current_value": column(cond).item(row),
+                "threshold_value": cond.raw_value,
+                "condition": cond.condition,
+                "unit": cond.unit,
+                "parameter": cond.parameter,
+            }
+            yield row, violation
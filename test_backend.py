@@ -6,6 +6,8 @@ Run: ./venv/bin/python test_backend.py
 
 import asyncio
 from alarm_monitor import AlarmMonitor
+from database import RuleSet
+from models import CompositeRule
 from config import config
 
 async def test_backend():
@@ -97,6 +99,28 @@ async def test_backend():
         for alarm in power_alarms:
             print(f"   ✓ {alarm.message}")
 
+    # Test 7: Site-scoped rule fires for its site only
+    print("\n7. Testing site-scoped rule (by site name)...")
+    site_rule = CompositeRule(
+        id="test_site_scoped_fuel_low",
+        name="Fuel Low (Test Site 5)",
+        severity="warning",
+        category="Fuel",
+        rule_type="simple",
+        conditions=[{"parameter": "fuel_level", "operator": "<", "value": 10, "unit": "cm"}],
+        applies_to="site",
+        site_id="9005",
+    )
+    rule_set = RuleSet.build(1, all_rules + [site_rule], site_names={"9005": "Test Site 5"})
+    in_scope = rule_set.applicable(region="Lagos", site="Test Site 5")
+    out_of_scope = rule_set.applicable(region="Lagos", site="Test Site 6")
+    assert site_rule in in_scope, "site-scoped rule missing for its own site"
+    assert site_rule in rule_set.applicable(site="9005"), "site-scoped rule missing for its site id"
+    assert site_rule not in out_of_scope, "site-scoped rule applied to another site"
+    fired = [rule.id for rule, _ in monitor.engine.evaluate_reading(127, {"fuel_level": 8}, in_scope)]
+    assert site_rule.id in fired, "site-scoped rule did not fire for its site"
+    print(f"   ✓ Rules for Test Site 5: {len(in_scope)}, for Test Site 6: {len(out_of_scope)}")
+
     print("\n" + "=" * 80)
     print("✅ ALL TESTS PASSED!")
     print("=" * 80)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Regression test for batched reading inserts.
+
+Run: ./venv/bin/python test_reading_batch.py
+
+`ReadingRepository.create_many` writes a whole batch with one `executemany`.
+One bad reading used to fail the batch with
+    sqlite3.IntegrityError: NOT NULL constraint failed: readings.timestamp
+losing every valid reading in it and leaving the transaction open.
+"""
+
+import json
+import os
+import tempfile
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "test_ihs.db")
+
+        from db.client import close_database, get_database  # import after env var set
+        from db.repositories.reading_repository import BufferedReadingWriter, ReadingRepository
+
+        db = get_database()
+        db.execute("INSERT INTO sites (id, name, region) VALUES (1, 'Site A', 'South')")
+        db.executemany(
+            "INSERT INTO assets (id, name, type, site_id) VALUES (?, ?, 'AC_METER', 1)",
+            [(1, "Asset 1"), (2, "Asset 2"), (3, "Asset 3")],
+        )
+        db.commit()
+
+        def reading(asset_id, timestamp, data=None):
+            return {
+                "asset_id": asset_id,
+                "reading_type": "AC_METER",
+                "timestamp": timestamp,
+                "data": json.dumps(data or {"voltage": 230}),
+            }
+
+        repo = ReadingRepository()
+
+        # A reading without a timestamp is skipped; the rest of the batch is stored.
+        with BufferedReadingWriter(repo, flush_size=10) as writer:
+            writer.add(reading(1, "2026-10-16 10:00:00"))
+            writer.add(reading(2, None))
+            writer.add(reading(3, "2026-10-16 10:00:00"))
+        assert writer.written == 2, writer.written
+        assert not db.in_transaction
+
+        # A row the database rejects (unknown asset) fails the batch, which is retried
+        # row by row: only that row is lost.
+        inserted = repo.create_many([
+            reading(1, "2026-10-16 11:00:00"),
+            reading(99, "2026-10-16 11:00:00"),
+            reading(2, "2026-10-16 11:00:00"),
+        ])
+        assert inserted == 2, inserted
+        assert not db.in_transaction
+
+        stored = db.execute("SELECT asset_id, timestamp FROM readings ORDER BY id").fetchall()
+        assert [tuple(row) for row in stored] == [
+            (1, "2026-10-16 10:00:00"),
+            (3, "2026-10-16 10:00:00"),
+            (1, "2026-10-16 11:00:00"),
+            (2, "2026-10-16 11:00:00"),
+        ], stored
+        latest = dict(db.execute("SELECT id, last_reading_timestamp FROM assets").fetchall())
+        assert latest == {1: "2026-10-16 11:00:00", 2: "2026-10-16 11:00:00", 3: "2026-10-16 10:00:00"}, latest
+
+        # Replaying stored readings inserts nothing and leaves the timestamps alone.
+        assert repo.create_many([reading(1, "2026-10-16 10:00:00")]) == 0
+        assert db.execute("SELECT last_reading_timestamp FROM assets WHERE id = 1").fetchone()[0] == "2026-10-16 11:00:00"
+
+        close_database()
+
+    print("✅ reading batch regression test passed")
+
+
+if __name__ == "__main__":
+    main()